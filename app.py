@@ -3,7 +3,7 @@
 # Production Server with Avatar Support - Hardened with Socket.IO Proxy
 # ================================
 
-from flask import Flask, render_template, Response, request, jsonify, make_response, g, copy_current_request_context
+from flask import Flask, render_template, Response, request, jsonify, make_response, g, copy_current_request_context, stream_with_context
 from flask_socketio import SocketIO, emit
 from flask_cors import CORS
 import os
@@ -13,6 +13,7 @@ import uuid
 import logging
 import threading
 import secrets
+import atexit
 from datetime import datetime
 from dotenv import load_dotenv
 import httpx
@@ -47,6 +48,34 @@ except ImportError:
     logging.warning("minipywo system not available - function calling will be limited")
 
 from logging_config import setup_logging
+from realtime_relay import create_relay
+from background_loop import BackgroundLoop
+from blocking_pool import FairBlockingPool, PoolBusy
+from backend_client import BackendClientPool
+from backend_router import BackendRouter
+from deadline import DEADLINE_HEADER, Deadline, DeadlineExceeded, count_deadline, deadline_totals, within
+from rag_cache import RagAnswerCache, apply_corrections, correction_map, question_key
+from rag_prefetch import PrefetchLimiter, RagPrefetcher
+from singleflight import SingleFlight, SingleFlightTimeout
+from rag_stream import StreamFramer, choose_format, count_stream, observe_stream, stream_totals
+from realtime_pool import WarmSessionPool
+from perf_metrics import HistogramSet
+from realtime_events import EventDispatcher, UpstreamEvent, sniff_event_type
+from realtime_queues import SendQueue, send_queue_totals
+from realtime_turns import TURN_EVENT_TYPES, TurnTimeline, turn_latency_snapshot
+from realtime_usage import SessionUsage, extract_usage, usage_totals
+from realtime_recording import RecordingWriter, SessionRecorder, recording_available
+from realtime_coalescing import DeltaCoalescer, DEFAULT_COALESCE_TYPES, coalescing_totals
+from realtime_audio import (
+    AUDIO_APPEND_TYPE, AUDIO_DELTA_TYPE, InboundAudioAggregator, append_audio, append_message,
+    attach_audio, audio_envelope, binary_attachment, binary_audio_totals, decode_audio_delta,
+    inbound_audio_totals
+)
+from realtime_resample import StreamingResampler, resample_totals
+from realtime_vad import SilenceGate, silence_gate_totals
+from realtime_tool_stream import (
+    SentenceChunker, StreamTextExtractor, ToolAnswerPusher, answer_text, tool_stream_totals
+)
 
 # Setup logging before anything else
 setup_logging()
@@ -153,6 +182,70 @@ SOCKETIO_DEBUG_THREADS = os.environ.get('SOCKETIO_DEBUG_THREADS', 'false').lower
 AVATAR_DEBUG_INIT = os.environ.get('AVATAR_DEBUG_INIT', 'false').lower() == 'true'
 CLIENT_LOG_LEVEL = os.environ.get('CLIENT_LOG_LEVEL', 'INFO')
 
+# Realtime relay engine: 'threaded' (one websocket thread per connection) or
+# 'asyncio' (single event loop per worker multiplexing all upstream sockets)
+REALTIME_RELAY_MODE = os.environ.get('REALTIME_RELAY_MODE', 'threaded').lower()
+
+# Delta coalescing: merge consecutive deltas of the same stream into one emission
+REALTIME_COALESCE_ENABLED = os.environ.get('REALTIME_COALESCE_ENABLED', 'false').lower() == 'true'
+REALTIME_COALESCE_WINDOW_MS = float(os.environ.get('REALTIME_COALESCE_WINDOW_MS', 40))
+REALTIME_COALESCE_MAX_BYTES = int(os.environ.get('REALTIME_COALESCE_MAX_BYTES', 16384))
+REALTIME_COALESCE_TYPES = [t.strip() for t in os.environ.get('REALTIME_COALESCE_TYPES', ','.join(DEFAULT_COALESCE_TYPES)).split(',') if t.strip()]
+
+# Binary audio path: audio deltas go to the browser as raw bytes attachments and
+# the browser may send input_audio_buffer.append audio as a binary attachment
+REALTIME_BINARY_AUDIO = os.environ.get('REALTIME_BINARY_AUDIO', 'false').lower() == 'true'
+
+# Inbound mic audio aggregation: merge input_audio_buffer.append chunks into
+# upstream frames of this many ms of PCM16 (0 disables)
+REALTIME_INBOUND_AUDIO_FRAME_MS = float(os.environ.get('REALTIME_INBOUND_AUDIO_FRAME_MS', 0))
+REALTIME_INPUT_SAMPLE_RATE = int(os.environ.get('REALTIME_INPUT_SAMPLE_RATE', 24000))
+
+# Silence gate: suppress (drop) or thin out uplink mic chunks below the energy
+# threshold, keeping PREROLL_MS before speech and HANGOVER_MS after it
+REALTIME_SILENCE_GATE = os.environ.get('REALTIME_SILENCE_GATE', 'off').lower()
+REALTIME_SILENCE_THRESHOLD_DBFS = float(os.environ.get('REALTIME_SILENCE_THRESHOLD_DBFS', -50))
+REALTIME_SILENCE_PREROLL_MS = float(os.environ.get('REALTIME_SILENCE_PREROLL_MS', 300))
+REALTIME_SILENCE_HANGOVER_MS = float(os.environ.get('REALTIME_SILENCE_HANGOVER_MS', 700))
+
+# Server-side resampling: the browser sends raw capture-rate frames (float32)
+# and the relay converts them to PCM16 mono at REALTIME_INPUT_SAMPLE_RATE
+REALTIME_SERVER_RESAMPLE = os.environ.get('REALTIME_SERVER_RESAMPLE', 'false').lower() == 'true'
+
+# Warm pool of pre-opened, pre-configured upstream sessions per worker
+REALTIME_POOL_ENABLED = os.environ.get('REALTIME_POOL_ENABLED', 'false').lower() == 'true'
+REALTIME_POOL_MIN_SIZE = int(os.environ.get('REALTIME_POOL_MIN_SIZE', 1))
+REALTIME_POOL_MAX_SIZE = int(os.environ.get('REALTIME_POOL_MAX_SIZE', 8))
+REALTIME_POOL_IDLE_TTL = float(os.environ.get('REALTIME_POOL_IDLE_TTL', 240))
+REALTIME_POOL_SIZING_WINDOW = int(os.environ.get('REALTIME_POOL_SIZING_WINDOW', 300))
+REALTIME_POOL_HORIZON = float(os.environ.get('REALTIME_POOL_HORIZON', 60))
+
+# Bounded per-connection send queues (browser-bound / Azure-bound, 0 disables; opt-in)
+REALTIME_DOWNSTREAM_QUEUE_MAX = int(os.environ.get('REALTIME_DOWNSTREAM_QUEUE_MAX', 0))
+REALTIME_UPSTREAM_QUEUE_MAX = int(os.environ.get('REALTIME_UPSTREAM_QUEUE_MAX', 0))
+REALTIME_QUEUE_OVERFLOW = os.environ.get('REALTIME_QUEUE_OVERFLOW', 'block').lower()
+REALTIME_QUEUE_BLOCK_TIMEOUT_MS = float(os.environ.get('REALTIME_QUEUE_BLOCK_TIMEOUT_MS', 200))
+
+# Server-side tools: the relay executes neuro_rag function calls itself and
+# injects the output upstream; the browser is only notified (realtime_tool_call)
+REALTIME_SERVER_TOOLS = os.environ.get('REALTIME_SERVER_TOOLS', 'false').lower() == 'true'
+# Con server tools: la respuesta de neuro_rag se lee en streaming y entra a la
+# conversación por oraciones (la voz arranca con el primer fragmento)
+REALTIME_TOOL_STREAMING = os.environ.get('REALTIME_TOOL_STREAMING', 'false').lower() == 'true'
+REALTIME_TOOL_STREAM_FIRST_MIN_CHARS = int(os.environ.get('REALTIME_TOOL_STREAM_FIRST_MIN_CHARS', 20))
+REALTIME_TOOL_STREAM_MIN_CHARS = int(os.environ.get('REALTIME_TOOL_STREAM_MIN_CHARS', 60))
+REALTIME_TOOL_STREAM_MAX_CHARS = int(os.environ.get('REALTIME_TOOL_STREAM_MAX_CHARS', 280))
+# Con server tools: neuro_rag especulativo sobre la transcripción del usuario
+REALTIME_RAG_PREFETCH = os.environ.get('REALTIME_RAG_PREFETCH', 'false').lower() == 'true'
+REALTIME_RAG_PREFETCH_MAX_INFLIGHT = int(os.environ.get('REALTIME_RAG_PREFETCH_MAX_INFLIGHT', 4))
+REALTIME_RAG_PREFETCH_MIN_SIMILARITY = float(os.environ.get('REALTIME_RAG_PREFETCH_MIN_SIMILARITY', 0.6))
+
+# Binary session recording (msgpack + zstd) of every upstream/downstream event
+# into one .rtrec file per session (empty disables)
+REALTIME_RECORDING_DIR = os.environ.get('REALTIME_RECORDING_DIR', '')
+REALTIME_RECORDING_QUEUE_MAX = int(os.environ.get('REALTIME_RECORDING_QUEUE_MAX', 10000))
+REALTIME_RECORDING_ZSTD_LEVEL = int(os.environ.get('REALTIME_RECORDING_ZSTD_LEVEL', 3))
+
 # Server Configuration
 FLASK_PORT = int(os.environ.get('FLASK_PORT', 5000))
 FLASK_HOST = os.environ.get('FLASK_HOST', '0.0.0.0')
@@ -160,6 +253,57 @@ FLASK_HOST = os.environ.get('FLASK_HOST', '0.0.0.0')
 # Backend configuration - use environment variables for production
 FASTAPI_URL = os.environ.get('FASTAPI_URL', 'http://localhost:8000/ask')
 REQUEST_TIMEOUT = int(os.environ.get('REQUEST_TIMEOUT', 120))
+# Endpoint streaming del backend (/api/neuro_rag_stream y REALTIME_TOOL_STREAMING)
+FASTAPI_STREAM_URL = os.environ.get('FASTAPI_STREAM_URL', FASTAPI_URL)
+# Presupuesto (deadline) por ruta: cada reintento usa lo que queda como timeout, viaja al
+# backend en X-Request-Deadline-Ms y no se arranca un intento con menos de DEADLINE_MIN_ATTEMPT_S
+RAG_DEADLINE_S = float(os.environ.get('RAG_DEADLINE_S', REQUEST_TIMEOUT))
+RAG_STREAM_DEADLINE_S = float(os.environ.get('RAG_STREAM_DEADLINE_S', REQUEST_TIMEOUT))
+# Tools del relay: contado desde el fin del habla del usuario
+REALTIME_TOOL_DEADLINE_S = float(os.environ.get('REALTIME_TOOL_DEADLINE_S', 25))
+DEADLINE_MIN_ATTEMPT_S = float(os.environ.get('DEADLINE_MIN_ATTEMPT_S', 1.0))
+# Réplicas del backend (coma-separadas, por defecto solo FASTAPI_URL): ruteo por EWMA de
+# latencia/errores, circuit breaker por réplica y hedging opcional tras su p95
+FASTAPI_URLS = [u.strip() for u in os.environ.get('FASTAPI_URLS', FASTAPI_URL).split(',') if u.strip()] or [FASTAPI_URL]
+FASTAPI_EWMA_ALPHA = float(os.environ.get('FASTAPI_EWMA_ALPHA', 0.3))
+FASTAPI_CIRCUIT_FAILURES = int(os.environ.get('FASTAPI_CIRCUIT_FAILURES', 5))
+FASTAPI_CIRCUIT_OPEN_S = float(os.environ.get('FASTAPI_CIRCUIT_OPEN_S', 30))
+FASTAPI_HEDGE = os.environ.get('FASTAPI_HEDGE', 'false').lower() == 'true'
+FASTAPI_HEDGE_MIN_MS = float(os.environ.get('FASTAPI_HEDGE_MIN_MS', 50))
+
+# Pool de conexiones HTTP compartido (por worker) hacia FASTAPI_URL
+FASTAPI_POOL_MAX_CONNECTIONS = int(os.environ.get('FASTAPI_POOL_MAX_CONNECTIONS', 100))
+FASTAPI_POOL_MAX_KEEPALIVE = int(os.environ.get('FASTAPI_POOL_MAX_KEEPALIVE', 20))
+FASTAPI_POOL_KEEPALIVE_EXPIRY = float(os.environ.get('FASTAPI_POOL_KEEPALIVE_EXPIRY', 60))
+FASTAPI_POOL_TIMEOUT = float(os.environ.get('FASTAPI_POOL_TIMEOUT', 10))
+FASTAPI_CONNECT_TIMEOUT = float(os.environ.get('FASTAPI_CONNECT_TIMEOUT', 5))
+FASTAPI_HTTP2 = os.environ.get('FASTAPI_HTTP2', 'false').lower() == 'true'
+
+# Rutas async (/api/neuro_rag, /healthz, ...): 'background' = loop persistente por
+# worker, 'per_request' = un event loop nuevo por request (comportamiento anterior)
+ASYNC_ROUTE_MODE = os.environ.get('ASYNC_ROUTE_MODE', 'background').lower()
+
+# minipywo en proceso (process_message): threads nativos fuera del hub verde, cola
+# acotada con turno round-robin por cliente
+MINIPYWO_POOL_WORKERS = int(os.environ.get('MINIPYWO_POOL_WORKERS', 4))
+MINIPYWO_POOL_MAX_QUEUE = int(os.environ.get('MINIPYWO_POOL_MAX_QUEUE', 64))
+MINIPYWO_POOL_MAX_PER_CLIENT = int(os.environ.get('MINIPYWO_POOL_MAX_PER_CLIENT', 2))
+MINIPYWO_TIMEOUT_S = float(os.environ.get('MINIPYWO_TIMEOUT_S', REQUEST_TIMEOUT))
+# /health reutiliza el resultado de la última prueba de wl_pywo durante este tiempo
+MINIPYWO_HEALTH_TTL_S = float(os.environ.get('MINIPYWO_HEALTH_TTL_S', 60))
+
+# Cache de respuestas de neuro_rag (TTL + LRU por worker, tier en disco opcional)
+RAG_CACHE_ENABLED = os.environ.get('RAG_CACHE_ENABLED', 'false').lower() == 'true'
+RAG_CACHE_TTL_S = float(os.environ.get('RAG_CACHE_TTL_S', 3600))
+RAG_CACHE_MAX_ENTRIES = int(os.environ.get('RAG_CACHE_MAX_ENTRIES', 1000))
+RAG_CACHE_MAX_MB = float(os.environ.get('RAG_CACHE_MAX_MB', 64))
+RAG_CACHE_DISK_PATH = os.environ.get('RAG_CACHE_DISK_PATH', '')
+RAG_CACHE_DISK_MAX_ENTRIES = int(os.environ.get('RAG_CACHE_DISK_MAX_ENTRIES', 10000))
+RAG_CACHE_HEADER = 'X-RAG-Cache'
+
+# Coalescing de requests idénticos en vuelo hacia FastAPI (single-flight)
+RAG_SINGLEFLIGHT_ENABLED = os.environ.get('RAG_SINGLEFLIGHT_ENABLED', 'true').lower() == 'true'
+RAG_SINGLEFLIGHT_WAIT_S = float(os.environ.get('RAG_SINGLEFLIGHT_WAIT_S', REQUEST_TIMEOUT))
 
 # Version & Templates centralizados
 APP_VERSION = os.environ.get('APP_VERSION', '2.1.0')
@@ -181,6 +325,7 @@ def load_text_corrections():
         return [], []
 
 original_list, replacement_list = load_text_corrections()
+question_corrections = correction_map(original_list, replacement_list)
 
 # ================================
 # FLASK APPLICATION SETUP
@@ -211,8 +356,9 @@ if os.environ.get('NODE_ENV', 'production') == 'production' and CORS_ORIGIN_WILD
 CORS(app, 
      origins=cors_origins,
      supports_credentials=True,
-     expose_headers=['Content-Type', 'X-Request-Id'],
-     allow_headers=['Content-Type', 'X-Requested-With', 'Authorization'])
+     expose_headers=['Content-Type', 'X-Request-Id', 'X-RAG-Cache'],
+     allow_headers=['Content-Type', 'X-Requested-With', 'Authorization', 'X-RAG-Cache', 'Cache-Control',
+                    DEADLINE_HEADER])
 
 # SocketIO with proper configuration for Socket.IO CDN
 
@@ -269,6 +415,95 @@ logger.warning(f"Socket.IO configured: mode={_async_mode}, ping_timeout={ping_ti
 realtime_connections = {}
 realtime_threads = {}
 
+# Motor de transporte upstream compartido por todas las conexiones del worker
+realtime_relay = create_relay(REALTIME_RELAY_MODE, _async_mode)
+logger.warning(f"Realtime relay engine: {realtime_relay.mode}")
+
+# Latencia realtime_connect -> realtime_connected (ms), separada por pooled/cold
+connect_latency = HistogramSet()
+
+# Sin hub verde el motor asyncio corre los callbacks en su event loop compartido: 'block' lo frenaría
+realtime_queue_overflow = REALTIME_QUEUE_OVERFLOW
+if realtime_queue_overflow == 'block' and realtime_relay.mode == 'asyncio' and not realtime_relay.runner.green:
+    logger.warning("REALTIME_QUEUE_OVERFLOW=block is not supported with the asyncio relay in threading mode; "
+                   "using drop_audio")
+    realtime_queue_overflow = 'drop_audio'
+
+# Writer de grabaciones compartido por el worker (REALTIME_RECORDING_DIR)
+recording_writer = None
+if REALTIME_RECORDING_DIR:
+    if recording_available():
+        recording_writer = RecordingWriter(max_queue=REALTIME_RECORDING_QUEUE_MAX,
+                                           zstd_level=REALTIME_RECORDING_ZSTD_LEVEL)
+        logger.warning(f"Realtime session recording enabled: {REALTIME_RECORDING_DIR}")
+    else:
+        logger.error("REALTIME_RECORDING_DIR is set but ormsgpack/zstandard are not installed; recording disabled")
+
+# Eventos del cliente que interrumpen la respuesta en curso
+INTERRUPT_EVENT_TYPES = ('response.cancel', 'conversation.item.truncate')
+
+# Latencia de turnos con tool call (ms), por modo ('server'/'client') y etapa:
+# tool_exec = arguments.done -> function_call_output enviado upstream,
+# tool_turn = arguments.done -> primer delta de la respuesta siguiente
+tool_latency = HistogramSet()
+SERVER_TOOLS = ('neuro_rag',)
+RESPONSE_DELTA_TYPES = ('response.audio.delta', 'response.audio_transcript.delta', 'response.text.delta')
+
+def build_session_config():
+    """session.update estándar enviado al abrir cada sesión upstream (proxy y warm pool)"""
+    return {
+        "type": "session.update",
+        "session": {
+            "modalities": ["text", "audio"],
+            "instructions": "Eres un asistente de YPF. Responde en español argentino de forma clara y concisa.",
+            "voice": os.environ.get('VOICE_MODEL', 'alloy'),
+            "input_audio_format": "pcm16",
+            "output_audio_format": "pcm16",
+            "input_audio_transcription": {
+                "model": "whisper-1"
+            },
+            "turn_detection": {
+                "type": "server_vad",
+                "threshold": 0.5,
+                "prefix_padding_ms": 300,
+                "silence_duration_ms": 500
+            },
+            "tools": [{
+                "type": "function",
+                "name": "neuro_rag",
+                "description": "Consultar el sistema agentico de RAG de YPF",
+                "parameters": {
+                    "type": "object",
+                    "properties": {
+                        "query": {
+                            "type": "string",
+                            "description": "Consulta del usuario"
+                        }
+                    },
+                    "required": ["query"]
+                }
+            }]
+        }
+    }
+
+def build_realtime_url():
+    """URL del WebSocket de Azure OpenAI Realtime (incluye api-key, no loguear)"""
+    endpoint = AZURE_OPENAI_ENDPOINT.replace('https://', 'wss://').rstrip('/')
+    return f"{endpoint}/openai/realtime?api-version={AZURE_OPENAI_API_VERSION}&deployment={AZURE_OPENAI_DEPLOYMENT}&api-key={AZURE_OPENAI_API_KEY}"
+
+# Pool de sesiones upstream pre-calentadas (REALTIME_POOL_ENABLED)
+warm_pool = None
+if REALTIME_POOL_ENABLED:
+    warm_pool = WarmSessionPool(
+        open_fn=lambda **callbacks: realtime_relay.open(build_realtime_url(), **callbacks),
+        session_config_fn=build_session_config,
+        min_size=REALTIME_POOL_MIN_SIZE,
+        max_size=REALTIME_POOL_MAX_SIZE,
+        idle_ttl_s=REALTIME_POOL_IDLE_TTL,
+        sizing_window_s=REALTIME_POOL_SIZING_WINDOW,
+        horizon_s=REALTIME_POOL_HORIZON
+    )
+
 class RealtimeWebSocketProxy:
     """Clase para manejar el proxy del WebSocket de Azure OpenAI Realtime API"""
     
@@ -278,38 +513,131 @@ class RealtimeWebSocketProxy:
         self.ws = None
         self.is_connected = False
         self.thread = None
+        self.pooled = False
+        self.connect_started = None
+        self.current_response_id = None
+        # Turno con tool call en curso: {'call_id', 'mode', 'started', 'output_sent', 'first_delta'}
+        self.tool_turn = None
+        # Respuesta de neuro_rag entrando por fragmentos (REALTIME_TOOL_STREAMING)
+        self.tool_stream = None
+        # neuro_rag especulativo sobre la transcripción (REALTIME_RAG_PREFETCH)
+        self.prefetch = None
+        if REALTIME_RAG_PREFETCH and REALTIME_SERVER_TOOLS:
+            self.prefetch = RagPrefetcher(
+                background_loop, rag_prefetch_limiter,
+                fetch=lambda question: neuro_rag_call(question, client_id, self.turn_deadline()),
+                key_fn=lambda text: question_key(text, question_corrections),
+                min_similarity=REALTIME_RAG_PREFETCH_MIN_SIMILARITY
+            )
+        # Marcas de tiempo server-side de cada turno de voz
+        self.turns = TurnTimeline(client_id, on_turn=self._on_turn_completed)
+        # Tokens consumidos por la sesión (usage de cada response.done)
+        self.usage = SessionUsage(client_id)
+        # Grabación binaria opcional de la sesión (fuera del hot path)
+        self.recorder = None
+        if recording_writer is not None:
+            self.recorder = SessionRecorder(recording_writer, REALTIME_RECORDING_DIR, client_id)
         # Store reference to socketio for direct emission
         self.socketio_server = socketio
         # Store Flask app for thread-safe context
         self.app = app
+        # Handlers server-side por tipo de evento upstream (parseo completo solo para estos)
+        self.dispatcher = EventDispatcher()
+        self.dispatcher.on(['session.created', 'session.updated'], self._on_session_event)
+        self.dispatcher.on('error', self._on_upstream_error)
+        self.dispatcher.on('response.created', self._on_response_created)
+        self.dispatcher.on('input_audio_buffer.speech_started', self._on_speech_started)
+        self.dispatcher.on('response.function_call_arguments.done', self._on_function_call_done)
+        self.dispatcher.on('response.done', self._on_response_done)
+        if self.prefetch is not None:
+            self.dispatcher.on('conversation.item.input_audio_transcription.completed',
+                               self._on_transcription_completed)
+        # Colas acotadas por dirección; el audio de respuestas interrumpidas se descarta
+        self.downstream = None
+        if REALTIME_DOWNSTREAM_QUEUE_MAX > 0:
+            self.downstream = SendQueue(
+                'downstream',
+                self._deliver_downstream,
+                spawn=socketio.start_background_task,
+                max_items=REALTIME_DOWNSTREAM_QUEUE_MAX,
+                overflow=realtime_queue_overflow,
+                block_timeout_s=REALTIME_QUEUE_BLOCK_TIMEOUT_MS / 1000.0
+            )
+        self.upstream = None
+        if REALTIME_UPSTREAM_QUEUE_MAX > 0:
+            self.upstream = SendQueue(
+                'upstream',
+                self._deliver_upstream,
+                spawn=socketio.start_background_task,
+                max_items=REALTIME_UPSTREAM_QUEUE_MAX,
+                overflow=realtime_queue_overflow,
+                block_timeout_s=REALTIME_QUEUE_BLOCK_TIMEOUT_MS / 1000.0
+            )
+        # Etapa opcional de agrupación de deltas antes de emitir al navegador
+        self.coalescer = None
+        if REALTIME_COALESCE_ENABLED:
+            self.coalescer = DeltaCoalescer(
+                self.emit_message,
+                call_later=realtime_relay.call_later,
+                window_ms=REALTIME_COALESCE_WINDOW_MS,
+                max_bytes=REALTIME_COALESCE_MAX_BYTES,
+                types=REALTIME_COALESCE_TYPES,
+                emit_audio=self.emit_audio if REALTIME_BINARY_AUDIO else None
+            )
+        # Etapa opcional de agregación del audio del micrófono hacia Azure
+        self.inbound_audio = None
+        if REALTIME_INBOUND_AUDIO_FRAME_MS > 0:
+            self.inbound_audio = InboundAudioAggregator(
+                self.send,
+                frame_ms=REALTIME_INBOUND_AUDIO_FRAME_MS,
+                sample_rate=REALTIME_INPUT_SAMPLE_RATE,
+                call_later=realtime_relay.call_later
+            )
+        # Silence gate opcional del audio del micrófono (antes de la agregación)
+        self.silence_gate = None
+        if REALTIME_SILENCE_GATE in ('drop', 'thin'):
+            self.silence_gate = SilenceGate(
+                sample_rate=REALTIME_INPUT_SAMPLE_RATE,
+                threshold_dbfs=REALTIME_SILENCE_THRESHOLD_DBFS,
+                preroll_ms=REALTIME_SILENCE_PREROLL_MS,
+                hangover_ms=REALTIME_SILENCE_HANGOVER_MS,
+                mode=REALTIME_SILENCE_GATE
+            )
+        # Resampler del audio crudo del navegador (se crea con el primer chunk)
+        self.resampler = None
         
     def connect(self):
         """Establece conexión con Azure OpenAI Realtime API"""
+        self.connect_started = time.monotonic()
         try:
-            # Construir la URL del WebSocket
-            endpoint = AZURE_OPENAI_ENDPOINT.replace('https://', 'wss://').rstrip('/')
-            deployment = AZURE_OPENAI_DEPLOYMENT
-            api_version = AZURE_OPENAI_API_VERSION
-            api_key = AZURE_OPENAI_API_KEY
+            # Sesión pre-calentada y ya configurada del warm pool, si hay una disponible
+            if warm_pool is not None:
+                pooled = warm_pool.lease(self)
+                if pooled is not None:
+                    logger.info(f"Leased warm Realtime session for client {self.client_id}")
+                    self.ws = pooled.ws
+                    self.pooled = True
+                    self.is_connected = True
+                    self._emit_connected()
+                    # Reenvía session.created/session.updated recibidos mientras estaba ociosa
+                    pooled.attach(self)
+                    return True
             
-            ws_url = f"{endpoint}/openai/realtime?api-version={api_version}&deployment={deployment}&api-key={api_key}"
+            # Construir la URL del WebSocket
+            ws_url = build_realtime_url()
             
             logger.info(f"Connecting to Realtime API for client {self.client_id}")
-            logger.debug(f"WebSocket URL: {endpoint}/openai/realtime")
+            logger.debug(f"WebSocket URL: {AZURE_OPENAI_ENDPOINT.rstrip('/')}/openai/realtime")
             
-            # Crear WebSocket
-            self.ws = websocket.WebSocketApp(
+            # Crear WebSocket sobre el motor de relay configurado
+            self.ws = realtime_relay.open(
                 ws_url,
                 on_open=self.on_open,
                 on_message=self.on_message,
                 on_error=self.on_error,
                 on_close=self.on_close
             )
-            
-            # Ejecutar en thread separado
-            self.thread = threading.Thread(target=self.ws.run_forever)
-            self.thread.daemon = True
-            self.thread.start()
+            self.thread = getattr(self.ws, 'thread', None)
             
             return True
             
@@ -336,40 +664,7 @@ class RealtimeWebSocketProxy:
             logger.debug(f"[SOCKETIO-ROOM] Verifying client socket is in correct room")
         
         # Enviar configuración inicial de sesión
-        initial_config = {
-            "type": "session.update",
-            "session": {
-                "modalities": ["text", "audio"],
-                "instructions": "Eres un asistente de YPF. Responde en español argentino de forma clara y concisa.",
-                "voice": os.environ.get('VOICE_MODEL', 'alloy'),
-                "input_audio_format": "pcm16",
-                "output_audio_format": "pcm16",
-                "input_audio_transcription": {
-                    "model": "whisper-1"
-                },
-                "turn_detection": {
-                    "type": "server_vad",
-                    "threshold": 0.5,
-                    "prefix_padding_ms": 300,
-                    "silence_duration_ms": 500
-                },
-                "tools": [{
-                    "type": "function",
-                    "name": "neuro_rag",
-                    "description": "Consultar el sistema agentico de RAG de YPF",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "query": {
-                                "type": "string",
-                                "description": "Consulta del usuario"
-                            }
-                        },
-                        "required": ["query"]
-                    }
-                }]
-            }
-        }
+        initial_config = build_session_config()
         
         logger.info(f"[REALTIME] Sending initial session configuration for client {self.client_id}")
         
@@ -383,92 +678,76 @@ class RealtimeWebSocketProxy:
         if SOCKETIO_DEBUG_EVENTS:
             logger.debug(f"[REALTIME] Session update command sent to Realtime API for client {self.client_id}")
         
+        self._emit_connected()
+    
+    def _emit_connected(self):
+        """Notifica realtime_connected al navegador y registra la latencia de conexión"""
+        if self.connect_started is not None:
+            connect_latency.observe('pooled' if self.pooled else 'cold', (time.monotonic() - self.connect_started) * 1000)
+        
         # Enhanced Socket.IO emission with room tracking
         event_data = {
             'status': 'connected',
             'client_id': self.client_id,
-            'session_configured': True
+            'session_configured': True,
+            'pooled': self.pooled
         }
         
         if SOCKETIO_DEBUG_EVENTS:
             logger.debug(f"[SOCKETIO-EMIT] Emitting 'realtime_connected' to room {self.sid}")
             logger.debug(f"[SOCKETIO-EMIT] Event data: {event_data}")
         
-        # Thread-safe emission from WebSocket callback thread
-        try:
-            with self.app.app_context():
-                # Use global socketio instance with explicit namespace
-                socketio.emit('realtime_connected', event_data, room=self.sid, namespace='/')
-                
-                if SOCKETIO_DEBUG_EVENTS:
-                    logger.debug(f"[SOCKETIO-EMIT] Successfully emitted 'realtime_connected' to room {self.sid}")
-                if SOCKETIO_DEBUG_THREADS:
-                    logger.debug(f"[SOCKETIO-THREAD] Emitted from thread: {threading.current_thread().name}")
-        except Exception as e:
-            logger.error(f"[SOCKETIO-EMIT] Error emitting realtime_connected: {e}")
-            if SOCKETIO_DEBUG_THREADS:
-                logger.error(f"[SOCKETIO-THREAD] Thread: {threading.current_thread().name}")
+        self._emit_downstream('realtime_connected', event_data)
     
     def on_message(self, ws, message):
         """Callback cuando se recibe un mensaje"""
         try:
+            # Solo se lee el "type" del prefijo; el JSON completo se parsea bajo demanda
+            event = UpstreamEvent(message)
+            msg_type = event.type
+            if self.recorder is not None:
+                self.recorder.record('downstream', message)
+            if ENABLE_METRICS and self.client_id in session_metrics:
+                session_metrics[self.client_id]['realtime_messages'] += 1
+
             # Enhanced logging for Socket.IO event emission
             if SOCKETIO_DEBUG_EVENTS:
-                msg_data = json.loads(message) if isinstance(message, str) else message
-                msg_type = msg_data.get('type', 'unknown')
                 logger.debug(f"[SOCKETIO] Emitting realtime_message to client {self.client_id} (SID: {self.sid}) - Event type: {msg_type}")
             
-            # Prepare message data
-            message_data = {
-                'data': message,
-                'client_id': self.client_id
-            }
+            # Lógica server-side (sesión, errores, function calls, usage)
+            if self.dispatcher.handles(msg_type):
+                self.dispatcher.dispatch(event)
+            if msg_type in TURN_EVENT_TYPES:
+                self.turns.on_event(msg_type)
+            if self.tool_turn is not None and msg_type in RESPONSE_DELTA_TYPES:
+                self._observe_tool_turn(msg_type)
             
-            # Enhanced room-based emission with debugging
-            if SOCKETIO_DEBUG_EVENTS:
-                logger.debug(f"[SOCKETIO-ROOM-EMIT] About to emit 'realtime_message' to room: {self.sid}")
-                logger.debug(f"[SOCKETIO-ROOM-EMIT] Client ID: {self.client_id}, Message type: {msg_type}")
-            
-            # Use thread-safe emission for realtime messages from WebSocket thread
-            try:
-                with self.app.app_context():
-                    # Use global socketio instance with explicit namespace for thread safety
-                    socketio.emit('realtime_message', message_data, room=self.sid, namespace='/')
-                    
-                    if SOCKETIO_DEBUG_EVENTS:
-                        logger.debug(f"[SOCKETIO-EMIT] realtime_message emitted to room {self.sid}")
-                    if SOCKETIO_DEBUG_THREADS:
-                        logger.debug(f"[SOCKETIO-THREAD] Message emitted from thread {threading.current_thread().name}")
-            except Exception as e:
-                logger.error(f"[SOCKETIO-EMIT] Error emitting realtime_message: {e}")
-                if SOCKETIO_DEBUG_THREADS:
-                    logger.error(f"[SOCKETIO-THREAD] Thread: {threading.current_thread().name}, SID: {self.sid}")
-            
-            # Log successful emission
-            if SOCKETIO_DEBUG_EVENTS:
-                logger.debug(f"[SOCKETIO-ROOM-EMIT] Successfully emitted 'realtime_message' to room {self.sid}")
+            if self.coalescer is not None:
+                # Los deltas se agrupan; el resto de eventos vacía lo pendiente y sale en orden
+                self.coalescer.push(message, msg_type, event.data if msg_type in self.coalescer.types else None)
+            elif REALTIME_BINARY_AUDIO and msg_type == AUDIO_DELTA_TYPE:
+                self.emit_audio(event.data, decode_audio_delta(event.data))
+            else:
+                self.emit_message(message)
             
             if ENABLE_DETAILED_LOGGING:
-                msg_data = json.loads(message)
-                msg_type = msg_data.get('type', 'unknown')
-                
                 # Log detallado según el tipo de mensaje
                 if msg_type == 'session.created':
                     logger.info(f"[REALTIME] Session created for client {self.client_id}")
-                    logger.debug(f"[REALTIME] Session details: {json.dumps(msg_data.get('session', {}), indent=2)}")
+                    logger.debug(f"[REALTIME] Session details: {json.dumps(event.data.get('session', {}), indent=2)}")
                 elif msg_type == 'session.updated':
                     logger.info(f"[REALTIME] Session updated for client {self.client_id}")
                     # Forward session.updated event to client for Avatar initialization
                     if SOCKETIO_DEBUG_EVENTS:
                         logger.debug(f"[REALTIME] Forwarding session.updated to client {self.client_id}")
                 elif msg_type == 'conversation.item.created':
-                    logger.info(f"[REALTIME] Conversation item created: {msg_data.get('item', {}).get('type', 'unknown')}")
+                    logger.info(f"[REALTIME] Conversation item created: {event.data.get('item', {}).get('type', 'unknown')}")
                 elif msg_type == 'response.created':
-                    logger.info(f"[REALTIME] Response created with ID: {msg_data.get('response', {}).get('id', 'unknown')}")
+                    logger.info(f"[REALTIME] Response created with ID: {event.data.get('response', {}).get('id', 'unknown')}")
                 elif msg_type == 'response.done':
                     logger.info(f"[REALTIME] Response completed for client {self.client_id}")
                 elif msg_type == 'error':
-                    logger.error(f"[REALTIME] Error received: {msg_data.get('error', {})}")
+                    logger.error(f"[REALTIME] Error received: {event.data.get('error', {})}")
                 elif msg_type == 'response.audio.delta':
                     # Only log audio delta if explicitly enabled (high volume logs)
                     if ENABLE_AUDIO_DELTA_LOGGING:
@@ -479,6 +758,240 @@ class RealtimeWebSocketProxy:
         except Exception as e:
             logger.error(f"Error processing Realtime message: {e}")
     
+    def emit_message(self, message):
+        """Emite un evento upstream (JSON crudo) al navegador como realtime_message"""
+        # Prepare message data
+        message_data = {
+            'data': message,
+            'client_id': self.client_id
+        }
+        # El tipo solo hace falta para clasificar el evento en la cola
+        msg_type = sniff_event_type(message) if self.downstream is not None else None
+        self._emit_downstream('realtime_message', message_data, msg_type)
+    
+    def emit_audio(self, meta, audio):
+        """Emite un audio delta como adjunto binario (PCM16 crudo) + sobre de metadatos"""
+        message_data = {
+            'data': audio_envelope(meta, audio),
+            'audio': audio,
+            'client_id': self.client_id
+        }
+        self._emit_downstream('realtime_message', message_data, AUDIO_DELTA_TYPE)
+    
+    def _emit_downstream(self, event, data, msg_type=None):
+        """Emite al navegador, a través de la cola acotada si está habilitada"""
+        if self.downstream is None:
+            self._deliver_downstream((event, data))
+            return
+        audio = msg_type == AUDIO_DELTA_TYPE
+        self.downstream.put((event, data), msg_type or event, droppable=audio,
+                            response_id=self.current_response_id if audio else None)
+    
+    def _deliver_downstream(self, item):
+        event, data = item
+        # Use thread-safe emission from WebSocket thread / queue drain task
+        try:
+            with self.app.app_context():
+                # Use global socketio instance with explicit namespace for thread safety
+                socketio.emit(event, data, room=self.sid, namespace='/')
+                
+                if SOCKETIO_DEBUG_EVENTS:
+                    logger.debug(f"[SOCKETIO-EMIT] {event} emitted to room {self.sid}")
+                if SOCKETIO_DEBUG_THREADS:
+                    logger.debug(f"[SOCKETIO-THREAD] {event} emitted from thread {threading.current_thread().name}")
+        except Exception as e:
+            logger.error(f"[SOCKETIO-EMIT] Error emitting {event}: {e}")
+            if SOCKETIO_DEBUG_THREADS:
+                logger.error(f"[SOCKETIO-THREAD] Thread: {threading.current_thread().name}, SID: {self.sid}")
+    
+    def _on_session_event(self, event):
+        if self.client_id in client_sessions:
+            client_sessions[self.client_id]['realtime_connected'] = True
+            client_sessions[self.client_id]['last_activity'] = datetime.now().isoformat()
+    
+    def _on_response_created(self, event):
+        self.current_response_id = event.data.get('response', {}).get('id')
+        self.usage.response_created()
+    
+    def _on_transcription_completed(self, event):
+        transcript = (event.data.get('transcript') or '').strip()
+        if not transcript or (self.tool_turn is not None and not self.tool_turn['output_sent']):
+            # Si la tool ya fue llamada, especular llega tarde
+            return
+        if self.prefetch.start(correct_transcript(transcript)):
+            logger.debug(f"[PREFETCH] Speculative neuro_rag started for client {self.client_id}")
+    
+    def _on_response_done(self, event):
+        if self.prefetch is not None:
+            # Respuesta sin tool call (o tool ya servida): la especulación no se usará
+            self.prefetch.cancel()
+        stream = self.tool_stream
+        if stream is not None:
+            # Fin de la respuesta activa: sale el siguiente fragmento acumulado
+            stream.response_done()
+            if stream.done:
+                self.tool_stream = None
+        # Solo se parsea el objeto usage, no los items de output
+        flat = self.usage.response_done(extract_usage(event))
+        if flat is None:
+            return
+        if ENABLE_METRICS and self.client_id in session_metrics:
+            session_metrics[self.client_id]['usage'] = self.usage.snapshot()
+        if ENABLE_DETAILED_LOGGING:
+            logger.debug(f"[USAGE] Client {self.client_id}: in={flat['input_tokens']} out={flat['output_tokens']} "
+                         f"(session in={self.usage.counters['input_tokens']} out={self.usage.counters['output_tokens']})")
+    
+    def _on_speech_started(self, event):
+        # Barge-in: el audio pendiente de la respuesta en curso ya no se reproducirá
+        self.interrupt()
+    
+    def interrupt(self):
+        """Descarta el audio encolado de la respuesta en curso y el que llegue después"""
+        stream = self.tool_stream
+        if stream is not None and stream.cancel():
+            logger.info(f"[TOOL] Barge-in: streamed neuro_rag answer cancelled for client {self.client_id}")
+        if self.downstream is not None and self.current_response_id:
+            dropped = self.downstream.mark_interrupted(self.current_response_id)
+            if dropped and SOCKETIO_DEBUG_EVENTS:
+                logger.debug(f"[QUEUE] Dropped {dropped} stale audio deltas for client {self.client_id}")
+    
+    def _on_function_call_done(self, event):
+        data = event.data
+        call_id = data.get('call_id')
+        name = data.get('name') or 'neuro_rag'
+        mode = 'server' if REALTIME_SERVER_TOOLS and name in SERVER_TOOLS else 'client'
+        if mode == 'server' and REALTIME_TOOL_STREAMING:
+            mode = 'server_stream'
+        self.tool_turn = {'call_id': call_id, 'mode': mode, 'started': time.monotonic(), 'output_sent': False,
+                          'first_delta': False}
+        if mode == 'client':
+            return
+        # Antes del response.done de esta respuesta, que descarta especulaciones sin usar
+        query = parse_tool_arguments(data.get('arguments')).get('query', '')
+        speculation = self.prefetch.match(query) if self.prefetch is not None else None
+        if mode == 'server_stream':
+            # Se crea antes del response.done de esta respuesta (el pusher espera a que termine)
+            self.tool_stream = ToolAnswerPusher(self.send, call_id, query)
+            socketio.start_background_task(self._run_streaming_tool, self.tool_stream, name, speculation)
+        else:
+            # Fuera del hilo del socket upstream: la llamada al backend puede tardar segundos
+            socketio.start_background_task(self._run_server_tool, call_id, name, query, speculation)
+    
+    def turn_deadline(self):
+        """Presupuesto de neuro_rag para el turno actual, desde el fin del habla del usuario"""
+        return Deadline('realtime_tool', REALTIME_TOOL_DEADLINE_S, started=self.turns.turn_started())
+    
+    def _run_server_tool(self, call_id, name, query, speculation=None):
+        """Ejecuta neuro_rag contra FASTAPI_URL e inyecta el resultado en la conversación"""
+        self._emit_downstream('realtime_tool_call', {
+            'status': 'started', 'call_id': call_id, 'name': name, 'client_id': self.client_id
+        })
+        started = time.monotonic()
+        deadline = self.turn_deadline()
+        result = None
+        if speculation is not None:
+            result = self.prefetch.result(speculation, query, timeout=deadline.remaining())
+        if result is None:
+            result = execute_neuro_rag(query, self.client_id, deadline)
+        duration_ms = (time.monotonic() - started) * 1000
+        
+        self.send({
+            "type": "conversation.item.create",
+            "item": {
+                "type": "function_call_output",
+                "call_id": call_id,
+                "output": json.dumps(result)
+            }
+        })
+        self.send({"type": "response.create"})
+        self._emit_downstream('realtime_tool_call', {
+            'status': result.get('status'), 'call_id': call_id, 'name': name,
+            'duration_ms': round(duration_ms, 1), 'client_id': self.client_id,
+            'prefetched': bool(result.get('prefetched'))
+        })
+    
+    def _run_streaming_tool(self, pusher, name, speculation=None):
+        """neuro_rag en streaming: cada oración que llega entra a la conversación"""
+        self._emit_downstream('realtime_tool_call', {
+            'status': 'started', 'call_id': pusher.call_id, 'name': name, 'client_id': self.client_id,
+            'streaming': True
+        })
+        chunker = SentenceChunker(min_chars=REALTIME_TOOL_STREAM_MIN_CHARS,
+                                  first_min_chars=REALTIME_TOOL_STREAM_FIRST_MIN_CHARS,
+                                  max_chars=REALTIME_TOOL_STREAM_MAX_CHARS)
+        started = time.monotonic()
+        deadline = self.turn_deadline()
+        error = None
+        prefetched = None
+        if speculation is not None:
+            prefetched = self.prefetch.result(speculation, pusher.query, timeout=deadline.remaining())
+        # Respuesta especulativa ya completa: se fragmenta igual, sin llamar al backend
+        text_stream = (iter([answer_text(prefetched.get('data'))]) if prefetched is not None
+                       else stream_neuro_rag(pusher.query, self.client_id, deadline))
+        try:
+            for text in text_stream:
+                if pusher.cancelled:
+                    break
+                for chunk in chunker.feed(text):
+                    pusher.push(chunk)
+            else:
+                for chunk in chunker.flush():
+                    pusher.push(chunk)
+        except Exception as e:
+            error = str(e)
+            error_logger.error(f"[TOOL] Streamed neuro_rag failed for client {self.client_id}: {e}")
+        finally:
+            # Cerrar el generador cancela la llamada upstream si quedó a medias (barge-in)
+            if prefetched is None:
+                text_stream.close()
+        pusher.finish(error)
+        if pusher.done and self.tool_stream is pusher:
+            self.tool_stream = None
+        self._emit_downstream('realtime_tool_call', {
+            'status': 'cancelled' if pusher.cancelled else ('error' if error else 'success'),
+            'call_id': pusher.call_id, 'name': name, 'chunks': pusher.chunks,
+            'duration_ms': round((time.monotonic() - started) * 1000, 1), 'client_id': self.client_id,
+            'streaming': True, 'prefetched': prefetched is not None
+        })
+    
+    def _observe_tool_output(self, message):
+        turn = self.tool_turn
+        if turn is None or turn['output_sent']:
+            return
+        item = message.get('item') or {}
+        if item.get('type') == 'function_call_output' and item.get('call_id') == turn['call_id']:
+            turn['output_sent'] = True
+            tool_latency.observe(f"{turn['mode']}.tool_exec", (time.monotonic() - turn['started']) * 1000)
+            self.turns.rag_returned()
+    
+    def _observe_tool_turn(self, msg_type):
+        turn = self.tool_turn
+        if not turn['output_sent']:
+            return
+        duration_ms = (time.monotonic() - turn['started']) * 1000
+        if not turn['first_delta']:
+            turn['first_delta'] = True
+            tool_latency.observe(f"{turn['mode']}.tool_turn", duration_ms)
+        if msg_type != AUDIO_DELTA_TYPE:
+            return
+        # Métrica principal: function call -> primer audio de la respuesta con el resultado
+        self.tool_turn = None
+        tool_latency.observe(f"{turn['mode']}.first_spoken_word", duration_ms)
+        performance_logger.info(f"[TOOL] {turn['mode']} tool turn for client {self.client_id}: "
+                                f"first spoken word after {duration_ms:.0f}ms")
+    
+    def _on_turn_completed(self, stages):
+        if ENABLE_METRICS and self.client_id in session_metrics:
+            metrics = session_metrics[self.client_id]
+            metrics['turns'] = metrics.get('turns', 0) + 1
+            metrics['last_turn_ms'] = stages
+    
+    def _on_upstream_error(self, event):
+        if ENABLE_METRICS and self.client_id in session_metrics:
+            session_metrics[self.client_id]['errors'] += 1
+        if not ENABLE_DETAILED_LOGGING:
+            logger.warning(f"[REALTIME] Upstream error for client {self.client_id}: {event.data.get('error', {})}")
+    
     def on_error(self, ws, error):
         """Callback cuando ocurre un error"""
         logger.error(f"Realtime WebSocket error for client {self.client_id}: {error}")
@@ -491,36 +1004,103 @@ class RealtimeWebSocketProxy:
         """Callback cuando se cierra la conexión"""
         logger.info(f"Realtime WebSocket closed for client {self.client_id} (code: {close_status_code}, msg: {close_msg})")
         self.is_connected = False
+        if self.coalescer is not None:
+            self.coalescer.flush()
+        if self.upstream is not None:
+            self.upstream.close(discard_pending=True)
+        if self.recorder is not None:
+            self.recorder.close()
         try:
-            # Use both emission strategies for closed event
             closed_data = {
                 'status': 'disconnected',
                 'client_id': self.client_id,
                 'code': close_status_code,
                 'message': close_msg
             }
-            self.socketio_server.emit('realtime_closed', closed_data, room=self.sid)
-            self.socketio_server.emit('realtime_closed', closed_data, to=self.sid)
+            if self.downstream is not None:
+                # Detrás de los mensajes pendientes; la cola termina de drenar y se cierra
+                self._emit_downstream('realtime_closed', closed_data)
+                self.downstream.close()
+            else:
+                # Use both emission strategies for closed event
+                self.socketio_server.emit('realtime_closed', closed_data, room=self.sid)
+                self.socketio_server.emit('realtime_closed', closed_data, to=self.sid)
         except Exception as e:
             logger.error(f"Error emitting realtime_closed: {e}")
     
     def send(self, message):
         """Envía un mensaje al WebSocket de Azure"""
         if self.ws and self.is_connected:
-            try:
-                if isinstance(message, dict):
-                    message = json.dumps(message)
-                self.ws.send(message)
-                return True
-            except Exception as e:
-                logger.error(f"Error sending message to Realtime API: {e}")
-                return False
+            msg_type = message.get('type') if isinstance(message, dict) else sniff_event_type(message)
+            if self.recorder is not None:
+                self.recorder.record('upstream', message)
+            if msg_type in INTERRUPT_EVENT_TYPES:
+                self.interrupt()
+            elif msg_type == 'conversation.item.create' and isinstance(message, dict):
+                self._observe_tool_output(message)
+            if self.upstream is not None:
+                # El audio del micrófono es descartable ante backpressure; el control nunca
+                return self.upstream.put(message, msg_type, droppable=msg_type == AUDIO_APPEND_TYPE)
+            return self._deliver_upstream(message)
         else:
             logger.warning(f"Cannot send message - WebSocket not connected for client {self.client_id}")
             return False
     
+    def send_mic_audio(self, message, audio=None):
+        """Pasa un input_audio_buffer.append del navegador por el resampler y el silence gate"""
+        # Los adjuntos solo cuentan como ahorro de base64 con el camino binario habilitado
+        pcm = append_audio(message, audio, count=REALTIME_BINARY_AUDIO)
+        if REALTIME_SERVER_RESAMPLE and ('sample_rate' in message or 'encoding' in message):
+            pcm = self.resample_mic_audio(message, pcm)
+        chunks = self.silence_gate.process(pcm) if self.silence_gate is not None else [pcm]
+        sent = True
+        for chunk in chunks:
+            if not chunk:
+                continue
+            if self.inbound_audio is not None:
+                sent = self.inbound_audio.push({'type': AUDIO_APPEND_TYPE}, chunk) and sent
+            else:
+                sent = self.send(append_message(chunk)) and sent
+        return sent
+    
+    def resample_mic_audio(self, message, raw):
+        """Convierte frames crudos (sample_rate/encoding/channels del mensaje) a PCM16 de la sesión"""
+        in_rate = int(message.get('sample_rate') or REALTIME_INPUT_SAMPLE_RATE)
+        encoding = message.get('encoding') or 'int16'
+        channels = int(message.get('channels') or 1)
+        resampler = self.resampler
+        if resampler is None or (resampler.in_rate, resampler.input_format, resampler.channels) != (in_rate, encoding, channels):
+            # Primer chunk o cambio de dispositivo: nuevo estado de filtro
+            resampler = StreamingResampler(in_rate, out_rate=REALTIME_INPUT_SAMPLE_RATE,
+                                           channels=channels, input_format=encoding)
+            self.resampler = resampler
+            logger.info(f"[RESAMPLE] Client {self.client_id}: {encoding} {in_rate} Hz x{channels} -> "
+                        f"pcm16 {REALTIME_INPUT_SAMPLE_RATE} Hz ({resampler.up}/{resampler.down}, "
+                        f"{resampler.taps} taps/phase)")
+        return resampler.process(raw)
+    
+    def _deliver_upstream(self, message):
+        try:
+            if isinstance(message, dict):
+                message = json.dumps(message)
+            self.ws.send(message)
+            return True
+        except Exception as e:
+            logger.error(f"Error sending message to Realtime API: {e}")
+            return False
+    
     def close(self):
         """Cierra la conexión WebSocket"""
+        if self.prefetch is not None:
+            self.prefetch.cancel()
+        if self.tool_stream is not None:
+            self.tool_stream.cancel()
+        if self.coalescer is not None:
+            self.coalescer.flush()
+        if self.inbound_audio is not None:
+            self.inbound_audio.flush()
+        if self.upstream is not None:
+            self.upstream.close(discard_pending=True)
         if self.ws:
             try:
                 self.ws.close()
@@ -607,7 +1187,21 @@ def handle_realtime_send(data):
     
     try:
         proxy = realtime_connections[client_id]
-        if proxy.send(message):
+        # Audio del micrófono recibido como adjunto binario (REALTIME_BINARY_AUDIO)
+        audio = data.get('audio')
+        is_append = isinstance(message, dict) and message.get('type') == AUDIO_APPEND_TYPE
+        if is_append and (proxy.silence_gate is not None or (
+                REALTIME_SERVER_RESAMPLE and ('sample_rate' in message or 'encoding' in message))):
+            sent = proxy.send_mic_audio(message, audio)
+        elif proxy.inbound_audio is not None:
+            if audio is not None:
+                audio = binary_attachment(audio, count=REALTIME_BINARY_AUDIO)
+            sent = proxy.inbound_audio.push(message, audio)
+        else:
+            if audio is not None and isinstance(message, dict):
+                message = attach_audio(message, audio, count=REALTIME_BINARY_AUDIO)
+            sent = proxy.send(message)
+        if sent:
             if ENABLE_DETAILED_LOGGING:
                 msg_type = message.get('type', 'unknown') if isinstance(message, dict) else 'raw'
                 # Solo loguear mensajes que no sean audio
@@ -881,6 +1475,10 @@ def get_voice_live_config():
                 "enableCompression": True,
                 "avatarDebugWebrtc": AVATAR_DEBUG_WEBRTC,
                 "socketioDebugEvents": SOCKETIO_DEBUG_EVENTS,
+                "binaryAudio": REALTIME_BINARY_AUDIO,
+                "serverResample": REALTIME_SERVER_RESAMPLE,
+                "serverTools": REALTIME_SERVER_TOOLS,
+                "toolStreaming": REALTIME_SERVER_TOOLS and REALTIME_TOOL_STREAMING,
                 "avatarDebugInit": AVATAR_DEBUG_INIT,
                 "clientLogLevel": CLIENT_LOG_LEVEL
             },
@@ -1019,23 +1617,35 @@ def get_avatar_relay():
 
 # ==== minipywo API (sin cambios funcionales) ====
 
+# Loop asyncio de larga vida por worker: corre las rutas async y el pool HTTP hacia FastAPI
+background_loop = BackgroundLoop(async_mode=_async_mode, name='async-route-loop')
+
 # Decorator to make Flask routes asynchronous with logging
 def async_route(f):
     @wraps(f)
     def wrapper(*args, **kwargs):
         logger.debug(f"Starting async route: {f.__name__}")
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
+        if ASYNC_ROUTE_MODE == 'per_request':
+            # Modo legacy: un event loop nuevo por request
+            loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(loop)
+            try:
+                result = loop.run_until_complete(f(*args, **kwargs))
+                logger.debug(f"Completed async route: {f.__name__}")
+                return result
+            except Exception as e:
+                error_logger.error(f"Error in async route {f.__name__}: {str(e)}", exc_info=True)
+                raise
+            finally:
+                loop.close()
+                logger.debug(f"Closed event loop for route: {f.__name__}")
         try:
-            result = loop.run_until_complete(f(*args, **kwargs))
+            result = background_loop.run(f(*args, **kwargs))
             logger.debug(f"Completed async route: {f.__name__}")
             return result
         except Exception as e:
             error_logger.error(f"Error in async route {f.__name__}: {str(e)}", exc_info=True)
             raise
-        finally:
-            loop.close()
-            logger.debug(f"Closed event loop for route: {f.__name__}")
     return wrapper
 
 # Helper function to safely log JSON data
@@ -1053,6 +1663,216 @@ def safe_json_log(data, max_length=1000):
 def generate_request_id():
     return f"{datetime.utcnow().strftime('%Y%m%d%H%M%S')}-{str(time.time()).replace('.', '')[-6:]}"
 
+# Cliente HTTP compartido (keep-alive) para todas las llamadas a FastAPI del worker
+backend_http = BackendClientPool(
+    background_loop,
+    timeout=REQUEST_TIMEOUT,
+    connect_timeout=FASTAPI_CONNECT_TIMEOUT,
+    pool_timeout=FASTAPI_POOL_TIMEOUT,
+    max_connections=FASTAPI_POOL_MAX_CONNECTIONS,
+    max_keepalive_connections=FASTAPI_POOL_MAX_KEEPALIVE,
+    keepalive_expiry=FASTAPI_POOL_KEEPALIVE_EXPIRY,
+    http2=FASTAPI_HTTP2
+)
+# Estado de réplicas compartido entre el loop de fondo y /metrics (threads verdes)
+backend_router = BackendRouter(
+    FASTAPI_URLS,
+    background_loop.native_lock(),
+    ewma_alpha=FASTAPI_EWMA_ALPHA,
+    failure_threshold=FASTAPI_CIRCUIT_FAILURES,
+    open_s=FASTAPI_CIRCUIT_OPEN_S,
+    hedge=FASTAPI_HEDGE,
+    hedge_min_ms=FASTAPI_HEDGE_MIN_MS
+)
+rag_single_flight = SingleFlight(lock=background_loop.native_lock())
+minipywo_pool = FairBlockingPool(
+    background_loop,
+    workers=MINIPYWO_POOL_WORKERS,
+    max_queue=MINIPYWO_POOL_MAX_QUEUE,
+    max_per_client=MINIPYWO_POOL_MAX_PER_CLIENT,
+    name='minipywo-pool'
+)
+rag_prefetch_limiter = PrefetchLimiter(REALTIME_RAG_PREFETCH_MAX_INFLIGHT, background_loop.native_lock())
+# El cache se usa desde el loop de fondo (rutas y tools del relay); SQLite va en un thread nativo aparte
+rag_cache = RagAnswerCache.from_lists(
+    original_list, replacement_list,
+    ttl_s=RAG_CACHE_TTL_S,
+    max_entries=RAG_CACHE_MAX_ENTRIES,
+    max_bytes=int(RAG_CACHE_MAX_MB * 1024 * 1024),
+    disk_path=RAG_CACHE_DISK_PATH,
+    disk_max_entries=RAG_CACHE_DISK_MAX_ENTRIES,
+    lock_factory=background_loop.native_lock,
+    start_thread=background_loop.start_native_thread
+) if RAG_CACHE_ENABLED else None
+atexit.register(background_loop.shutdown)
+atexit.register(backend_http.close)
+atexit.register(minipywo_pool.close)
+if rag_cache is not None:
+    atexit.register(rag_cache.close)
+
+def rag_cache_bypassed(headers):
+    """X-RAG-Cache: bypass (o Cache-Control: no-cache) fuerza la llamada al backend y refresca la entrada"""
+    if headers.get(RAG_CACHE_HEADER, '').lower() == 'bypass':
+        return True
+    return 'no-cache' in headers.get('Cache-Control', '').lower()
+
+def singleflight_key(payload):
+    """Misma clave que el cache (pregunta corregida y plegada); session_id no separa vuelos"""
+    return question_key(payload.get('question'), question_corrections)
+
+def parse_tool_arguments(arguments):
+    try:
+        args = json.loads(arguments or '{}')
+    except (TypeError, ValueError):
+        return {}
+    return args if isinstance(args, dict) else {}
+
+def first_spoken_word_snapshot():
+    """tool call -> primer audio de la respuesta, por modo (client/server/server_stream)"""
+    return {name.split('.')[0]: snap for name, snap in tool_latency.snapshot().items()
+            if name.endswith('.first_spoken_word')}
+
+def stream_neuro_rag(query, session_id, deadline):
+    """
+    Texto de la respuesta de neuro_rag a medida que llega de FASTAPI_STREAM_URL.
+    Sin reintentos: una respuesta a medias ya se está hablando.
+    Se corta (y se cancela upstream) cuando se agota el deadline del turno.
+    """
+    if not query:
+        raise ValueError('Missing required argument: query')
+    deadline.check(DEADLINE_MIN_ATTEMPT_S)
+    count_deadline(deadline.route, attempts=1)
+    payload = {"question": query, "session_id": session_id}
+    upstream = {}
+    
+    def on_response(response):
+        upstream['status'] = response.status_code
+        upstream['extractor'] = StreamTextExtractor(response.headers.get('content-type', ''))
+    
+    error_body = b''
+    chunks = backend_http.stream_sync('POST', FASTAPI_STREAM_URL, on_response=on_response, json=payload,
+                                      **backend_call_options(deadline))
+    streamed = within(chunks, deadline)
+    try:
+        for chunk in streamed:
+            if upstream['status'] >= 400:
+                error_body += chunk
+                continue
+            text = upstream['extractor'].feed(chunk)
+            if text:
+                yield text
+    finally:
+        streamed.close()
+        chunks.close()
+    if upstream.get('status', 200) >= 400:
+        raise RuntimeError(f"HTTP {upstream['status']}: {error_body[:500].decode('utf-8', errors='replace')}")
+    if 'extractor' in upstream:
+        tail = upstream['extractor'].flush()
+        if tail:
+            yield tail
+    deadline.finish()
+
+def backend_call_options(deadline):
+    """Timeout (lo que queda del presupuesto) y header de deadline para un intento al backend"""
+    left = min(deadline.remaining(), REQUEST_TIMEOUT)
+    return {
+        'timeout': httpx.Timeout(left, connect=min(FASTAPI_CONNECT_TIMEOUT, left), pool=min(FASTAPI_POOL_TIMEOUT, left)),
+        'headers': deadline.header()
+    }
+
+def retry_wait(attempt, base_backoff, tried):
+    """Sin espera si queda otra réplica sana sin probar; si no, backoff exponencial"""
+    if backend_router.has_alternative(tried):
+        return 0.0
+    return base_backoff * (2 ** (attempt - 1))
+
+def fastapi_base_url():
+    return FASTAPI_URL.replace('/ask', '')
+
+async def neuro_rag_call(query, session_id, deadline):
+    """
+    Ejecuta neuro_rag contra FastAPI desde el servidor (REALTIME_SERVER_TOOLS), en el loop de fondo.
+    Devuelve el mismo formato que armaba el navegador para function_call_output.
+    También la usa el prefetch especulativo (cancelable: CancelledError no se captura).
+    Sin presupuesto para otro intento devuelve error en vez de seguir ocupando al backend.
+    """
+    request_id = generate_request_id()
+    started = time.time()
+    try:
+        if not query:
+            raise ValueError('Missing required argument: query')
+        payload = {"question": query, "session_id": session_id}
+        cache_key = rag_cache.key_for(query) if rag_cache is not None else None
+        if cache_key is not None:
+            cached = await rag_cache.aget(cache_key)
+            if cached is not None and cached.content_type.startswith('application/json'):
+                logger.info(f"[{request_id}] Server-side neuro_rag cache hit ({cached.source})")
+                return {
+                    "status": "success",
+                    "data": json.loads(cached.body),
+                    "query": query,
+                    "timestamp": datetime.utcnow().isoformat()
+                }
+        logger.info(f"[{request_id}] Server-side neuro_rag call to FastAPI: {FASTAPI_URL}")
+        
+        max_attempts = int(os.environ.get('FASTAPI_RETRIES', 3))
+        base_backoff = float(os.environ.get('FASTAPI_RETRY_BACKOFF', 0.5))
+        tried = set()
+        for attempt in range(1, max_attempts + 1):
+            deadline.check(DEADLINE_MIN_ATTEMPT_S, stage=f'attempt {attempt}')
+            count_deadline(deadline.route, attempts=1)
+            try:
+                response = await backend_router.request(backend_http, 'POST', tried=tried, json=payload,
+                                                        **backend_call_options(deadline))
+                if response.status_code >= 500 and attempt < max_attempts and backend_router.has_alternative(tried):
+                    logger.warning(f"[{request_id}] FastAPI attempt {attempt} got HTTP {response.status_code}. "
+                                   f"Retrying on another replica")
+                    continue
+                break
+            except httpx.RequestError as e:
+                if isinstance(e, httpx.TimeoutException):
+                    count_deadline(deadline.route, timed_out=1)
+                if attempt < max_attempts:
+                    wait = retry_wait(attempt, base_backoff, tried)
+                    deadline.check(wait + DEADLINE_MIN_ATTEMPT_S, stage=f'retry {attempt + 1}')
+                    logger.warning(f"[{request_id}] FastAPI attempt {attempt} failed: {e}. Retrying in {wait:.2f}s")
+                    await asyncio.sleep(wait)
+                else:
+                    raise
+        
+        performance_logger.info(f"[{request_id}] FastAPI call duration: {time.time() - started:.3f}s")
+        if response.status_code >= 400:
+            raise RuntimeError(f"HTTP {response.status_code}: {response.text[:500]}")
+        data = response.json()
+        deadline.finish()
+        if cache_key is not None and response.status_code == 200:
+            rag_cache.put(cache_key, response.text, response.status_code,
+                          response.headers.get('content-type', 'application/json'))
+        return {
+            "status": "success",
+            "data": data,
+            "query": query,
+            "timestamp": datetime.utcnow().isoformat()
+        }
+    except Exception as e:
+        error_logger.error(f"[{request_id}] Server-side neuro_rag failed: {e}")
+        return {
+            "status": "error",
+            "error": str(e),
+            "query": query or "unknown",
+            "timestamp": datetime.utcnow().isoformat()
+        }
+
+def execute_neuro_rag(query, session_id, deadline):
+    """neuro_rag_call desde un thread (verde) del relay"""
+    return background_loop.run(neuro_rag_call(query, session_id, deadline))
+
+def correct_transcript(text):
+    """Aplica las correcciones de texto a una transcripción (mismo criterio que handle_process_message)"""
+    if MINIPYWO_AVAILABLE:
+        return replace_token(text, original_list, replacement_list)
+    return apply_corrections(text, dict(zip(original_list, replacement_list)))
+
 # Agregar esta función auxiliar después de la línea 500 aproximadamente
 def normalize_function_call_payload(data):
     """
@@ -1103,6 +1923,8 @@ async def minipywo_proxy():
     # Generate unique request ID for tracking
     request_id = generate_request_id()
     start_time = time.time()
+    # Presupuesto de la ruta (o el del llamador, si es menor)
+    deadline = Deadline.for_request('neuro_rag', RAG_DEADLINE_S, request.headers.get(DEADLINE_HEADER))
     
     logger.info(f"[{request_id}] New request received at {datetime.utcnow().isoformat()}")
     
@@ -1142,79 +1964,137 @@ async def minipywo_proxy():
         
         logger.info(f"[{request_id}] Question length: {len(payload.get('question', ''))} characters")
         
+        # Cache de respuestas: clave = pregunta corregida y normalizada
+        cache_key = None
+        cache_status = None
+        if rag_cache is not None:
+            cache_key = rag_cache.key_for(payload.get('question'))
+            if rag_cache_bypassed(request.headers):
+                rag_cache.count_bypass()
+                cache_status = 'BYPASS'
+            else:
+                cached = await rag_cache.aget(cache_key)
+                if cached is not None:
+                    total_duration = time.time() - start_time
+                    logger.info(f"[{request_id}] RAG cache hit ({cached.source}) in {total_duration:.3f}s")
+                    return Response(
+                        cached.body,
+                        status=cached.status,
+                        headers={
+                            'X-Request-ID': request_id,
+                            'X-Processing-Time': str(total_duration),
+                            RAG_CACHE_HEADER: 'HIT',
+                            'Age': str(int(time.time() - cached.stored_at))
+                        },
+                        content_type=cached.content_type
+                    )
+                cache_status = 'MISS'
+        
         # Make asynchronous call to FastAPI
         logger.info(f"[{request_id}] Initiating async call to FastAPI: {FASTAPI_URL}")
         fastapi_start_time = time.time()
         
-        async with httpx.AsyncClient(timeout=REQUEST_TIMEOUT) as client:
-            logger.debug(f"[{request_id}] HTTP client created with timeout: {REQUEST_TIMEOUT}s")
-            
-            max_attempts = int(os.environ.get('FASTAPI_RETRIES', 3))
-            base_backoff = float(os.environ.get('FASTAPI_RETRY_BACKOFF', 0.5))
-            last_error = None
-            response = None
-            
-            for attempt in range(1, max_attempts + 1):
-                try:
-                    response = await client.post(FASTAPI_URL, json=payload)
-                    break
-                except (httpx.RequestError, httpx.ConnectError) as e:
-                    last_error = e
-                    if attempt < max_attempts:
-                        wait = base_backoff * (2 ** (attempt - 1))
-                        logger.warning(f"[{request_id}] FastAPI attempt {attempt} failed: {e}. Retrying in {wait:.2f}s")
-                        await asyncio.sleep(wait)
-                    else:
-                        raise
-
-            fastapi_duration = time.time() - fastapi_start_time
-            performance_logger.info(f"[{request_id}] FastAPI call duration: {fastapi_duration:.3f}s")
-            
-            # Log response details
-            response_logger.info(f"[{request_id}] FastAPI response status: {response.status_code}")
-            response_logger.debug(f"[{request_id}] FastAPI response headers: {dict(response.headers)}")
-            
-            # Log response body (be careful with large responses)
-            response_text = response.text
-            response_logger.debug(f"[{request_id}] Response length: {len(response_text)} characters")
-            
-            if len(response_text) <= 1000:
-                response_logger.debug(f"[{request_id}] Response body: {response_text}")
-            else:
-                response_logger.debug(f"[{request_id}] Response preview: {response_text[:500]}... [TRUNCATED]")
-            
-            # Prepare response headers
-            logger.debug(f"[{request_id}] Processing response headers")
-            response_headers = dict(response.headers)
-            
-            # Remove headers that can cause issues
-            headers_to_remove = ['content-encoding', 'content-length', 'transfer-encoding']
-            for header in headers_to_remove:
-                if header in response_headers:
-                    logger.debug(f"[{request_id}] Removing header: {header}")
-                    response_headers.pop(header, None)
-            
-            # Calculate total processing time
-            total_duration = time.time() - start_time
-            performance_logger.info(f"[{request_id}] Total request processing time: {total_duration:.3f}s")
-            
-            # Add custom headers for tracking
-            response_headers['X-Request-ID'] = request_id
-            response_headers['X-Processing-Time'] = str(total_duration)
-            
-            logger.info(f"[{request_id}] Request completed successfully")
-            
-            # Return response maintaining original format
-            return Response(
-                response_text,
-                status=response.status_code,
-                headers=response_headers,
-                content_type=response.headers.get('content-type', 'application/json')
-            )
-            
-    except httpx.TimeoutException as e:
+        logger.debug(f"[{request_id}] Using shared HTTP client pool (timeout: {REQUEST_TIMEOUT}s)")
+        
+        max_attempts = int(os.environ.get('FASTAPI_RETRIES', 3))
+        base_backoff = float(os.environ.get('FASTAPI_RETRY_BACKOFF', 0.5))
+        last_error = None
+        response = None
+        flight_key = singleflight_key(payload) if RAG_SINGLEFLIGHT_ENABLED else None
+        # Réplicas ya usadas por este request: los reintentos van primero a otra
+        tried = set()
+        
+        for attempt in range(1, max_attempts + 1):
+            deadline.check(DEADLINE_MIN_ATTEMPT_S, stage=f'attempt {attempt}')
+            count_deadline(deadline.route, attempts=1)
+            try:
+                # Cada intento (incluidos los reintentos) se comparte con requests idénticos en vuelo
+                if flight_key is not None:
+                    response = await rag_single_flight.do(
+                        flight_key,
+                        lambda: backend_router.request(backend_http, 'POST', tried=tried, json=payload,
+                                                       **backend_call_options(deadline)),
+                        timeout=min(RAG_SINGLEFLIGHT_WAIT_S, deadline.remaining())
+                    )
+                else:
+                    response = await backend_router.request(backend_http, 'POST', tried=tried, json=payload,
+                                                            **backend_call_options(deadline))
+                if response.status_code >= 500 and attempt < max_attempts and backend_router.has_alternative(tried):
+                    logger.warning(f"[{request_id}] FastAPI attempt {attempt} got HTTP {response.status_code}. "
+                                   f"Retrying on another replica")
+                    continue
+                break
+            except (httpx.RequestError, httpx.ConnectError, SingleFlightTimeout) as e:
+                last_error = e
+                if isinstance(e, (httpx.TimeoutException, SingleFlightTimeout)):
+                    count_deadline(deadline.route, timed_out=1)
+                if attempt < max_attempts:
+                    wait = retry_wait(attempt, base_backoff, tried)
+                    deadline.check(wait + DEADLINE_MIN_ATTEMPT_S, stage=f'retry {attempt + 1}')
+                    logger.warning(f"[{request_id}] FastAPI attempt {attempt} failed: {e}. Retrying in {wait:.2f}s")
+                    await asyncio.sleep(wait)
+                else:
+                    raise
+
+        fastapi_duration = time.time() - fastapi_start_time
+        deadline.finish()
+        performance_logger.info(f"[{request_id}] FastAPI call duration: {fastapi_duration:.3f}s")
+        
+        # Log response details
+        response_logger.info(f"[{request_id}] FastAPI response status: {response.status_code}")
+        response_logger.debug(f"[{request_id}] FastAPI response headers: {dict(response.headers)}")
+        
+        # Log response body (be careful with large responses)
+        response_text = response.text
+        response_logger.debug(f"[{request_id}] Response length: {len(response_text)} characters")
+        
+        if len(response_text) <= 1000:
+            response_logger.debug(f"[{request_id}] Response body: {response_text}")
+        else:
+            response_logger.debug(f"[{request_id}] Response preview: {response_text[:500]}... [TRUNCATED]")
+        
+        # Prepare response headers
+        logger.debug(f"[{request_id}] Processing response headers")
+        response_headers = dict(response.headers)
+        
+        # Remove headers that can cause issues
+        headers_to_remove = ['content-encoding', 'content-length', 'transfer-encoding']
+        for header in headers_to_remove:
+            if header in response_headers:
+                logger.debug(f"[{request_id}] Removing header: {header}")
+                response_headers.pop(header, None)
+        
+        # Calculate total processing time
+        total_duration = time.time() - start_time
+        performance_logger.info(f"[{request_id}] Total request processing time: {total_duration:.3f}s")
+        
+        # Add custom headers for tracking
+        response_headers['X-Request-ID'] = request_id
+        response_headers['X-Processing-Time'] = str(total_duration)
+        
+        if cache_status is not None:
+            response_headers[RAG_CACHE_HEADER] = cache_status
+            # Solo se cachean respuestas exitosas
+            if response.status_code == 200:
+                rag_cache.put(cache_key, response_text, response.status_code,
+                              response.headers.get('content-type', 'application/json'))
+        
+        logger.info(f"[{request_id}] Request completed successfully")
+        
+        # Return response maintaining original format
+        return Response(
+            response_text,
+            status=response.status_code,
+            headers=response_headers,
+            content_type=response.headers.get('content-type', 'application/json')
+        )
+        
+    except (httpx.TimeoutException, SingleFlightTimeout, DeadlineExceeded) as e:
         duration = time.time() - start_time
-        error_msg = f"Timeout connecting to FastAPI after {REQUEST_TIMEOUT} seconds"
+        if isinstance(e, DeadlineExceeded):
+            error_msg = f"Deadline exceeded: {e}"
+        else:
+            error_msg = f"Timeout connecting to FastAPI after {duration:.1f}s (deadline {deadline.budget_s:.1f}s)"
         error_logger.error(f"[{request_id}] {error_msg} - Duration: {duration:.3f}s", exc_info=True)
         return jsonify({
             'error': error_msg,
@@ -1270,30 +2150,29 @@ async def health_check():
     logger.info(f"[{request_id}] Health check initiated")
     
     try:
-        async with httpx.AsyncClient(timeout=5) as client:
-            health_url = f"{FASTAPI_URL.replace('/ask', '')}/health"
-            logger.debug(f"[{request_id}] Checking FastAPI health at: {health_url}")
-            
-            response = await client.get(health_url)
-            duration = time.time() - start_time
+        health_url = f"{fastapi_base_url()}/health"
+        logger.debug(f"[{request_id}] Checking FastAPI health at: {health_url}")
+        
+        response = await backend_http.request('GET', health_url, timeout=5)
+        duration = time.time() - start_time
+        
+        if response.status_code == 200:
+            logger.info(f"[{request_id}] Health check successful - Duration: {duration:.3f}s")
+            return jsonify({
+                'status': 'healthy',
+                'fastapi': 'connected',
+                'request_id': request_id,
+                'duration': duration
+            }), 200
+        else:
+            logger.warning(f"[{request_id}] Health check failed with status: {response.status_code}")
+            return jsonify({
+                'status': 'unhealthy',
+                'fastapi_status': response.status_code,
+                'request_id': request_id,
+                'duration': duration
+            }), 503
             
-            if response.status_code == 200:
-                logger.info(f"[{request_id}] Health check successful - Duration: {duration:.3f}s")
-                return jsonify({
-                    'status': 'healthy',
-                    'fastapi': 'connected',
-                    'request_id': request_id,
-                    'duration': duration
-                }), 200
-            else:
-                logger.warning(f"[{request_id}] Health check failed with status: {response.status_code}")
-                return jsonify({
-                    'status': 'unhealthy',
-                    'fastapi_status': response.status_code,
-                    'request_id': request_id,
-                    'duration': duration
-                }), 503
-                
     except Exception as e:
         duration = time.time() - start_time
         error_logger.error(f"[{request_id}] Health check error: {str(e)} - Duration: {duration:.3f}s", exc_info=True)
@@ -1311,6 +2190,7 @@ async def health_check():
 async def healthz():
     try:
         from health_check import health_checker
+        health_checker.backend_client = backend_http
         status = await health_checker.get_complete_health()
         code = 200 if status.get('status') == 'healthy' else 503 if status.get('status') == 'unhealthy' else 206
         return jsonify(status), code
@@ -1322,26 +2202,23 @@ async def healthz():
 async def readyz():
     """Lightweight readiness check: validates backend FastAPI connectivity only."""
     try:
-        base_url = FASTAPI_URL.replace('/ask', '')
-        async with httpx.AsyncClient(timeout=3) as client:
-            resp = await client.get(f"{base_url}/health")
-            if resp.status_code == 200:
-                return jsonify({'status': 'ready'}), 200
-            return jsonify({'status': 'not_ready', 'code': resp.status_code}), 503
+        resp = await backend_http.request('GET', f"{fastapi_base_url()}/health", timeout=3)
+        if resp.status_code == 200:
+            return jsonify({'status': 'ready'}), 200
+        return jsonify({'status': 'not_ready', 'code': resp.status_code}), 503
     except Exception as e:
         return jsonify({'status': 'not_ready', 'error': str(e)}), 503
 
 # Optional: Streaming version for long responses with logging
 @app.route('/api/neuro_rag_stream', methods=['POST'])
-@async_route
-async def minipywo_proxy_stream():
+def minipywo_proxy_stream():
     """
-    Streaming version for long Azure Speech responses
+    Streaming version for long Azure Speech responses.
+    Reenvía cada chunk del backend apenas llega, como SSE o NDJSON (?format=sse|ndjson|raw)
     """
     request_id = generate_request_id()
     start_time = time.time()
-    chunks_sent = 0
-    total_bytes = 0
+    deadline = Deadline.for_request('neuro_rag_stream', RAG_STREAM_DEADLINE_S, request.headers.get(DEADLINE_HEADER))
     
     logger.info(f"[{request_id}] Stream request initiated")
     
@@ -1349,66 +2226,108 @@ async def minipywo_proxy_stream():
         data = request.get_json(force=True, silent=True)
         request_logger.debug(f"[{request_id}] Stream request data: {safe_json_log(data)}")
         
-        if data.get('type') == 'function_call':
-            parameters = data.get('parameters', {})
-            payload = {
-                "question": parameters.get('query', ''),
-                "session_id": parameters.get('session_id', 'default_session')
-            }
-        else:
-            payload = data
+        if not data:
+            return jsonify({'error': 'No JSON data provided', 'request_id': request_id}), 400
+        payload = normalize_function_call_payload(data)
+        if not payload.get('question'):
+            return jsonify({'error': 'Question is required', 'request_id': request_id}), 400
         
-        logger.info(f"[{request_id}] Starting stream with payload: {safe_json_log(payload)}")
+        framer = StreamFramer(choose_format(request.args.get('format'), request.headers.get('Accept', '')), request_id)
+        logger.info(f"[{request_id}] Starting {framer.fmt} stream with payload: {safe_json_log(payload)}")
         
-        async def generate():
-            nonlocal chunks_sent, total_bytes
+        def generate():
+            chunks_sent = 0
+            total_bytes = 0
+            upstream = {}
+            finished = False
+            last_chunk_at = None
+            chunks = streamed = None
+            count_stream(streams=1)
+            
+            def on_response(response):
+                # Llamado en el loop de fondo antes del primer chunk
+                upstream['status'] = response.status_code
+                upstream['opened_at'] = time.time()
+                response_logger.info(f"[{request_id}] Stream response status: {response.status_code}")
             
             try:
-                async with httpx.AsyncClient(timeout=REQUEST_TIMEOUT) as client:
-                    logger.debug(f"[{request_id}] Opening stream connection to FastAPI")
-
-                    # Retry opening the stream with backoff
-                    max_attempts = int(os.environ.get('FASTAPI_RETRIES', 3))
-                    base_backoff = float(os.environ.get('FASTAPI_RETRY_BACKOFF', 0.5))
-                    last_exc = None
-
-                    for attempt in range(1, max_attempts + 1):
-                        try:
-                            stream_cm = client.stream('POST', FASTAPI_URL, json=payload)
-                            break
-                        except (httpx.RequestError, httpx.ConnectError) as e:
-                            last_exc = e
-                            if attempt < max_attempts:
-                                wait = base_backoff * (2 ** (attempt - 1))
-                                logger.warning(f"[{request_id}] Stream open attempt {attempt} failed: {e}. Retrying in {wait:.2f}s")
-                                await asyncio.sleep(wait)
-                            else:
-                                raise
-
-                    async with stream_cm as response:
-                        response_logger.info(f"[{request_id}] Stream response status: {response.status_code}")
-                        
-                        async for chunk in response.aiter_bytes():
-                            chunk_size = len(chunk)
-                            chunks_sent += 1
-                            total_bytes += chunk_size
-                            
-                            if chunks_sent % 10 == 0:  # Log every 10 chunks
-                                logger.debug(f"[{request_id}] Sent {chunks_sent} chunks, {total_bytes} bytes")
-                            
-                            yield chunk
-                        
-                        duration = time.time() - start_time
-                        performance_logger.info(
-                            f"[{request_id}] Stream completed: {chunks_sent} chunks, "
-                            f"{total_bytes} bytes in {duration:.3f}s"
-                        )
-                        
+                logger.debug(f"[{request_id}] Opening stream connection to FastAPI")
+                opening = framer.opening()
+                if opening:
+                    yield opening
+                
+                error_body = b''
+                deadline.check(DEADLINE_MIN_ATTEMPT_S)
+                count_deadline(deadline.route, attempts=1)
+                chunks = backend_http.stream_sync('POST', FASTAPI_STREAM_URL, on_response=on_response, json=payload,
+                                                  **backend_call_options(deadline))
+                streamed = within(chunks, deadline)
+                for chunk in streamed:
+                    now = time.time()
+                    if upstream.get('status', 200) >= 400:
+                        error_body += chunk
+                        continue
+                    if last_chunk_at is None:
+                        observe_stream('upstream_ttfb', (now - upstream.get('opened_at', now)) * 1000)
+                        observe_stream('ttfb', (now - start_time) * 1000)
+                    else:
+                        observe_stream('chunk_gap', (now - last_chunk_at) * 1000)
+                    last_chunk_at = now
+                    
+                    chunks_sent += 1
+                    total_bytes += len(chunk)
+                    if chunks_sent % 10 == 0:  # Log every 10 chunks
+                        logger.debug(f"[{request_id}] Sent {chunks_sent} chunks, {total_bytes} bytes")
+                    
+                    framed = framer.chunk(chunk)
+                    if framed:
+                        yield framed
+                
+                duration = time.time() - start_time
+                finished = True
+                count_stream(chunks=chunks_sent, bytes=total_bytes)
+                if upstream.get('status', 200) >= 400:
+                    count_stream(errors=1)
+                    error_logger.error(f"[{request_id}] Stream backend error {upstream['status']}: {error_body[:500]!r}")
+                    yield framer.error(f"HTTP {upstream['status']}", status=upstream['status'],
+                                       details=error_body[:500].decode('utf-8', errors='replace'))
+                    return
+                
+                count_stream(completed=1)
+                deadline.finish()
+                performance_logger.info(
+                    f"[{request_id}] Stream completed: {chunks_sent} chunks, "
+                    f"{total_bytes} bytes in {duration:.3f}s"
+                )
+                yield framer.done(bytes=total_bytes, duration=round(duration, 3))
+            
+            except GeneratorExit:
+                # Cliente desconectado: cerrar stream_sync cancela la llamada upstream
+                count_stream(client_disconnects=1, chunks=chunks_sent, bytes=total_bytes)
+                logger.info(f"[{request_id}] Stream client disconnected after {chunks_sent} chunks")
+                raise
             except Exception as e:
+                if not finished:
+                    count_stream(errors=1, chunks=chunks_sent, bytes=total_bytes)
                 error_logger.error(f"[{request_id}] Stream error: {str(e)}", exc_info=True)
-                raise
+                yield framer.error(str(e))
+            finally:
+                # Cierre explícito (no depender del refcount): cancela la tarea upstream ya
+                for iterator in (streamed, chunks):
+                    if iterator is not None:
+                        iterator.close()
         
-        return Response(generate(), content_type='application/json')
+        return Response(
+            stream_with_context(generate()),
+            content_type=framer.content_type,
+            headers={
+                'X-Request-ID': request_id,
+                'Cache-Control': 'no-cache',
+                # nginx: no acumular el stream en buffer
+                'X-Accel-Buffering': 'no'
+            },
+            direct_passthrough=True
+        )
         
     except Exception as e:
         duration = time.time() - start_time
@@ -1478,23 +2397,64 @@ def stop_avatar():
 
 # ==== Health & Metrics ====
 
+_minipywo_probe = {'ok': None, 'checked_at': 0.0, 'running': False}
+_minipywo_probe_lock = threading.Lock()
+
+
+def minipywo_health():
+    """
+    Estado de wl_pywo para /health sin cargar al pool con cada sondeo.
+    La prueba (una consulta real) corre como mucho una vez cada MINIPYWO_HEALTH_TTL_S,
+    de a una por worker, y no se encola si el pool ya está atendiendo usuarios:
+    en ese caso (o con PoolBusy) se informa el último resultado conocido.
+    Devuelve (ok, segundos desde la última prueba o None).
+    """
+    now = time.monotonic()
+    with _minipywo_probe_lock:
+        last = _minipywo_probe['ok']
+        age = round(now - _minipywo_probe['checked_at'], 1) if last is not None else None
+        if _minipywo_probe['running'] or (last is not None and age < MINIPYWO_HEALTH_TTL_S):
+            return last is not False, age
+        pool = minipywo_pool.snapshot()
+        if pool['queued'] or pool['busy'] >= pool['workers']:
+            return last is not False, age
+        _minipywo_probe['running'] = True
+
+    ok = last
+    try:
+        test_config = {"configurable": {"thread_id": "health_check"}}
+        test_result = background_loop.run(
+            minipywo_pool.call('health_check', wl_pywo.invoke, {"question": "test"}, test_config),
+            timeout=MINIPYWO_TIMEOUT_S
+        )
+        ok = test_result is not None
+    except PoolBusy:
+        pass
+    except Exception as e:
+        logger.warning(f"[HEALTH] minipywo probe failed: {e}")
+        ok = False
+    finally:
+        with _minipywo_probe_lock:
+            _minipywo_probe['running'] = False
+            if ok is not None:
+                _minipywo_probe['ok'] = ok
+                _minipywo_probe['checked_at'] = time.monotonic()
+    return ok is not False, 0.0 if ok is not None else None
+
+
 @app.route('/health')
 def health():
     realtime_api_ok = bool(AZURE_OPENAI_ENDPOINT and AZURE_OPENAI_API_KEY)
     speech_service_ok = bool(SPEECH_KEY and SPEECH_REGION)
     minipywo_ok = MINIPYWO_AVAILABLE
+    minipywo_checked_s_ago = None
     ice_server_ok = bool(ICE_SERVER_URL)
     
     # Check active realtime connections
     active_realtime_connections = len(realtime_connections)
 
     if MINIPYWO_AVAILABLE:
-        try:
-            test_config = {"configurable": {"thread_id": "health_check"}}
-            test_result = wl_pywo.invoke({"question": "test"}, test_config)
-            minipywo_ok = test_result is not None
-        except:
-            minipywo_ok = False
+        minipywo_ok, minipywo_checked_s_ago = minipywo_health()
 
     critical_ok = realtime_api_ok and speech_service_ok
     status = "healthy" if critical_ok else "unhealthy"
@@ -1532,6 +2492,7 @@ def health():
             'minipywo_system': {
                 'status': 'healthy' if minipywo_ok else 'unhealthy',
                 'available': MINIPYWO_AVAILABLE,
+                'checked_s_ago': minipywo_checked_s_ago,
                 'corrections_active': MINIPYWO_AVAILABLE and len(original_list) > 0
             },
             'ice_server': {
@@ -1611,8 +2572,43 @@ def metrics():
         },
         'proxy': {
             'active_connections': len(realtime_connections),
-            'connection_ids': list(realtime_connections.keys())
+            'connection_ids': list(realtime_connections.keys()),
+            'relay': realtime_relay.stats(),
+            'coalescing': dict(coalescing_totals(), enabled=REALTIME_COALESCE_ENABLED),
+            'binary_audio': dict(binary_audio_totals(), enabled=REALTIME_BINARY_AUDIO),
+            'inbound_audio': dict(inbound_audio_totals(), frame_ms=REALTIME_INBOUND_AUDIO_FRAME_MS),
+            'silence_gate': dict(silence_gate_totals(), mode=REALTIME_SILENCE_GATE),
+            'resample': dict(resample_totals(), enabled=REALTIME_SERVER_RESAMPLE,
+                             output_rate=REALTIME_INPUT_SAMPLE_RATE),
+            'warm_pool': warm_pool.snapshot() if warm_pool is not None else {'enabled': False},
+            'connect_latency_ms': connect_latency.snapshot(),
+            'send_queues': dict(send_queue_totals(), overflow=realtime_queue_overflow,
+                                downstream_max=REALTIME_DOWNSTREAM_QUEUE_MAX,
+                                upstream_max=REALTIME_UPSTREAM_QUEUE_MAX),
+            'tool_calls': dict(tool_latency.snapshot(), server_side=REALTIME_SERVER_TOOLS,
+                               time_to_first_spoken_word_ms=first_spoken_word_snapshot()),
+            'tool_streaming': dict(tool_stream_totals(), enabled=REALTIME_TOOL_STREAMING),
+            'rag_prefetch': dict(rag_prefetch_limiter.snapshot(), enabled=REALTIME_RAG_PREFETCH,
+                                 min_similarity=REALTIME_RAG_PREFETCH_MIN_SIMILARITY),
+            'turn_latency': turn_latency_snapshot(),
+            'usage': dict(usage_totals(), sessions={
+                client_id: proxy.usage.snapshot() for client_id, proxy in list(realtime_connections.items())
+            }),
+            'recording': recording_writer.snapshot() if recording_writer is not None else {'enabled': False}
         },
+        'backend_http': backend_http.snapshot(),
+        'backend_routing': backend_router.snapshot(),
+        'minipywo_pool': dict(minipywo_pool.snapshot(), enabled=MINIPYWO_AVAILABLE),
+        'async_routes': dict(background_loop.snapshot(), mode=ASYNC_ROUTE_MODE),
+        'rag_cache': rag_cache.snapshot() if rag_cache is not None else {'enabled': False},
+        'rag_stream': stream_totals(),
+        'rag_singleflight': dict(rag_single_flight.snapshot(), enabled=RAG_SINGLEFLIGHT_ENABLED,
+                                 wait_s=RAG_SINGLEFLIGHT_WAIT_S),
+        'deadlines': dict(deadline_totals(), budgets_s={
+            'neuro_rag': RAG_DEADLINE_S,
+            'neuro_rag_stream': RAG_STREAM_DEADLINE_S,
+            'realtime_tool': REALTIME_TOOL_DEADLINE_S
+        }, min_attempt_s=DEADLINE_MIN_ATTEMPT_S),
         'configuration': {
             'avatar_enabled': ENABLE_AVATAR,
             'minipywo_enabled': MINIPYWO_AVAILABLE,
@@ -1688,6 +2684,11 @@ def handle_disconnect():
             logger.info("Client disconnected (no session ID available)")
             return
         
+        # process_message pendientes de este socket
+        dropped = minipywo_pool.cancel_client(sid)
+        if dropped:
+            logger.info(f"Dropped {dropped} queued process_message calls for sid {sid}")
+        
         # Clean up Realtime connections if they exist
         connections_to_remove = []
         for client_id, proxy in list(realtime_connections.items()):
@@ -1728,12 +2729,18 @@ def handle_process_message(data):
     if not MINIPYWO_AVAILABLE:
         emit('error', {'message': 'minipywo system not available'})
         return
+    sid = request.sid
+    client_id = None
     try:
         user_message = data.get('message', '')
         client_id = data.get('client_id', generate_client_id())
         config = {"configurable": {"thread_id": client_id}}
         corrected_message = replace_token(user_message, original_list, replacement_list)
-        result = wl_pywo.invoke({"question": corrected_message}, config)
+        # En un thread nativo del pool: este handler espera sin bloquear el hub (ni el relay de los demás)
+        result = background_loop.run(
+            minipywo_pool.call(sid, wl_pywo.invoke, {"question": corrected_message}, config),
+            timeout=MINIPYWO_TIMEOUT_S
+        )
         response_text = result.get("query_result", "Error processing YPF query")
         if ENABLE_METRICS and client_id in session_metrics:
             session_metrics[client_id]['message_count'] += 1
@@ -1744,6 +2751,12 @@ def handle_process_message(data):
             'timestamp': datetime.now().isoformat()
         })
         logger.info(f"Socket.IO: Response sent: {response_text[:100]}...")
+    except asyncio.CancelledError:
+        # Cliente desconectado: la respuesta ya no tiene destino
+        logger.info(f"Socket.IO: process_message cancelled for sid {sid}")
+    except PoolBusy as e:
+        logger.warning(f"Socket.IO: process_message rejected for sid {sid}: {e}")
+        emit('error', {'message': 'Server busy, please retry', 'busy': True})
     except Exception as e:
         logger.error(f"Socket.IO Error: {e}")
         if ENABLE_METRICS and client_id in session_metrics:
@@ -1851,6 +2864,7 @@ if __name__ == "__main__":
     logger.warning(f"Azure OpenAI Endpoint configured: {bool(AZURE_OPENAI_ENDPOINT)}")
     logger.warning(f"Speech Service Region: {SPEECH_REGION}")
     logger.warning(f"Proxy Mode: Socket.IO WebSocket Proxy")
+    logger.warning(f"Relay engine: {realtime_relay.mode}")
     
     if ICE_SERVER_URL:
         logger.warning(f"ICE/TURN server configured: {ICE_SERVER_URL}")
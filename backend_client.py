@@ -0,0 +1,263 @@
+"""
+Shared, long-lived HTTP client for the FastAPI RAG backend (FASTAPI_URL).
+
+``BackendClientPool`` owns one ``httpx.AsyncClient`` per worker with tuned pool
+limits and keep-alive (and HTTP/2 when ``h2`` is installed), so RAG calls,
+``/api/health`` and ``/readyz`` reuse warm connections instead of paying a new
+TCP (and TLS) handshake per request.
+
+An ``AsyncClient`` is bound to the event loop its connections were opened on,
+so the client lives on the worker's ``BackgroundLoop`` (the same loop
+``async_route`` runs the Flask coroutines on). Coroutines running on that loop
+use it directly; callers on any other loop are bridged with
+``run_coroutine_threadsafe`` and plain (green) threads use ``request_sync`` and
+``stream_sync`` (a plain iterator for WSGI streaming responses).
+
+Connection metrics come from the httpcore pool (active / idle connections,
+requests waiting for a connection) and from the request ``trace`` extension
+(TCP connects and TLS handshakes, i.e. how often a connection was *not*
+reused). ``close()`` closes the pooled connections on worker exit.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, Optional
+
+import httpx
+
+from background_loop import BackgroundLoop
+from perf_metrics import HistogramSet
+
+logger = logging.getLogger(__name__)
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+# Eventos del trace de httpcore que indican una conexión nueva (no reutilizada)
+_CONNECT_EVENTS = {
+    'connection.connect_tcp.complete': 'tcp_connects',
+    'connection.start_tls.complete': 'tls_handshakes',
+}
+
+
+class BackendClientPool:
+    """Per-worker AsyncClient living on a BackgroundLoop"""
+
+    def __init__(self, runner: BackgroundLoop, timeout: float = 120.0, connect_timeout: float = 5.0,
+                 pool_timeout: float = 10.0, max_connections: int = 100, max_keepalive_connections: int = 20,
+                 keepalive_expiry: float = 60.0, http2: bool = False):
+        if http2 and not HTTP2_AVAILABLE:
+            logger.warning("[BACKEND] HTTP/2 requested but 'h2' is not installed; using HTTP/1.1")
+            http2 = False
+        self.http2 = http2
+        self.timeout = httpx.Timeout(timeout, connect=connect_timeout, pool=pool_timeout)
+        self.limits = httpx.Limits(max_connections=max_connections,
+                                   max_keepalive_connections=max_keepalive_connections,
+                                   keepalive_expiry=keepalive_expiry)
+        self.runner = runner
+        self.client = httpx.AsyncClient(timeout=self.timeout, limits=self.limits, http2=self.http2)
+        self._closed = False
+        self.latency = HistogramSet()
+        self.stats = {
+            'requests': 0,
+            'in_flight': 0,
+            'errors': 0,
+            'streams_cancelled': 0,
+            'tcp_connects': 0,
+            'tls_handshakes': 0
+        }
+
+    def on_loop(self) -> bool:
+        """True when called from a coroutine running on the pool's loop"""
+        return self.runner.on_loop()
+
+    def submit(self, coro):
+        """Schedule a coroutine on the pool loop; returns a concurrent.futures.Future"""
+        if self._closed:
+            raise RuntimeError("Backend client pool is closed")
+        return self.runner.submit(coro)
+
+    # -- requests ---------------------------------------------------------------
+
+    async def _trace(self, event_name: str, info: dict):
+        key = _CONNECT_EVENTS.get(event_name)
+        if key:
+            self.stats[key] += 1
+
+    async def _request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        extensions = dict(kwargs.pop('extensions', None) or {}, trace=self._trace)
+        started = time.perf_counter()
+        self.stats['requests'] += 1
+        self.stats['in_flight'] += 1
+        try:
+            response = await self.client.request(method, url, extensions=extensions, **kwargs)
+            await response.aread()
+            return response
+        except Exception:
+            self.stats['errors'] += 1
+            raise
+        finally:
+            self.stats['in_flight'] -= 1
+            self.latency.observe(method.upper(), (time.perf_counter() - started) * 1000)
+
+    async def request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        """Buffered request from any event loop"""
+        if self.on_loop():
+            return await self._request(method, url, **kwargs)
+        return await asyncio.wrap_future(self.submit(self._request(method, url, **kwargs)))
+
+    def request_sync(self, method: str, url: str, **kwargs) -> httpx.Response:
+        """Buffered request from a plain (or green) thread"""
+        return self.runner.run(self._request(method, url, **kwargs))
+
+    async def stream_bytes(self, method: str, url: str,
+                           on_response: Optional[Callable[[httpx.Response], None]] = None,
+                           **kwargs) -> AsyncIterator[bytes]:
+        """Body chunks of a streamed request, from any event loop.
+
+        ``on_response`` receives the response (status, headers) before the
+        first chunk. Closing the iterator early cancels the upstream request.
+        """
+        if self.on_loop():
+            async for chunk in self._stream(method, url, on_response, **kwargs):
+                yield chunk
+            return
+
+        caller = asyncio.get_running_loop()
+        chunks: asyncio.Queue = asyncio.Queue()
+        done = object()
+
+        async def _produce():
+            try:
+                async for chunk in self._stream(method, url, on_response, **kwargs):
+                    caller.call_soon_threadsafe(chunks.put_nowait, chunk)
+            except BaseException as e:
+                caller.call_soon_threadsafe(chunks.put_nowait, e)
+                raise
+            finally:
+                caller.call_soon_threadsafe(chunks.put_nowait, done)
+
+        producer = self.submit(_produce())
+        try:
+            while True:
+                item = await chunks.get()
+                if item is done:
+                    return
+                if isinstance(item, BaseException):
+                    raise item
+                yield item
+        finally:
+            producer.cancel()
+
+    def stream_sync(self, method: str, url: str,
+                    on_response: Optional[Callable[[httpx.Response], None]] = None,
+                    max_buffered: int = 64, **kwargs) -> Iterator[bytes]:
+        """Body chunks of a streamed request as a plain iterator (WSGI generators).
+
+        The request runs as a task on the pool loop, feeding a queue of at most
+        ``max_buffered`` chunks; each ``next()`` waits for one chunk without
+        blocking the green hub. Closing the iterator (client disconnect)
+        cancels the task and with it the upstream request.
+        """
+        done = object()
+
+        async def _produce(chunks: asyncio.Queue):
+            try:
+                async for chunk in self._stream(method, url, on_response, **kwargs):
+                    await chunks.put(chunk)
+            except asyncio.CancelledError:
+                raise
+            except BaseException as e:
+                await chunks.put(e)
+                return
+            await chunks.put(done)
+
+        async def _start():
+            chunks = asyncio.Queue(maxsize=max_buffered)
+            return chunks, asyncio.ensure_future(_produce(chunks))
+
+        if self._closed:
+            raise RuntimeError("Backend client pool is closed")
+        chunks, task = self.runner.run(_start())
+        try:
+            while True:
+                item = self.runner.run(chunks.get())
+                if item is done:
+                    return
+                if isinstance(item, BaseException):
+                    raise item
+                yield item
+        finally:
+            if not task.done():
+                self.stats['streams_cancelled'] += 1
+                self.runner.loop.call_soon_threadsafe(task.cancel)
+
+    async def _stream(self, method, url, on_response, **kwargs):
+        extensions = dict(kwargs.pop('extensions', None) or {}, trace=self._trace)
+        started = time.perf_counter()
+        self.stats['requests'] += 1
+        self.stats['in_flight'] += 1
+        try:
+            async with self.client.stream(method, url, extensions=extensions, **kwargs) as response:
+                if on_response is not None:
+                    on_response(response)
+                async for chunk in response.aiter_bytes():
+                    yield chunk
+        except Exception:
+            self.stats['errors'] += 1
+            raise
+        finally:
+            self.stats['in_flight'] -= 1
+            self.latency.observe(f"{method.upper()}_stream", (time.perf_counter() - started) * 1000)
+
+    # -- metrics / shutdown -------------------------------------------------------
+
+    def _pool_state(self) -> Dict[str, int]:
+        state = {'connections': 0, 'active': 0, 'idle': 0, 'waiting': 0}
+        pool = getattr(getattr(self.client, '_transport', None), '_pool', None)
+        if pool is None:
+            return state
+        try:
+            connections = list(pool.connections)
+            state['connections'] = len(connections)
+            state['idle'] = sum(1 for c in connections if c.is_idle())
+            state['active'] = state['connections'] - state['idle']
+            # Requests esperando una conexión libre (límite de pool alcanzado)
+            state['waiting'] = sum(1 for r in list(pool._requests) if r.is_queued())
+        except Exception:
+            pass
+        return state
+
+    def snapshot(self) -> Dict[str, Any]:
+        stats = dict(self.stats)
+        requests = max(stats['requests'], 1)
+        stats['connection_reuse_ratio'] = round(1 - stats['tcp_connects'] / requests, 3) if stats['requests'] else 0.0
+        return dict(
+            stats,
+            pool=self._pool_state(),
+            started=self.runner.loop is not None,
+            http2=self.http2,
+            limits={
+                'max_connections': self.limits.max_connections,
+                'max_keepalive_connections': self.limits.max_keepalive_connections,
+                'keepalive_expiry': self.limits.keepalive_expiry
+            },
+            latency_ms=self.latency.snapshot()
+        )
+
+    def close(self, timeout: float = 5.0):
+        """Close pooled connections (worker exit); the loop itself belongs to the runner"""
+        if self._closed:
+            return
+        self._closed = True
+        if self.runner.loop is None or not self.runner.loop.is_running():
+            return
+        try:
+            self.runner.submit(self.client.aclose()).result(timeout)
+        except Exception as e:
+            logger.warning(f"[BACKEND] Error closing HTTP client pool: {e}")
+        logger.info("[BACKEND] HTTP client pool closed")
@@ -0,0 +1,229 @@
+"""
+Latency-aware routing over several RAG backend replicas (FASTAPI_URLS).
+
+``BackendRouter`` keeps, per replica, an EWMA of successful call latency, an
+EWMA error rate, requests in flight and a window of recent latencies (for its
+p95). Each request goes to the healthy replica with the lowest score::
+
+    ewma_ms * (1 + in_flight) * (1 + 4 * error_rate)
+
+Replicas with no samples yet score 0, so new or recovered ones get traffic.
+Transport errors and 5xx responses count as failures. ``failure_threshold``
+consecutive failures open the replica's circuit for ``open_s`` seconds. After
+that, one request is let through (half-open): success closes the circuit and
+failure opens it again. If every circuit is open, the replica whose circuit
+opened first is tried anyway (fail-open), so a single-replica setup behaves as
+before.
+
+Optional hedging (``hedge=True``): when the primary has not answered after
+that replica's p95 latency (at least ``hedge_min_ms``), the same request is
+sent to the next best replica. The first good answer wins and the other
+attempt is cancelled. Hedging duplicates backend work and is only safe for
+idempotent requests.
+
+Callers pass a ``tried`` set that the router fills with the URLs it used, so a
+retry loop can move to a replica it has not tried yet (``has_alternative``)
+instead of sleeping. Once every healthy replica has been tried, retries reuse
+them (with a single replica, every attempt goes to it).
+"""
+
+import asyncio
+import time
+from collections import deque
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+import httpx
+
+CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+
+class BackendReplica:
+    """Health and latency state of one backend URL"""
+
+    def __init__(self, url: str, window: int = 200):
+        self.url = url
+        self.ewma_ms: Optional[float] = None
+        self.error_rate = 0.0
+        self.in_flight = 0
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.probing = False
+        self.latencies = deque(maxlen=window)
+        self.stats = {'chosen': 0, 'success': 0, 'failures': 0, 'cancelled': 0, 'circuit_opens': 0}
+
+    def p95_ms(self) -> Optional[float]:
+        if len(self.latencies) < 10:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+
+    def score(self) -> float:
+        return (self.ewma_ms or 0.0) * (1 + self.in_flight) * (1 + 4 * self.error_rate)
+
+    def snapshot(self) -> Dict[str, Any]:
+        p95 = self.p95_ms()
+        return dict(
+            self.stats,
+            url=self.url,
+            state=self.state,
+            ewma_ms=round(self.ewma_ms, 1) if self.ewma_ms is not None else None,
+            p95_ms=round(p95, 1) if p95 is not None else None,
+            error_rate=round(self.error_rate, 3),
+            in_flight=self.in_flight,
+            consecutive_failures=self.consecutive_failures
+        )
+
+
+class BackendRouter:
+    """Picks a replica per request, tracks outcomes and optionally hedges"""
+
+    def __init__(self, urls: Iterable[str], lock, ewma_alpha: float = 0.3, failure_threshold: int = 5,
+                 open_s: float = 30.0, hedge: bool = False, hedge_min_ms: float = 50.0, recent: int = 20):
+        self.replicas: List[BackendReplica] = [BackendReplica(url) for url in dict.fromkeys(urls)]
+        if not self.replicas:
+            raise ValueError("BackendRouter needs at least one URL")
+        self._lock = lock
+        self.ewma_alpha = ewma_alpha
+        self.failure_threshold = failure_threshold
+        self.open_s = open_s
+        self.hedge = hedge
+        self.hedge_min_ms = hedge_min_ms
+        self.recent = deque(maxlen=recent)
+        self.stats = {'requests': 0, 'all_open': 0, 'hedges': 0, 'hedge_wins': 0}
+
+    # -- selección -----------------------------------------------------------------
+
+    def _available(self, replica: BackendReplica, now: float) -> bool:
+        if replica.state == CLOSED:
+            return True
+        if replica.state == OPEN and now - replica.opened_at >= self.open_s:
+            replica.state = HALF_OPEN
+        # Half-open: una sola request de prueba a la vez
+        return replica.state == HALF_OPEN and not replica.probing
+
+    def choose(self, exclude: Iterable[str] = (), reason: str = 'primary') -> Optional[BackendReplica]:
+        now = time.monotonic()
+        exclude = set(exclude)
+        with self._lock:
+            candidates = [r for r in self.replicas if r.url not in exclude and self._available(r, now)]
+            if not candidates and reason == 'hedge':
+                return None
+            if not candidates:
+                # Todas las sanas ya probadas (p. ej. una sola réplica): el reintento repite una de ellas
+                candidates = [r for r in self.replicas if self._available(r, now)]
+            if not candidates:
+                # Todos los circuitos abiertos: se intenta el que abrió primero
+                pool = [r for r in self.replicas if r.url not in exclude] or list(self.replicas)
+                candidates = sorted(pool, key=lambda r: r.opened_at)[:1]
+                self.stats['all_open'] += 1
+                reason = 'all_open'
+            replica = min(candidates, key=BackendReplica.score)
+            if replica.state == HALF_OPEN:
+                replica.probing = True
+                reason = 'probe'
+            replica.stats['chosen'] += 1
+            self.recent.append({'at': round(time.time(), 3), 'url': replica.url, 'reason': reason,
+                                'score': round(replica.score(), 1)})
+        return replica
+
+    def has_alternative(self, tried: Set[str]) -> bool:
+        """A healthy replica not tried yet by this request (retry without backoff)"""
+        now = time.monotonic()
+        with self._lock:
+            return any(r.url not in tried and self._available(r, now) for r in self.replicas)
+
+    # -- resultados ------------------------------------------------------------------
+
+    def _record(self, replica: BackendReplica, elapsed_ms: float, ok: bool):
+        alpha = self.ewma_alpha
+        with self._lock:
+            replica.probing = False
+            replica.error_rate = (1 - alpha) * replica.error_rate + alpha * (0.0 if ok else 1.0)
+            if ok:
+                replica.stats['success'] += 1
+                replica.latencies.append(elapsed_ms)
+                replica.ewma_ms = elapsed_ms if replica.ewma_ms is None else (
+                    (1 - alpha) * replica.ewma_ms + alpha * elapsed_ms)
+                replica.consecutive_failures = 0
+                replica.state = CLOSED
+                return
+            replica.stats['failures'] += 1
+            replica.consecutive_failures += 1
+            if replica.state == HALF_OPEN or replica.consecutive_failures >= self.failure_threshold:
+                if replica.state != OPEN:
+                    replica.stats['circuit_opens'] += 1
+                replica.state = OPEN
+                replica.opened_at = time.monotonic()
+
+    async def _attempt(self, pool, replica: BackendReplica, method: str, **kwargs) -> httpx.Response:
+        started = time.perf_counter()
+        with self._lock:
+            replica.in_flight += 1
+        try:
+            response = await pool.request(method, replica.url, **kwargs)
+        except asyncio.CancelledError:
+            with self._lock:
+                replica.stats['cancelled'] += 1
+                replica.probing = False
+            raise
+        except Exception:
+            self._record(replica, 0.0, ok=False)
+            raise
+        finally:
+            with self._lock:
+                replica.in_flight -= 1
+        self._record(replica, (time.perf_counter() - started) * 1000, ok=response.status_code < 500)
+        return response
+
+    # -- request -------------------------------------------------------------------------
+
+    async def request(self, pool, method: str, tried: Optional[Set[str]] = None, **kwargs) -> httpx.Response:
+        """Send one request through ``pool`` (BackendClientPool) to the best replica"""
+        tried = tried if tried is not None else set()
+        with self._lock:
+            self.stats['requests'] += 1
+        primary = self.choose(tried)
+        tried.add(primary.url)
+        p95 = primary.p95_ms() if self.hedge else None
+        if p95 is None:
+            return await self._attempt(pool, primary, method, **kwargs)
+
+        first = asyncio.ensure_future(self._attempt(pool, primary, method, **kwargs))
+        pending = {first}
+        try:
+            done, _ = await asyncio.wait(pending, timeout=max(p95, self.hedge_min_ms) / 1000.0)
+            if done:
+                return first.result()
+            secondary = self.choose(tried, reason='hedge')
+            if secondary is None:
+                return await first
+            tried.add(secondary.url)
+            with self._lock:
+                self.stats['hedges'] += 1
+            second = asyncio.ensure_future(self._attempt(pool, secondary, method, **kwargs))
+            pending.add(second)
+            failed = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None and task.result().status_code < 500:
+                        if task is second:
+                            with self._lock:
+                                self.stats['hedge_wins'] += 1
+                        return task.result()
+                    failed = task
+            # Ambos fallaron: se propaga el error (o la respuesta 5xx) del último
+            return failed.result()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(
+                self.stats,
+                hedging=self.hedge,
+                replicas=[r.snapshot() for r in self.replicas],
+                recent_decisions=list(self.recent)
+            )
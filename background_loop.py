@@ -0,0 +1,349 @@
+"""
+Per-worker long-lived asyncio event loop for the async Flask routes.
+
+``async_route`` used to create and close an event loop for every request, so
+each call paid for loop setup and nothing async (pooled HTTP connections,
+clients, caches of futures) could outlive a request. ``BackgroundLoop`` runs
+one event loop on a native OS thread per worker (started lazily, after the
+gunicorn fork) and ``run(coro)`` executes a coroutine there, blocking only the
+calling (green) thread until it finishes. The caller's ``contextvars`` are
+copied into the task, so Flask's request/app context works inside the route.
+
+Under eventlet/gevent, gunicorn's monkey-patching turns ``threading`` into
+green threads and ``select`` into a hub-cooperative version. The loop thread is
+therefore started with the original ``_thread`` module and an unpatched
+selector, and the hand-off back to the caller never blocks the hub (nor ties
+up a native thread per waiting request):
+
+- ``threading``: the caller waits on a native lock
+- ``eventlet``: the loop thread writes the call id to a pipe; one dispatcher
+  greenlet reads it and wakes the caller's green ``Event``
+- ``gevent``: the loop thread fires the caller's hub ``async_`` watcher
+
+``hub_spawn(fn)`` goes the other way: code on the loop thread (or any native
+thread) starts ``fn`` in a new greenlet on the hub, for work that only runs
+there (``socketio.emit``, ``start_background_task``, green locks and events).
+"""
+
+import asyncio
+import contextvars
+import importlib.util
+import itertools
+import logging
+import struct
+import sys
+import threading
+import time
+import types
+from collections import deque
+from typing import Any, Dict, Optional
+
+from perf_metrics import Histogram
+
+logger = logging.getLogger(__name__)
+
+_KEY = struct.Struct('>Q')
+
+
+def _native_selectors(native_select):
+    """Private copy of the selectors module bound to the unpatched select (keeps epoll)"""
+    spec = importlib.util.find_spec('selectors')
+    module = importlib.util.module_from_spec(spec)
+    patched = sys.modules['select']
+    sys.modules['select'] = native_select
+    try:
+        spec.loader.exec_module(module)
+    finally:
+        sys.modules['select'] = patched
+    return module
+
+
+def _native_primitives(async_mode: str):
+    """(start_new_thread, allocate_lock, selector factory) that bypass monkey-patching"""
+    import _thread
+    import selectors
+    if async_mode == 'eventlet':
+        from eventlet import patcher
+        native_thread = patcher.original('_thread')
+        native_select = patcher.original('select')
+        return (native_thread.start_new_thread, native_thread.allocate_lock,
+                _native_selectors(native_select).DefaultSelector)
+    if async_mode == 'gevent':
+        import select
+        from gevent import monkey
+        start, allocate = monkey.get_original('_thread', ['start_new_thread', 'allocate_lock'])
+        native_select = types.ModuleType('select')
+        native_select.__dict__.update(select.__dict__)
+        native_select.__dict__.update(monkey.saved.get('select', {}))
+        return start, allocate, _native_selectors(native_select).DefaultSelector
+    return _thread.start_new_thread, _thread.allocate_lock, selectors.DefaultSelector
+
+
+class _NativeEvent:
+    """Single-waiter event on a native lock (safe between the loop thread and any caller)"""
+
+    __slots__ = ('_lock',)
+
+    def __init__(self, allocate_lock):
+        self._lock = allocate_lock()
+        self._lock.acquire()
+
+    def set(self):
+        try:
+            self._lock.release()
+        except RuntimeError:
+            pass
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self._lock.acquire(True, -1 if timeout is None else timeout)
+
+
+class _EventletWaker:
+    """Wakes green waiters from the loop thread through a pipe read by one greenlet"""
+
+    def __init__(self):
+        import os
+        import eventlet
+        from eventlet import greenio
+
+        self._os = os
+        self._read_fd, self._write_fd = os.pipe()
+        self._reader = greenio.GreenPipe(self._read_fd, 'rb', 0)
+        self._waiters: Dict[int, Any] = {}
+        self._ids = itertools.count(1)
+        # Clave 0: hay una función publicada por post() (deque: append/popleft atómicos)
+        self._posted = deque()
+        self._spawn_n = eventlet.spawn_n
+        eventlet.spawn_n(self._dispatch)
+
+    def register(self):
+        from eventlet import event
+        key = next(self._ids)
+        waiter = event.Event()
+        self._waiters[key] = waiter
+        return key, waiter
+
+    def unregister(self, key: int):
+        self._waiters.pop(key, None)
+
+    def notify(self, key: int):
+        # Llamado desde el thread del loop: escritura atómica (< PIPE_BUF)
+        self._os.write(self._write_fd, _KEY.pack(key))
+
+    def post(self, fn, args):
+        """From any thread: run fn(*args) in a new greenlet"""
+        self._posted.append((fn, args))
+        self.notify(0)
+
+    def _dispatch(self):
+        pending = b''
+        while True:
+            data = self._reader.read(_KEY.size * 64)
+            if not data:
+                return
+            pending += data
+            while len(pending) >= _KEY.size:
+                (key,) = _KEY.unpack(pending[:_KEY.size])
+                pending = pending[_KEY.size:]
+                if key == 0:
+                    fn, args = self._posted.popleft()
+                    self._spawn_n(fn, *args)
+                    continue
+                waiter = self._waiters.pop(key, None)
+                if waiter is not None and not waiter.ready():
+                    waiter.send(True)
+
+
+class _Handoff:
+    """Result slot shared between the loop thread and one caller; notify() wakes the caller"""
+
+    __slots__ = ('result', 'error', 'notify')
+
+    def __init__(self):
+        self.result = None
+        self.error = None
+        self.notify = None
+
+
+class BackgroundLoop:
+    """One asyncio loop per worker on a native thread; run(coro) from any thread or greenlet"""
+
+    def __init__(self, async_mode: str = 'threading', name: str = 'background-loop'):
+        self.async_mode = async_mode
+        self.name = name
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._start_thread, self._allocate_lock, self._selector = _native_primitives(async_mode)
+        self.overhead_ms = Histogram(buckets=(0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 25, 50, 100))
+        self.stats = {'submitted': 0, 'completed': 0, 'errors': 0, 'in_flight': 0, 'timeouts': 0}
+        self._waker: Optional[_EventletWaker] = None
+        self._hub = None
+
+    def start(self):
+        if self.loop is not None:
+            return
+        with self._start_lock:
+            if self.loop is not None:
+                return
+            loop = asyncio.SelectorEventLoop(self._selector())
+            ready = _NativeEvent(self._allocate_lock)
+
+            def _run():
+                asyncio.set_event_loop(loop)
+                loop.call_soon(ready.set)
+                loop.run_forever()
+
+            # El hub se toma desde el lado verde (quien arranca el loop), para hub_spawn
+            self._bind_hub()
+            # Thread nativo aunque threading esté parcheado (eventlet/gevent)
+            self._start_thread(_run, ())
+            ready.wait()
+            self.loop = loop
+            logger.info(f"[LOOP] {self.name} started (async_mode={self.async_mode})")
+
+    def _bind_hub(self):
+        if self.async_mode == 'eventlet' and self._waker is None:
+            self._waker = _EventletWaker()
+        elif self.async_mode == 'gevent' and self._hub is None:
+            import gevent
+            self._hub = gevent.get_hub()
+
+    @property
+    def green(self) -> bool:
+        """Socket.IO runs on green threads: hub-only work must go through hub_spawn"""
+        return self.async_mode in ('eventlet', 'gevent')
+
+    def hub_spawn(self, fn, *args):
+        """Run ``fn(*args)`` in a new greenlet on the hub; callable from the loop or any native thread.
+
+        Without eventlet/gevent it just starts a daemon thread.
+        """
+        self.start()
+        if self.async_mode == 'eventlet':
+            self._waker.post(fn, args)
+        elif self.async_mode == 'gevent':
+            import gevent
+            self._hub.loop.run_callback_threadsafe(gevent.spawn, fn, *args)
+        else:
+            threading.Thread(target=fn, args=args, daemon=True).start()
+
+    def native_lock(self):
+        """Unpatched lock for state shared between the loop thread and (green) request threads"""
+        return self._allocate_lock()
+
+    def start_native_thread(self, target, *args):
+        """Run ``target(*args)`` on a new native thread (blocking code off the green hub)"""
+        return self._start_thread(target, args)
+
+    def on_loop(self) -> bool:
+        try:
+            return self.loop is not None and asyncio.get_running_loop() is self.loop
+        except RuntimeError:
+            return False
+
+    def submit(self, coro):
+        """Schedule a coroutine; returns a concurrent.futures.Future (plain threads / other loops)"""
+        self.start()
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def _run_and_wait(self, schedule, handoff: _Handoff, timeout: Optional[float]) -> bool:
+        """Schedule the task and wait for it without blocking the green hub"""
+        if self.async_mode == 'eventlet':
+            import eventlet
+            key, waiter = self._waker.register()
+            handoff.notify = lambda: self._waker.notify(key)
+            try:
+                schedule()
+                with eventlet.Timeout(timeout, False):
+                    waiter.wait()
+                return waiter.ready()
+            finally:
+                self._waker.unregister(key)
+        if self.async_mode == 'gevent':
+            import gevent
+            hub = gevent.get_hub()
+            watcher = hub.loop.async_()
+            done = []
+            handoff.notify = lambda: (done.append(True), watcher.send())
+            try:
+                schedule()
+                with gevent.Timeout(timeout, False):
+                    while not done:
+                        hub.wait(watcher)
+                return bool(done)
+            finally:
+                watcher.close()
+        event = _NativeEvent(self._allocate_lock)
+        handoff.notify = event.set
+        schedule()
+        return event.wait(timeout)
+
+    def run(self, coro, timeout: Optional[float] = None) -> Any:
+        """Run a coroutine on the loop and return its result (blocks only the caller)"""
+        self.start()
+        if self.on_loop():
+            raise RuntimeError("BackgroundLoop.run() called from its own loop; await the coroutine instead")
+        submitted = time.perf_counter()
+        handoff = _Handoff()
+        context = contextvars.copy_context()
+        started = []
+        task_ref = []
+
+        def _done(task):
+            if task.cancelled():
+                handoff.error = asyncio.CancelledError()
+            elif task.exception() is not None:
+                handoff.error = task.exception()
+            else:
+                handoff.result = task.result()
+            handoff.notify()
+
+        def _start():
+            started.append(time.perf_counter())
+            # La task hereda el contexto del caller (request/app context de Flask)
+            task = self.loop.create_task(coro)
+            task.add_done_callback(_done)
+            task_ref.append(task)
+
+        def _cancel():
+            # En el loop y en orden FIFO detrás de _start: la task ya existe aunque el timeout
+            # haya vencido antes de que el loop llegara a crearla
+            if task_ref:
+                task_ref[0].cancel()
+
+        self._count(submitted=1, in_flight=1)
+        try:
+            finished = self._run_and_wait(lambda: self.loop.call_soon_threadsafe(context.run, _start),
+                                          handoff, timeout)
+            if not finished:
+                self._count(timeouts=1)
+                self.loop.call_soon_threadsafe(_cancel)
+                raise TimeoutError(f"Coroutine did not finish within {timeout}s")
+        finally:
+            self._count(in_flight=-1)
+        if started:
+            self.overhead_ms.observe((started[0] - submitted) * 1000)
+        if handoff.error is not None:
+            self._count(errors=1)
+            raise handoff.error
+        self._count(completed=1)
+        return handoff.result
+
+    def _count(self, **deltas):
+        with self._stats_lock:
+            for key, n in deltas.items():
+                self.stats[key] += n
+
+    def snapshot(self) -> Dict[str, Any]:
+        return dict(self.stats, running=bool(self.loop and self.loop.is_running()),
+                    async_mode=self.async_mode, schedule_delay_ms=self.overhead_ms.snapshot())
+
+    def shutdown(self, timeout: float = 5.0):
+        loop = self.loop
+        if loop is None or not loop.is_running():
+            return
+        loop.call_soon_threadsafe(loop.stop)
+        deadline = time.monotonic() + timeout
+        while loop.is_running() and time.monotonic() < deadline:
+            time.sleep(0.01)
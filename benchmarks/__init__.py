@@ -0,0 +1,5 @@
+"""
+Load and micro-benchmarks for the Realtime proxy.
+
+Run modules from the repository root, e.g. ``python -m benchmarks.relay_engines``.
+"""
@@ -0,0 +1,111 @@
+"""
+Per-request overhead of ``async_route``: new loop per request vs the worker loop.
+
+Registers a no-op async route (``/__bench/noop``) on the real app, and
+optionally drives ``/readyz`` against a FastAPI stub (``--with-backend``, see
+``benchmarks.backend_pool``). Each route is called ``--requests`` times through
+Flask's test client from ``--concurrency`` threads, once with
+``ASYNC_ROUTE_MODE=per_request`` (``asyncio.new_event_loop()`` / ``close()`` per
+call) and once with ``background`` (``BackgroundLoop.run``). The test client
+adds the same WSGI cost to both modes, so the difference is the loop overhead.
+
+Reported per route and mode: latency p50/p95/p99 in microseconds, requests
+per second, and for the background loop its schedule delay histogram.
+
+Usage:
+    python -m benchmarks.async_routes --requests 3000 --concurrency 4 --with-backend
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import threading
+import time
+
+from benchmarks.common import summarize
+
+os.environ.setdefault('SOCKETIO_ASYNC_MODE', 'threading')
+
+
+def run_route(client, path, requests, concurrency):
+    latencies = []
+    lock = threading.Lock()
+    counter = iter(range(requests))
+    errors = [0]
+
+    def worker():
+        while True:
+            with lock:
+                i = next(counter, None)
+            if i is None:
+                return
+            started = time.perf_counter()
+            response = client.get(path)
+            elapsed_us = (time.perf_counter() - started) * 1e6
+            with lock:
+                if response.status_code == 200:
+                    latencies.append(elapsed_us)
+                else:
+                    errors[0] += 1
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+    return {
+        'requests': len(latencies),
+        'errors': errors[0],
+        'requests_per_second': round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        'latency_us': summarize(latencies)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=1)
+    parser.add_argument('--with-backend', action='store_true', help='also measure /readyz against a stub')
+    parser.add_argument('--port', type=int, default=8796)
+    options = parser.parse_args()
+
+    stub = None
+    if options.with_backend:
+        from benchmarks.backend_pool import run_stub
+
+        os.environ['FASTAPI_URL'] = f"http://127.0.0.1:{options.port}/ask"
+        ready = multiprocessing.Event()
+        stub = multiprocessing.Process(target=run_stub, args=(options.port, 0.0, ready), daemon=True)
+        stub.start()
+        if not ready.wait(15):
+            raise SystemExit("stub backend did not start")
+
+    import app as app_module
+
+    async def bench_noop():
+        return 'ok'
+
+    app_module.app.add_url_rule('/__bench/noop', 'bench_noop', app_module.async_route(bench_noop))
+    client = app_module.app.test_client()
+    paths = ['/__bench/noop'] + (['/readyz'] if options.with_backend else [])
+
+    results = {'concurrency': options.concurrency, 'routes': {}}
+    try:
+        for path in paths:
+            results['routes'][path] = {}
+            for mode in ('per_request', 'background'):
+                app_module.ASYNC_ROUTE_MODE = mode
+                run_route(client, path, 50, options.concurrency)  # calentamiento
+                results['routes'][path][mode] = run_route(client, path, options.requests, options.concurrency)
+        results['background_loop'] = app_module.background_loop.snapshot()
+    finally:
+        if stub is not None:
+            stub.terminate()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
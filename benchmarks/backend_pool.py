@@ -0,0 +1,161 @@
+"""
+Added latency of FastAPI RAG calls: per-request client vs the shared pool.
+
+Starts a stub of the RAG backend (FastAPI + uvicorn, ``POST /ask`` answering
+after ``--backend-delay-ms`` and ``GET /health``) in a child process, then
+issues ``--requests`` calls from ``--concurrency`` threads. Each call runs the
+way ``async_route`` runs a Flask route (a fresh event loop per request) in
+two modes:
+
+- ``per_request``: a new ``httpx.AsyncClient`` per call (the old behaviour,
+  new TCP connection every time)
+- ``pooled``: ``BackendClientPool.request`` (shared keep-alive connections)
+
+Reported per mode: added latency (call time minus the stub's delay)
+p50/p95/p99, and for the pool its connection metrics (TCP connects, reuse
+ratio). ``--url`` targets an already running backend instead of the stub
+(``--backend-delay-ms`` should then be its typical service time, or 0).
+
+Usage:
+    python -m benchmarks.backend_pool --requests 2000 --concurrency 16 --backend-delay-ms 5
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import threading
+import time
+
+import httpx
+
+from background_loop import BackgroundLoop
+from backend_client import BackendClientPool
+from benchmarks.common import summarize
+
+
+def run_stub(port, delay_ms, ready):
+    import uvicorn
+    from fastapi import FastAPI
+
+    stub = FastAPI()
+
+    @stub.post('/ask')
+    async def ask(payload: dict):
+        await asyncio.sleep(delay_ms / 1000.0)
+        return {'answer': f"stub answer for {payload.get('question', '')}", 'sources': []}
+
+    @stub.get('/health')
+    async def health():
+        return {'status': 'ok'}
+
+    config = uvicorn.Config(stub, host='127.0.0.1', port=port, log_level='warning', access_log=False)
+    server = uvicorn.Server(config)
+    loop = asyncio.new_event_loop()
+    task = loop.create_task(server.serve())
+
+    async def _signal_ready():
+        while not server.started:
+            await asyncio.sleep(0.05)
+        ready.set()
+
+    loop.run_until_complete(asyncio.gather(task, _signal_ready()))
+
+
+async def per_request_call(url, payload):
+    async with httpx.AsyncClient(timeout=30) as client:
+        return await client.post(url, json=payload)
+
+
+def run_mode(mode, options, pool):
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    counter = iter(range(options.requests))
+
+    def worker():
+        while True:
+            with lock:
+                i = next(counter, None)
+            if i is None:
+                return
+            payload = {'question': f"pressure in well {i % 50}", 'session_id': 'bench'}
+            # Igual que async_route: un loop nuevo por request
+            loop = asyncio.new_event_loop()
+            started = time.perf_counter()
+            try:
+                if mode == 'pooled':
+                    response = loop.run_until_complete(pool.request('POST', options.url, json=payload))
+                else:
+                    response = loop.run_until_complete(per_request_call(options.url, payload))
+                response.raise_for_status()
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                with lock:
+                    latencies.append(max(elapsed_ms - options.backend_delay_ms, 0.0))
+            except Exception:
+                with lock:
+                    errors[0] += 1
+            finally:
+                loop.close()
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(options.concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+    return {
+        'requests': len(latencies),
+        'errors': errors[0],
+        'requests_per_second': round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        'added_latency_ms': summarize(latencies)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--backend-delay-ms', type=float, default=5.0)
+    parser.add_argument('--port', type=int, default=8799)
+    parser.add_argument('--url', help='existing backend /ask URL (skips the stub)')
+    parser.add_argument('--max-keepalive', type=int, default=20)
+    options = parser.parse_args()
+
+    stub = None
+    if not options.url:
+        options.url = f"http://127.0.0.1:{options.port}/ask"
+        ready = multiprocessing.Event()
+        stub = multiprocessing.Process(target=run_stub, args=(options.port, options.backend_delay_ms, ready),
+                                       daemon=True)
+        stub.start()
+        if not ready.wait(15):
+            raise SystemExit("stub backend did not start")
+
+    runner = BackgroundLoop(name='bench-backend-loop')
+    pool = BackendClientPool(runner, timeout=30, max_keepalive_connections=options.max_keepalive)
+    try:
+        # Calentamiento: evita medir imports y el primer handshake
+        run_mode('per_request', argparse.Namespace(**dict(vars(options), requests=20)), pool)
+        run_mode('pooled', argparse.Namespace(**dict(vars(options), requests=20)), pool)
+        results = {
+            'url': options.url,
+            'concurrency': options.concurrency,
+            'backend_delay_ms': options.backend_delay_ms,
+            'per_request': run_mode('per_request', options, pool),
+            'pooled': run_mode('pooled', options, pool)
+        }
+        snapshot = pool.snapshot()
+        results['pooled']['connections'] = {k: snapshot[k] for k in ('requests', 'tcp_connects', 'connection_reuse_ratio')}
+        results['pooled']['connections']['pool'] = snapshot['pool']
+    finally:
+        pool.close()
+        runner.shutdown()
+        if stub is not None:
+            stub.terminate()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,148 @@
+"""
+Capacity report for the Realtime proxy: how many sessions a worker sustains.
+
+Starts ``benchmarks.fake_azure_realtime`` (unless ``--no-fake-server``), then runs
+``benchmarks.socketio_swarm`` at increasing client counts (``--steps``) against an
+already running proxy. The proxy must be started separately with
+``AZURE_OPENAI_ENDPOINT=ws://127.0.0.1:<fake port>``, e.g.:
+
+    AZURE_OPENAI_ENDPOINT=ws://127.0.0.1:8765 AZURE_OPENAI_API_KEY=x \\
+        GUNICORN_WORKERS=1 gunicorn -c startup.py app:app
+
+While each step runs, CPU and RSS of ``--server-pid`` and its children (the
+gunicorn master and workers) are sampled once per second. For every step the
+report lists sustained sessions, sessions per worker, forwarding and
+first-audio p50/p99, server CPU and RSS; the largest step that keeps every
+session sustained and forwarding p99 under ``--slo-p99-ms`` gives the
+per-worker capacity used to suggest ``GUNICORN_WORKERS`` for ``--target-sessions``.
+
+Usage:
+    python -m benchmarks.capacity_report --server-pid 12345 --workers 1 --steps 25,50,100,200
+"""
+
+import argparse
+import json
+import math
+import multiprocessing
+import threading
+import time
+
+from benchmarks import fake_azure_realtime, socketio_swarm
+
+
+class ProcessSampler:
+    """Samples CPU% and RSS of a process tree in a background thread"""
+
+    def __init__(self, pid, interval_s=1.0):
+        self.pid = pid
+        self.interval_s = interval_s
+        self.cpu = []
+        self.rss_mb = []
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _processes(self, psutil):
+        root = psutil.Process(self.pid)
+        return [root] + root.children(recursive=True)
+
+    def _run(self):
+        import psutil
+
+        known = {}
+        while not self._stop.is_set():
+            try:
+                procs = self._processes(psutil)
+            except psutil.NoSuchProcess:
+                return
+            cpu = 0.0
+            rss = 0
+            for p in procs:
+                # cpu_percent necesita la misma instancia entre muestras
+                proc = known.setdefault(p.pid, p)
+                try:
+                    cpu += proc.cpu_percent(None)
+                    rss += proc.memory_info().rss
+                except psutil.NoSuchProcess:
+                    known.pop(p.pid, None)
+            self.cpu.append(cpu)
+            self.rss_mb.append(rss / (1024 ** 2))
+            self._stop.wait(self.interval_s)
+
+    def start(self):
+        if self.pid:
+            self._thread = threading.Thread(target=self._run, name='capacity-sampler', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(5)
+        # La primera muestra de cpu_percent siempre es 0
+        cpu = self.cpu[1:] or self.cpu
+        return {
+            'cpu_percent_avg': round(sum(cpu) / len(cpu), 1) if cpu else None,
+            'cpu_percent_max': round(max(cpu), 1) if cpu else None,
+            'rss_mb_max': round(max(self.rss_mb), 1) if self.rss_mb else None
+        }
+
+
+def run_step(options, clients):
+    sampler = ProcessSampler(options.server_pid)
+    sampler.start()
+    result = socketio_swarm.run_swarm(options, clients)
+    result['server'] = sampler.stop()
+    result['sessions_per_worker'] = round(result['sustained_sessions'] / max(options.workers, 1), 1)
+    result['within_slo'] = (result['sustained_sessions'] == clients
+                            and result['forward_latency_ms']['p99'] <= options.slo_p99_ms)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    socketio_swarm.add_arguments(parser)
+    parser.add_argument('--steps', default='10,25,50,100', help='client counts, one swarm run each')
+    parser.add_argument('--workers', type=int, default=1, help='proxy worker processes under test')
+    parser.add_argument('--server-pid', type=int, default=0, help='gunicorn master / app.py pid to sample')
+    parser.add_argument('--slo-p99-ms', type=float, default=250.0)
+    parser.add_argument('--target-sessions', type=int, default=0, help='concurrent sessions to plan workers for')
+    parser.add_argument('--no-fake-server', action='store_true', help='use an already running upstream')
+    parser.add_argument('--fake-port', type=int, default=8765)
+    parser.add_argument('--cooldown-s', type=float, default=5.0)
+    options = parser.parse_args()
+
+    server = None
+    if not options.no_fake_server:
+        fake_options = fake_azure_realtime.add_arguments(argparse.ArgumentParser()).parse_args([
+            '--port', str(options.fake_port), '--turn-audio-ms', str(options.turn_audio_ms)
+        ])
+        ready = multiprocessing.Event()
+        server = multiprocessing.Process(target=fake_azure_realtime.run_in_process,
+                                         args=(fake_options, ready), daemon=True)
+        server.start()
+        ready.wait(10)
+
+    steps = []
+    try:
+        for clients in [int(s) for s in options.steps.split(',') if s.strip()]:
+            print(f"Running step: {clients} clients for {options.duration:.0f}s")
+            steps.append(run_step(options, clients))
+            time.sleep(options.cooldown_s)
+    finally:
+        if server is not None:
+            server.terminate()
+
+    passing = [s for s in steps if s['within_slo']]
+    capacity = max((s['sessions_per_worker'] for s in passing), default=0)
+    report = {
+        'workers': options.workers,
+        'slo_p99_ms': options.slo_p99_ms,
+        'steps': steps,
+        'sessions_per_worker_capacity': capacity
+    }
+    if options.target_sessions and capacity:
+        report['suggested_gunicorn_workers'] = math.ceil(options.target_sessions / capacity)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""
+Shared helpers for the benchmark scripts
+"""
+
+import json
+import math
+import os
+import threading
+
+# Fields added by the browser when it dumped the event history
+CLIENT_FIELDS = ('timestamp', 'time')
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    k = max(0, min(len(ordered) - 1, math.ceil(pct / 100.0 * len(ordered)) - 1))
+    return ordered[k]
+
+
+def summarize(samples):
+    """p50/p95/p99/max summary for a list of latencies in ms"""
+    return {
+        'count': len(samples),
+        'p50': round(percentile(samples, 50), 3),
+        'p95': round(percentile(samples, 95), 3),
+        'p99': round(percentile(samples, 99), 3),
+        'max': round(max(samples), 3) if samples else 0.0
+    }
+
+
+def rss_mb():
+    """Resident set size of this process in MB"""
+    try:
+        import psutil
+        return round(psutil.Process(os.getpid()).memory_info().rss / (1024 ** 2), 1)
+    except ImportError:
+        import resource
+        return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def cpu_seconds():
+    """User + system CPU time consumed by this process"""
+    times = os.times()
+    return times.user + times.system
+
+
+def thread_count():
+    return threading.active_count()
+
+
+def load_event_history(path):
+    """Recorded session dump (``eventHistory``) as [(timestamp_ms, upstream JSON frame)]"""
+    with open(path, 'r', encoding='utf-8') as f:
+        dump = json.load(f)
+    events = sorted(dump.get('eventHistory', []), key=lambda e: int(e.get('timestamp', 0)))
+    history = []
+    for e in events:
+        # "type" primero, como lo envía Azure
+        upstream = {'type': e.get('type')}
+        upstream.update({k: v for k, v in e.items() if k not in CLIENT_FIELDS and k != 'type'})
+        history.append((int(e.get('timestamp', 0)), json.dumps(upstream, separators=(',', ':'))))
+    return history
@@ -0,0 +1,91 @@
+"""
+Per-event CPU cost of upstream message handling in RealtimeWebSocketProxy.on_message.
+
+Replays the ``eventHistory`` of a recorded session dump (default:
+``templates/logs_jason.json``) as upstream JSON frames and compares:
+
+- ``legacy_debug``: json.loads on every frame, twice (SOCKETIO_DEBUG_EVENTS +
+  ENABLE_DETAILED_LOGGING), as before the dispatch layer
+- ``json_once``: a single json.loads per frame
+- ``lazy_dispatch``: prefix type sniffing, full parse only for the event types
+  with server-side handlers (session, errors, function calls, usage)
+
+Usage:
+    python -m benchmarks.event_dispatch --repeat 200
+"""
+
+import argparse
+import json
+import time
+from collections import defaultdict
+
+from benchmarks.common import load_event_history
+from realtime_events import EventDispatcher, UpstreamEvent
+
+HANDLED_TYPES = ('session.created', 'session.updated', 'error',
+                 'response.function_call_arguments.done', 'response.done')
+
+
+def load_frames(path):
+    return [frame for _, frame in load_event_history(path)]
+
+
+def legacy_debug(frame, dispatcher):
+    msg_type = json.loads(frame).get('type', 'unknown')
+    json.loads(frame).get('type', 'unknown')
+    return msg_type
+
+
+def json_once(frame, dispatcher):
+    return json.loads(frame).get('type', 'unknown')
+
+
+def lazy_dispatch(frame, dispatcher):
+    event = UpstreamEvent(frame)
+    if dispatcher.handles(event.type):
+        dispatcher.dispatch(event)
+    return event.type
+
+
+def measure(fn, frames, repeat, dispatcher):
+    per_type = defaultdict(lambda: [0, 0])
+    total_ns = 0
+    for _ in range(repeat):
+        for frame in frames:
+            t0 = time.perf_counter_ns()
+            msg_type = fn(frame, dispatcher)
+            dt = time.perf_counter_ns() - t0
+            total_ns += dt
+            per_type[msg_type][0] += 1
+            per_type[msg_type][1] += dt
+    count = repeat * len(frames)
+    return {
+        'events': count,
+        'mean_us_per_event': round(total_ns / max(count, 1) / 1000, 3),
+        'per_type_mean_us': {t: round(ns / n / 1000, 3) for t, (n, ns) in sorted(per_type.items())}
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--file', default='templates/logs_jason.json')
+    parser.add_argument('--repeat', type=int, default=100)
+    args = parser.parse_args()
+
+    frames = load_frames(args.file)
+    dispatcher = EventDispatcher()
+    # Handlers touch .data so the parse cost of handled types is included
+    dispatcher.on(HANDLED_TYPES, lambda event: event.data)
+
+    results = {
+        'frames': len(frames),
+        'bytes': sum(len(f) for f in frames),
+        'legacy_debug': measure(legacy_debug, frames, args.repeat, dispatcher),
+        'json_once': measure(json_once, frames, args.repeat, dispatcher),
+        'lazy_dispatch': measure(lazy_dispatch, frames, args.repeat, dispatcher)
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
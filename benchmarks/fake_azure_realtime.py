@@ -0,0 +1,202 @@
+"""
+Local stand-in for the Azure OpenAI Realtime websocket endpoint.
+
+Speaks enough of the protocol for the proxy to behave as in production:
+
+- ``session.created`` on connect, ``session.updated`` for every ``session.update``
+- server VAD emulation: the first ``input_audio_buffer.append`` of a turn emits
+  ``input_audio_buffer.speech_started``; once ``--turn-audio-ms`` of PCM16 has been
+  appended (or on ``input_audio_buffer.commit``) it emits ``speech_stopped``,
+  ``committed``, ``conversation.item.created`` and starts a response
+- responses stream ``response.audio.delta`` chunks of ``--chunk-ms`` audio at
+  real-time pace (after ``--think-ms``), ``response.audio_transcript.delta`` every
+  few chunks, then the ``*.done`` events and ``response.done`` with usage
+- ``response.create`` starts a response, ``response.cancel`` stops it
+
+Every delta carries ``sent_ns`` (``time.monotonic_ns()``, shared by processes on
+the same host) so clients can measure relay forwarding latency.
+
+Point the proxy at it with ``AZURE_OPENAI_ENDPOINT=ws://127.0.0.1:8765`` and any
+``AZURE_OPENAI_API_KEY``.
+
+Usage:
+    python -m benchmarks.fake_azure_realtime --port 8765 --response-ms 3000
+"""
+
+import argparse
+import asyncio
+import base64
+import itertools
+import json
+import os
+import time
+
+# PCM16 mono 24 kHz
+BYTES_PER_MS = 48
+
+_ids = itertools.count(1)
+
+
+def _id(prefix):
+    return f"{prefix}_{next(_ids):08d}"
+
+
+class FakeRealtimeSession:
+    """Protocol state of one upstream websocket"""
+
+    def __init__(self, ws, options):
+        self.ws = ws
+        self.options = options
+        self.session = {'id': _id('sess'), 'modalities': ['text', 'audio']}
+        self.speaking = False
+        self.buffered_ms = 0.0
+        self.response_task = None
+        chunk_bytes = int(options.chunk_ms * BYTES_PER_MS)
+        self.audio_chunk = base64.b64encode(os.urandom(chunk_bytes)).decode('ascii')
+
+    async def send(self, event):
+        event.setdefault('event_id', _id('event'))
+        await self.ws.send(json.dumps(event))
+
+    async def run(self):
+        await self.send({'type': 'session.created', 'session': self.session})
+        async for raw in self.ws:
+            try:
+                msg = json.loads(raw)
+            except ValueError:
+                await self.send({'type': 'error', 'error': {'type': 'invalid_request_error', 'message': 'Invalid JSON'}})
+                continue
+            await self.handle(msg)
+        if self.response_task is not None:
+            self.response_task.cancel()
+
+    async def handle(self, msg):
+        msg_type = msg.get('type')
+        if msg_type == 'session.update':
+            self.session.update(msg.get('session') or {})
+            await self.send({'type': 'session.updated', 'session': self.session})
+        elif msg_type == 'input_audio_buffer.append':
+            # base64 -> bytes sin decodificar
+            self.buffered_ms += len(msg.get('audio', '')) * 3 / 4 / BYTES_PER_MS
+            if not self.speaking:
+                self.speaking = True
+                await self.send({'type': 'input_audio_buffer.speech_started', 'audio_start_ms': 0, 'item_id': _id('item')})
+                if self.response_task is not None:
+                    await self.cancel_response()
+            if self.buffered_ms >= self.options.turn_audio_ms:
+                await self.commit()
+        elif msg_type == 'input_audio_buffer.commit':
+            await self.commit()
+        elif msg_type == 'conversation.item.create':
+            item = dict(msg.get('item') or {}, id=_id('item'))
+            await self.send({'type': 'conversation.item.created', 'item': item})
+        elif msg_type == 'response.create':
+            self.start_response()
+        elif msg_type == 'response.cancel':
+            await self.cancel_response()
+
+    async def commit(self):
+        item_id = _id('item')
+        self.speaking = False
+        self.buffered_ms = 0.0
+        await self.send({'type': 'input_audio_buffer.speech_stopped', 'audio_end_ms': 0, 'item_id': item_id})
+        await self.send({'type': 'input_audio_buffer.committed', 'item_id': item_id})
+        await self.send({'type': 'conversation.item.created', 'item': {'id': item_id, 'type': 'message', 'role': 'user'}})
+        self.start_response()
+
+    def start_response(self):
+        if self.response_task is None or self.response_task.done():
+            self.response_task = asyncio.ensure_future(self.stream_response())
+
+    async def cancel_response(self):
+        task, self.response_task = self.response_task, None
+        if task is not None and not task.done():
+            task.cancel()
+
+    async def stream_response(self):
+        opts = self.options
+        response_id = _id('resp')
+        item_id = _id('item')
+        ids = {'response_id': response_id, 'item_id': item_id, 'output_index': 0, 'content_index': 0}
+        await self.send({'type': 'response.created', 'response': {'id': response_id, 'status': 'in_progress'}})
+        status = 'completed'
+        chunks = max(1, int(opts.response_ms / opts.chunk_ms))
+        try:
+            await asyncio.sleep(opts.think_ms / 1000.0)
+            await self.send({'type': 'response.output_item.added', 'response_id': response_id,
+                             'output_index': 0, 'item': {'id': item_id, 'type': 'message', 'role': 'assistant'}})
+            started = time.monotonic()
+            for i in range(chunks):
+                await self.send(dict(ids, type='response.audio.delta', delta=self.audio_chunk, sent_ns=time.monotonic_ns()))
+                if i % 4 == 0:
+                    await self.send(dict(ids, type='response.audio_transcript.delta', delta='hola ', sent_ns=time.monotonic_ns()))
+                # Ritmo de tiempo real (sin acumular deriva)
+                delay = started + (i + 1) * opts.chunk_ms / 1000.0 / opts.speed - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            await self.send(dict(ids, type='response.audio.done'))
+            await self.send(dict(ids, type='response.audio_transcript.done', transcript='hola ' * ((chunks + 3) // 4)))
+            await self.send({'type': 'response.output_item.done', 'response_id': response_id, 'output_index': 0,
+                             'item': {'id': item_id, 'type': 'message', 'status': 'completed'}})
+        except asyncio.CancelledError:
+            status = 'cancelled'
+        output_tokens = chunks * 3
+        await self.send({'type': 'response.done', 'response': {
+            'id': response_id,
+            'status': status,
+            'usage': {
+                'total_tokens': 120 + output_tokens,
+                'input_tokens': 120,
+                'output_tokens': output_tokens,
+                'input_token_details': {'text_tokens': 100, 'audio_tokens': 20, 'cached_tokens': 0},
+                'output_token_details': {'text_tokens': chunks // 4, 'audio_tokens': output_tokens - chunks // 4}
+            }
+        }})
+
+
+async def serve_forever(host, port, options, ready=None):
+    from websockets.asyncio.server import serve
+
+    async def handler(ws):
+        try:
+            await FakeRealtimeSession(ws, options).run()
+        except Exception:
+            # Cierre abrupto del cliente: normal en load tests
+            pass
+
+    async with serve(handler, host, port, max_size=None):
+        if ready is not None:
+            ready.set()
+        await asyncio.Future()
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_arguments(parser)
+    return parser
+
+
+def add_arguments(parser):
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--chunk-ms', type=float, default=50.0, help='audio per response.audio.delta')
+    parser.add_argument('--response-ms', type=float, default=3000.0, help='audio per response')
+    parser.add_argument('--think-ms', type=float, default=300.0, help='delay before the first delta')
+    parser.add_argument('--turn-audio-ms', type=float, default=2000.0, help='appended audio that ends a user turn')
+    parser.add_argument('--speed', type=float, default=1.0, help='playback speed multiplier for deltas')
+    return parser
+
+
+def run_in_process(options, ready):
+    """multiprocessing target used by capacity_report"""
+    asyncio.run(serve_forever(options.host, options.port, options, ready))
+
+
+def main():
+    options = build_parser().parse_args()
+    print(f"Fake Azure Realtime listening on ws://{options.host}:{options.port}/openai/realtime")
+    asyncio.run(serve_forever(options.host, options.port, options))
+
+
+if __name__ == '__main__':
+    main()
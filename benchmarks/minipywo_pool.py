@@ -0,0 +1,110 @@
+"""
+Relay latency while heavy in-process minipywo queries run (``FairBlockingPool``).
+
+Runs under eventlet, like production. A "relay" greenlet forwards a frame
+every ``--tick-ms`` (the cadence of audio deltas) and records how late each
+one is. Meanwhile ``--clients`` greenlets each send ``--queries`` heavy queries:
+a stand-in for ``wl_pywo.invoke`` that blocks its OS thread for
+``--query-ms`` (unpatched ``time.sleep``, as a non-green client library
+would). The queries run in three modes:
+
+- ``idle``: no queries, the baseline relay lateness
+- ``inline``: called directly in the greenlet, as ``handle_process_message`` did
+- ``pool``: ``BackgroundLoop.run(pool.call(...))`` on native worker threads
+
+Reported per mode: relay lateness p50/p95/p99/max (ms), query latency, the
+time to run them all, and the pool snapshot (queue depth, queue wait and
+execution histograms). With the pool the relay lateness should stay near the
+idle baseline; inline it grows with ``--query-ms``.
+
+Usage:
+    python -m benchmarks.minipywo_pool --clients 8 --queries 3 --query-ms 300 --workers 4
+"""
+
+import eventlet
+
+eventlet.monkey_patch()
+
+import argparse  # noqa: E402
+import json  # noqa: E402
+import time  # noqa: E402
+
+from eventlet import patcher  # noqa: E402
+
+from background_loop import BackgroundLoop  # noqa: E402
+from benchmarks.common import summarize  # noqa: E402
+from blocking_pool import FairBlockingPool  # noqa: E402
+
+_native_time = patcher.original('time')
+
+
+def heavy_query(query_ms):
+    """Blocks the calling OS thread, like a synchronous agentic call"""
+    _native_time.sleep(query_ms / 1000.0)
+    return {'query_result': 'ok'}
+
+
+def relay(tick_ms, stop, lateness):
+    expected = time.perf_counter()
+    while not stop:
+        expected += tick_ms / 1000.0
+        eventlet.sleep(max(0.0, expected - time.perf_counter()))
+        lateness.append(max(0.0, (time.perf_counter() - expected) * 1000))
+
+
+def run_mode(mode, options, runner, pool):
+    stop, lateness, query_ms = [], [], []
+    relay_thread = eventlet.spawn(relay, options.tick_ms, stop, lateness)
+    eventlet.sleep(0.2)
+
+    def client(index):
+        for _ in range(options.queries):
+            started = time.perf_counter()
+            if mode == 'inline':
+                heavy_query(options.query_ms)
+            else:
+                runner.run(pool.call(f"client-{index}", heavy_query, options.query_ms))
+            query_ms.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    if mode != 'idle':
+        clients = [eventlet.spawn(client, i) for i in range(options.clients)]
+        for c in clients:
+            c.wait()
+    else:
+        eventlet.sleep(1.0)
+    elapsed = time.perf_counter() - started
+    stop.append(True)
+    relay_thread.wait()
+    return {
+        'relay_lateness_ms': summarize(lateness),
+        'query_ms': summarize(query_ms),
+        'elapsed_s': round(elapsed, 2)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--queries', type=int, default=3)
+    parser.add_argument('--query-ms', type=float, default=300)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--tick-ms', type=float, default=20)
+    options = parser.parse_args()
+
+    runner = BackgroundLoop(async_mode='eventlet', name='bench-minipywo-loop')
+    pool = FairBlockingPool(runner, workers=options.workers, max_queue=options.clients * options.queries,
+                            max_per_client=options.queries, name='bench-minipywo-pool')
+    results = {'options': vars(options), 'modes': {}}
+    try:
+        for mode in ('idle', 'inline', 'pool'):
+            results['modes'][mode] = run_mode(mode, options, runner, pool)
+        results['pool'] = pool.snapshot()
+    finally:
+        pool.close()
+        runner.shutdown()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
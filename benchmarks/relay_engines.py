@@ -0,0 +1,154 @@
+"""
+Compare the threaded and asyncio Realtime relay engines.
+
+A local websocket server (separate process) plays the role of Azure OpenAI
+Realtime: after the client's ``session.update`` it streams ``--events`` audio
+deltas every ``--interval-ms`` milliseconds, each stamped with a monotonic
+send time. Both engines open ``--connections`` upstream sockets through
+``realtime_relay`` and the benchmark reports connections per worker, thread
+count, RSS and per-event forwarding latency (upstream send -> on_message).
+
+Usage:
+    python -m benchmarks.relay_engines --connections 300 --events 200
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import multiprocessing
+import os
+import threading
+import time
+
+from benchmarks.common import cpu_seconds, rss_mb, summarize, thread_count
+from realtime_relay import create_relay
+
+AUDIO_CHUNK = base64.b64encode(os.urandom(4800)).decode('ascii')  # 100 ms PCM16 @ 24 kHz
+
+
+def _serve(host, port, events, interval_ms, ready):
+    from websockets.asyncio.server import serve
+
+    async def handler(ws):
+        async for raw in ws:
+            msg = json.loads(raw)
+            if msg.get('type') != 'session.update':
+                continue
+            await ws.send(json.dumps({'type': 'session.updated'}))
+            for i in range(events):
+                await ws.send(json.dumps({
+                    'type': 'response.audio.delta',
+                    'response_id': 'resp_bench',
+                    'item_id': 'item_bench',
+                    'delta': AUDIO_CHUNK,
+                    'seq': i,
+                    'sent_ns': time.monotonic_ns()
+                }))
+                await asyncio.sleep(interval_ms / 1000.0)
+            await ws.send(json.dumps({'type': 'response.done'}))
+
+    async def main():
+        async with serve(handler, host, port, max_size=None):
+            ready.set()
+            await asyncio.Future()
+
+    asyncio.run(main())
+
+
+def run_engine(mode, url, connections, events, timeout):
+    relay = create_relay(mode)
+    latencies = []
+    lock = threading.Lock()
+    opened = threading.Semaphore(0)
+    finished = threading.Semaphore(0)
+    peak_threads = thread_count()
+    rss_before = rss_mb()
+    cpu_before = cpu_seconds()
+
+    def on_open(ws):
+        ws.send(json.dumps({'type': 'session.update', 'session': {}}))
+        opened.release()
+
+    def on_message(ws, message):
+        received = time.monotonic_ns()
+        msg = json.loads(message)
+        if 'sent_ns' in msg:
+            with lock:
+                latencies.append((received - msg['sent_ns']) / 1e6)
+        elif msg.get('type') == 'response.done':
+            finished.release()
+
+    def on_error(ws, error):
+        print(f"[{mode}] upstream error: {error}")
+
+    def on_close(ws, code=None, reason=None):
+        pass
+
+    started = time.perf_counter()
+    handles = [relay.open(url, on_open=on_open, on_message=on_message,
+                          on_error=on_error, on_close=on_close)
+               for _ in range(connections)]
+    established = sum(1 for _ in range(connections) if opened.acquire(timeout=timeout))
+    connect_time = time.perf_counter() - started
+    peak_threads = max(peak_threads, thread_count())
+
+    completed = 0
+    deadline = time.time() + timeout
+    while completed < established and time.time() < deadline:
+        if finished.acquire(timeout=0.5):
+            completed += 1
+        peak_threads = max(peak_threads, thread_count())
+    elapsed = time.perf_counter() - started
+
+    result = {
+        'mode': mode,
+        'connections_established': established,
+        'sessions_completed': completed,
+        'connect_seconds': round(connect_time, 3),
+        'peak_threads': peak_threads,
+        'rss_delta_mb': round(rss_mb() - rss_before, 1),
+        'cpu_seconds': round(cpu_seconds() - cpu_before, 3),
+        'events_per_second': round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        'forward_latency_ms': summarize(latencies)
+    }
+
+    for h in handles:
+        try:
+            h.close()
+        except Exception:
+            pass
+    relay.shutdown()
+    time.sleep(0.5)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--connections', type=int, default=100)
+    parser.add_argument('--events', type=int, default=100)
+    parser.add_argument('--interval-ms', type=float, default=20.0)
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--timeout', type=float, default=120.0)
+    parser.add_argument('--modes', default='threaded,asyncio')
+    args = parser.parse_args()
+
+    ready = multiprocessing.Event()
+    server = multiprocessing.Process(
+        target=_serve, args=('127.0.0.1', args.port, args.events, args.interval_ms, ready), daemon=True
+    )
+    server.start()
+    ready.wait(10)
+    url = f"ws://127.0.0.1:{args.port}/openai/realtime"
+
+    try:
+        results = [run_engine(mode.strip(), url, args.connections, args.events, args.timeout)
+                   for mode in args.modes.split(',') if mode.strip()]
+    finally:
+        server.terminate()
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,164 @@
+"""
+Replay recorded client event histories through the server-side relay path.
+
+Each dump (``templates/logs_jason.json`` by default, ``--file`` may be repeated)
+is turned back into upstream frames and fed to a real
+``RealtimeWebSocketProxy.on_message``, so the dispatcher, turn timeline,
+coalescing, binary audio and send queues all run exactly as configured by the
+environment (``REALTIME_*`` variables). Frames are paced by their recorded
+timestamps divided by ``--speed`` (``--speed 0`` replays as fast as possible).
+``--users`` replays run in parallel, each with its own proxy, to simulate
+concurrent sessions.
+
+Reported: per-event processing cost in on_message (overall and per event
+type), Socket.IO emits and emit throughput, RSS growth (and the tracemalloc
+peak with ``--tracemalloc``), plus the worker-wide coalescing and queue
+counters. No browser is attached: emits go to rooms without participants, so
+the cost measured is the relay's, not the network's.
+
+Usage:
+    python -m benchmarks.replay_sessions --speed 10 --users 50 --loops 3
+"""
+
+import argparse
+import json
+import os
+import threading
+import time
+import tracemalloc
+from collections import defaultdict
+
+from benchmarks.common import load_event_history, rss_mb, summarize
+from realtime_events import sniff_event_type
+
+# Background tasks must be real threads here (no eventlet hub running)
+os.environ.setdefault('SOCKETIO_ASYNC_MODE', 'threading')
+
+
+class NullUpstream:
+    """Upstream socket that accepts and counts what the proxy sends to Azure"""
+
+    def __init__(self):
+        self.sent = 0
+
+    def send(self, message):
+        self.sent += 1
+
+    def close(self):
+        pass
+
+
+class EmitCounter:
+    """Wraps SocketIO.emit to count emissions (and still perform them)"""
+
+    def __init__(self, emit):
+        self._emit = emit
+        self._lock = threading.Lock()
+        self.count = 0
+
+    def __call__(self, *args, **kwargs):
+        with self._lock:
+            self.count += 1
+        return self._emit(*args, **kwargs)
+
+
+def replay_user(app_module, index, histories, options, costs):
+    proxy = app_module.RealtimeWebSocketProxy(f"replay-{index}", f"replay-sid-{index}")
+    proxy.ws = NullUpstream()
+    proxy.is_connected = True
+    per_type = defaultdict(list)
+
+    for _ in range(options.loops):
+        for history in histories:
+            first_ts = history[0][0] if history else 0
+            started = time.monotonic()
+            for ts, frame in history:
+                if options.speed > 0:
+                    delay = started + (ts - first_ts) / 1000.0 / options.speed - time.monotonic()
+                    if delay > 0:
+                        time.sleep(delay)
+                t0 = time.perf_counter_ns()
+                proxy.on_message(proxy.ws, frame)
+                cost_us = (time.perf_counter_ns() - t0) / 1000
+                per_type[sniff_event_type(frame)].append(cost_us)
+
+    if proxy.coalescer is not None:
+        proxy.coalescer.flush()
+    if proxy.downstream is not None:
+        proxy.downstream.close()
+    costs[index] = per_type
+    return proxy
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--file', action='append', help='session dump with eventHistory (repeatable)')
+    parser.add_argument('--speed', type=float, default=1.0, help='N x recorded speed, 0 = unpaced')
+    parser.add_argument('--users', type=int, default=1, help='parallel replays')
+    parser.add_argument('--loops', type=int, default=1, help='replays of the dumps per user')
+    parser.add_argument('--tracemalloc', action='store_true', help='also report the Python heap peak')
+    options = parser.parse_args()
+
+    histories = [load_event_history(path) for path in (options.file or ['templates/logs_jason.json'])]
+
+    if options.tracemalloc:
+        tracemalloc.start()
+    rss_before = rss_mb()
+
+    import app as app_module
+    from realtime_coalescing import coalescing_totals
+    from realtime_queues import send_queue_totals
+    from realtime_turns import turn_latency_snapshot
+
+    emit_counter = EmitCounter(app_module.socketio.emit)
+    app_module.socketio.emit = emit_counter
+    rss_loaded = rss_mb()
+
+    costs = {}
+    started = time.perf_counter()
+    threads = [threading.Thread(target=replay_user, args=(app_module, i, histories, options, costs),
+                                name=f"replay-{i}", daemon=True)
+               for i in range(options.users)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    replay_seconds = time.perf_counter() - started
+
+    # Esperar a que las colas terminen de drenar antes de contar emisiones
+    deadline = time.time() + 30
+    while time.time() < deadline and send_queue_totals().get('downstream', {}).get('depth', 0):
+        time.sleep(0.05)
+    elapsed = time.perf_counter() - started
+
+    per_type = defaultdict(list)
+    for user_costs in costs.values():
+        for msg_type, samples in user_costs.items():
+            per_type[msg_type].extend(samples)
+    all_costs = [v for samples in per_type.values() for v in samples]
+
+    results = {
+        'users': options.users,
+        'speed': options.speed,
+        'events': len(all_costs),
+        'replay_seconds': round(replay_seconds, 3),
+        'on_message_us': summarize(all_costs),
+        'on_message_us_by_type': {t: summarize(s) for t, s in sorted(per_type.items())},
+        'emits': emit_counter.count,
+        'emits_per_second': round(emit_counter.count / elapsed, 1) if elapsed else 0.0,
+        'events_per_second': round(len(all_costs) / replay_seconds, 1) if replay_seconds else 0.0,
+        'rss_mb': {'before_import': rss_before, 'after_import': rss_loaded, 'after_replay': rss_mb()},
+        'coalescing': coalescing_totals(),
+        'relay': app_module.realtime_relay.stats(),
+        'send_queues': {d: {k: v for k, v in q.items() if k != 'time_in_queue_ms'}
+                        for d, q in send_queue_totals().items()},
+        'turns': turn_latency_snapshot()['completed']
+    }
+    if options.tracemalloc:
+        current, peak = tracemalloc.get_traced_memory()
+        results['tracemalloc_mb'] = {'current': round(current / 1024 ** 2, 1), 'peak': round(peak / 1024 ** 2, 1)}
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""
+Throughput of the server-side mic resampler, in audio-seconds per CPU-second.
+
+For every ``--rates`` input rate and ``--chunk-ms`` chunk size, ``--seconds`` of
+synthetic capture audio (speech-band tones plus noise, ``--encoding`` frames,
+``--channels`` interleaved) is pushed through one ``StreamingResampler`` chunk by
+chunk, as the browser's ScriptProcessor would deliver it. CPU time is measured
+with ``time.process_time`` (this process, all threads), so the ratio is
+independent of wall-clock noise.
+
+Reported per case: audio-seconds per CPU-second, microseconds per chunk and
+the concurrent real-time users one core could resample (``x realtime`` at the
+given ``--core-budget`` fraction of a core left for the rest of the relay).
+
+Usage:
+    python -m benchmarks.resample --rates 48000,44100,16000 --chunk-ms 20,85.3 --seconds 60
+"""
+
+import argparse
+import json
+import time
+
+import numpy as np
+
+from realtime_resample import StreamingResampler
+
+
+def capture_audio(rate, seconds, channels, encoding, seed=0):
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(rate * seconds)) / rate
+    mono = 0.3 * np.sin(2 * np.pi * 220 * t) + 0.1 * np.sin(2 * np.pi * 3100 * t)
+    frames = np.repeat(mono[:, None], channels, axis=1) + 0.02 * rng.standard_normal((len(t), channels))
+    frames = frames.astype(np.float32)
+    if encoding == 'int16':
+        return (np.clip(frames, -1, 1) * 32767).astype('<i2').tobytes()
+    return frames.astype('<f4').tobytes()
+
+
+def run_case(options, rate, chunk_ms):
+    audio = capture_audio(rate, options.seconds, options.channels, options.encoding)
+    frame_bytes = (4 if options.encoding == 'float32' else 2) * options.channels
+    chunk_bytes = max(1, int(rate * chunk_ms / 1000.0)) * frame_bytes
+    chunks = [audio[i:i + chunk_bytes] for i in range(0, len(audio), chunk_bytes)]
+
+    resampler = StreamingResampler(rate, out_rate=options.out_rate, channels=options.channels,
+                                   input_format=options.encoding)
+    out_bytes = 0
+    cpu_started = time.process_time()
+    for chunk in chunks:
+        out_bytes += len(resampler.process(chunk))
+    cpu_s = time.process_time() - cpu_started
+
+    speed = options.seconds / cpu_s if cpu_s else float('inf')
+    return {
+        'in_rate': rate,
+        'chunk_ms': chunk_ms,
+        'ratio': f"{resampler.up}/{resampler.down}",
+        'taps_per_phase': resampler.taps,
+        'delay_ms': round(resampler.delay_ms, 2),
+        'chunks': len(chunks),
+        'out_seconds': round(out_bytes / 2 / options.out_rate, 3),
+        'cpu_seconds': round(cpu_s, 4),
+        'audio_seconds_per_cpu_second': round(speed, 1),
+        'us_per_chunk': round(cpu_s * 1e6 / max(len(chunks), 1), 2),
+        'users_per_core': int(speed * options.core_budget)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rates', default='48000,44100,16000')
+    parser.add_argument('--chunk-ms', default='20,85.3', help='85.3 ms = 4096-frame ScriptProcessor at 48 kHz')
+    parser.add_argument('--seconds', type=float, default=60.0, help='audio per case')
+    parser.add_argument('--encoding', default='float32', choices=('float32', 'int16'))
+    parser.add_argument('--channels', type=int, default=1)
+    parser.add_argument('--out-rate', type=int, default=24000)
+    parser.add_argument('--core-budget', type=float, default=1.0, help='fraction of a core given to resampling')
+    options = parser.parse_args()
+
+    rates = [int(r) for r in options.rates.split(',') if r.strip()]
+    chunk_sizes = [float(c) for c in options.chunk_ms.split(',') if c.strip()]
+    results = {
+        'encoding': options.encoding,
+        'channels': options.channels,
+        'out_rate': options.out_rate,
+        'seconds_per_case': options.seconds,
+        'cases': [run_case(options, rate, chunk_ms) for rate in rates for chunk_ms in chunk_sizes]
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
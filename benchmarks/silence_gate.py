@@ -0,0 +1,116 @@
+"""
+Savings and CPU cost of the uplink silence gate on recorded audio.
+
+Audio sources (PCM16 mono at ``--sample-rate``):
+
+- ``--rtrec``: session recordings (``realtime_recording``); the mic audio
+  (``upstream`` appends) is used, or the model audio when a recording has none
+- ``--wav``: 16-bit mono WAV files
+- default: the ``response.audio.delta`` audio of ``templates/logs_jason.json``
+
+Each source is cut into ``--chunk-ms`` chunks, like the browser's
+``input_audio_buffer.append`` stream, and run through ``SilenceGate`` for every
+threshold in ``--thresholds``. Reported per threshold: frames and bytes saved,
+and gate CPU time per minute of audio.
+
+Usage:
+    python -m benchmarks.silence_gate --rtrec recordings/*.rtrec --thresholds=-60,-50,-40
+"""
+
+import argparse
+import base64
+import json
+import time
+import wave
+
+from realtime_vad import SilenceGate
+
+
+def load_dump_audio(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        dump = json.load(f)
+    events = sorted(dump.get('eventHistory', []), key=lambda e: int(e.get('timestamp', 0)))
+    return b''.join(base64.b64decode(e['delta']) for e in events
+                    if e.get('type') == 'response.audio.delta' and e.get('delta'))
+
+
+def load_rtrec_audio(path):
+    from realtime_recording import RecordingReader
+
+    audio = b''.join(RecordingReader(path).audio('upstream'))
+    return audio or b''.join(RecordingReader(path).audio('downstream'))
+
+
+def load_wav_audio(path):
+    with wave.open(path, 'rb') as w:
+        if w.getsampwidth() != 2 or w.getnchannels() != 1:
+            raise ValueError(f"{path}: expected 16-bit mono PCM")
+        return w.readframes(w.getnframes())
+
+
+def chunked(audio, chunk_bytes):
+    return [audio[i:i + chunk_bytes] for i in range(0, len(audio) - len(audio) % 2, chunk_bytes)]
+
+
+def run_gate(sources, options, threshold):
+    frames_in = frames_out = frames_suppressed = 0
+    bytes_in = bytes_out = 0
+    cpu_ns = 0
+    audio_ms = 0.0
+    chunk_bytes = int(options.sample_rate * options.chunk_ms / 1000.0) * 2
+    for audio in sources:
+        gate = SilenceGate(sample_rate=options.sample_rate, threshold_dbfs=threshold,
+                           preroll_ms=options.preroll_ms, hangover_ms=options.hangover_ms,
+                           mode=options.mode)
+        for chunk in chunked(audio, chunk_bytes):
+            t0 = time.perf_counter_ns()
+            out = gate.process(chunk)
+            cpu_ns += time.perf_counter_ns() - t0
+            frames_in += 1
+            frames_out += len(out)
+            bytes_in += len(chunk)
+            bytes_out += sum(len(c) for c in out)
+            audio_ms += len(chunk) / 2 / options.sample_rate * 1000.0
+        frames_suppressed += gate.stats['frames_suppressed']
+    minutes = audio_ms / 60000.0
+    return {
+        'threshold_dbfs': threshold,
+        'frames_in': frames_in,
+        'frames_out': frames_out,
+        'frames_saved_pct': round(100.0 * frames_suppressed / max(frames_in, 1), 1),
+        'bytes_saved_pct': round(100.0 * (1 - bytes_out / max(bytes_in, 1)), 1),
+        'cpu_ms_per_audio_minute': round(cpu_ns / 1e6 / minutes, 3) if minutes else 0.0,
+        'us_per_chunk': round(cpu_ns / 1000 / max(frames_in, 1), 2)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rtrec', nargs='*', default=[])
+    parser.add_argument('--wav', nargs='*', default=[])
+    parser.add_argument('--dump', default='templates/logs_jason.json')
+    parser.add_argument('--sample-rate', type=int, default=24000)
+    parser.add_argument('--chunk-ms', type=float, default=40.0)
+    parser.add_argument('--thresholds', default='-60,-50,-40')
+    parser.add_argument('--preroll-ms', type=float, default=300.0)
+    parser.add_argument('--hangover-ms', type=float, default=700.0)
+    parser.add_argument('--mode', default='drop', choices=('drop', 'thin'))
+    options = parser.parse_args()
+
+    sources = [load_rtrec_audio(p) for p in options.rtrec] + [load_wav_audio(p) for p in options.wav]
+    if not sources:
+        sources = [load_dump_audio(options.dump)]
+    total_ms = sum(len(a) for a in sources) / 2 / options.sample_rate * 1000.0
+
+    results = {
+        'sources': len(sources),
+        'audio_seconds': round(total_ms / 1000.0, 2),
+        'chunk_ms': options.chunk_ms,
+        'mode': options.mode,
+        'thresholds': [run_gate(sources, options, float(t)) for t in options.thresholds.split(',') if t.strip()]
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
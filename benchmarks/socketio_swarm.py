@@ -0,0 +1,178 @@
+"""
+Swarm of Socket.IO clients that drive the Realtime proxy like browsers do.
+
+Each simulated user connects to ``app.py`` over Socket.IO, emits
+``realtime_connect``, and then loops voice turns until ``--duration`` expires:
+it streams ``input_audio_buffer.append`` chunks of ``--chunk-ms`` PCM16 at
+real-time pace through ``realtime_send`` (the fake Azure server ends the turn
+after its ``--turn-audio-ms``), waits for ``response.done`` and pauses
+``--pause-ms`` before the next turn.
+
+Forwarding latency is measured on every delta stamped with ``sent_ns`` by
+``benchmarks.fake_azure_realtime`` (fake upstream send -> Socket.IO client
+receive), so it covers the relay, coalescing, queues and Socket.IO.
+
+Usage (proxy pointed at the fake server, see fake_azure_realtime):
+    python -m benchmarks.socketio_swarm --url http://127.0.0.1:5000 --clients 50 --duration 60
+"""
+
+import argparse
+import base64
+import json
+import os
+import threading
+import time
+import uuid
+
+from benchmarks.common import summarize
+
+BYTES_PER_MS = 48  # PCM16 mono 24 kHz
+
+
+class SwarmClient:
+    """One simulated browser session"""
+
+    def __init__(self, index, options, stop_at):
+        self.options = options
+        self.stop_at = stop_at
+        self.client_id = f"swarm-{index}-{uuid.uuid4().hex[:8]}"
+        self.connected = threading.Event()
+        self.turn_done = threading.Event()
+        self.closed = False
+        self.connect_ms = None
+        self.latencies = []
+        self.first_audio_ms = []
+        self.turns = 0
+        self.events = 0
+        self.errors = []
+        self._turn_started = None
+        self._first_audio_seen = False
+        chunk_bytes = int(options.chunk_ms * BYTES_PER_MS)
+        self.chunk = base64.b64encode(os.urandom(chunk_bytes)).decode('ascii')
+
+    def on_realtime_message(self, data):
+        received = time.monotonic_ns()
+        self.events += 1
+        payload = data.get('data') if isinstance(data, dict) else data
+        msg = json.loads(payload) if isinstance(payload, (str, bytes)) else (payload or {})
+        sent_ns = msg.get('sent_ns')
+        if sent_ns:
+            self.latencies.append((received - sent_ns) / 1e6)
+        msg_type = msg.get('type')
+        if msg_type == 'response.audio.delta' and not self._first_audio_seen and self._turn_started:
+            self._first_audio_seen = True
+            self.first_audio_ms.append((time.monotonic() - self._turn_started) * 1000)
+        elif msg_type == 'response.done':
+            self.turn_done.set()
+
+    def run(self):
+        import socketio
+
+        opts = self.options
+        sio = socketio.Client(reconnection=False)
+        sio.on('realtime_message', self.on_realtime_message)
+        sio.on('realtime_connected', lambda data: self.connected.set())
+        sio.on('realtime_error', lambda data: self.errors.append(str(data.get('error') if isinstance(data, dict) else data)))
+
+        def on_closed(data):
+            self.closed = True
+            self.turn_done.set()
+        sio.on('realtime_closed', on_closed)
+
+        try:
+            sio.connect(f"{opts.url}?client_id={self.client_id}", transports=['websocket'])
+            started = time.monotonic()
+            sio.emit('realtime_connect', {'client_id': self.client_id})
+            if not self.connected.wait(opts.connect_timeout):
+                self.errors.append('realtime_connect timeout')
+                return
+            self.connect_ms = (time.monotonic() - started) * 1000
+
+            chunk_s = opts.chunk_ms / 1000.0
+            chunks_per_turn = max(1, int(opts.turn_audio_ms / opts.chunk_ms))
+            while time.time() < self.stop_at and not self.closed:
+                self.turn_done.clear()
+                self._first_audio_seen = False
+                turn_start = time.monotonic()
+                for i in range(chunks_per_turn):
+                    sio.emit('realtime_send', {
+                        'client_id': self.client_id,
+                        'message': {'type': 'input_audio_buffer.append', 'audio': self.chunk}
+                    })
+                    delay = turn_start + (i + 1) * chunk_s - time.monotonic()
+                    if delay > 0:
+                        time.sleep(delay)
+                # Fin del audio del usuario: desde acá se mide el tiempo a primer audio
+                self._turn_started = time.monotonic()
+                if not self.turn_done.wait(opts.turn_timeout):
+                    self.errors.append('turn timeout')
+                    break
+                self.turns += 1
+                time.sleep(opts.pause_ms / 1000.0)
+            sio.emit('realtime_disconnect', {'client_id': self.client_id})
+        except Exception as e:
+            self.errors.append(str(e))
+        finally:
+            try:
+                sio.disconnect()
+            except Exception:
+                pass
+
+    @property
+    def sustained(self):
+        """Stayed connected for the whole run and completed at least one turn"""
+        return self.connect_ms is not None and not self.closed and self.turns > 0 and not self.errors
+
+
+def run_swarm(options, clients):
+    """Run `clients` simulated users for options.duration seconds"""
+    stop_at = time.time() + options.duration
+    swarm = [SwarmClient(i, options, stop_at) for i in range(clients)]
+    threads = []
+    for client in swarm:
+        t = threading.Thread(target=client.run, name=client.client_id, daemon=True)
+        t.start()
+        threads.append(t)
+        # Rampa de conexiones para no medir solo la tormenta de handshakes
+        time.sleep(options.ramp_s / max(clients, 1))
+    for t in threads:
+        t.join(options.duration + options.turn_timeout + options.connect_timeout + 30)
+
+    latencies = [v for c in swarm for v in c.latencies]
+    errors = [e for c in swarm for e in c.errors]
+    return {
+        'clients': clients,
+        'connected': sum(1 for c in swarm if c.connect_ms is not None),
+        'sustained_sessions': sum(1 for c in swarm if c.sustained),
+        'turns': sum(c.turns for c in swarm),
+        'events': sum(c.events for c in swarm),
+        'errors': len(errors),
+        'error_samples': sorted(set(errors))[:5],
+        'connect_ms': summarize([c.connect_ms for c in swarm if c.connect_ms is not None]),
+        'forward_latency_ms': summarize(latencies),
+        'first_audio_ms': summarize([v for c in swarm for v in c.first_audio_ms])
+    }
+
+
+def add_arguments(parser):
+    parser.add_argument('--url', default='http://127.0.0.1:5000')
+    parser.add_argument('--duration', type=float, default=60.0)
+    parser.add_argument('--ramp-s', type=float, default=10.0, help='spread client connects over this many seconds')
+    parser.add_argument('--chunk-ms', type=float, default=40.0, help='mic audio per realtime_send')
+    parser.add_argument('--turn-audio-ms', type=float, default=2000.0)
+    parser.add_argument('--pause-ms', type=float, default=1000.0, help='pause between turns')
+    parser.add_argument('--connect-timeout', type=float, default=30.0)
+    parser.add_argument('--turn-timeout', type=float, default=60.0)
+    return parser
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_arguments(parser)
+    parser.add_argument('--clients', type=int, default=20)
+    options = parser.parse_args()
+    print(json.dumps(run_swarm(options, options.clients), indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,227 @@
+"""
+Bounded pool of native worker threads for blocking calls (in-process minipywo).
+
+``wl_pywo.invoke`` is a synchronous, multi-second agentic call. Run inside a
+Socket.IO handler under eventlet/gevent, it blocks the green hub, and with it
+every other user's audio relay on the worker. ``FairBlockingPool`` runs such
+calls on ``workers`` native threads (started through ``BackgroundLoop``, so
+monkey-patching does not turn them green). Callers await ``call()`` on the
+background loop, usually through ``BackgroundLoop.run``, which blocks only
+the calling greenlet.
+
+- bounded: at most ``max_queue`` calls wait in total and ``max_per_client``
+  per client (queued + running); past that ``call()`` raises ``PoolBusy``
+  instead of queueing without limit
+- fair: every client has its own FIFO and idle workers take from the clients
+  in round-robin order, so one client sending many heavy queries cannot starve
+  the rest
+- cancellation: ``cancel_client()`` (disconnect) drops that client's queued
+  calls. A call already running cannot be interrupted in a thread; its
+  result is discarded when it finishes. Cancelling the awaiting task (e.g.
+  a ``BackgroundLoop.run`` timeout) does the same for that one call
+
+Totals for ``/metrics``: queue depth (current and peak), busy workers, calls
+submitted / completed / failed / rejected / cancelled / discarded, and the
+queue-wait and execution-time histograms.
+"""
+
+import asyncio
+import time
+from collections import OrderedDict, deque
+from typing import Any, Callable, Deque, Dict, List, Set
+
+from perf_metrics import HistogramSet
+
+
+class PoolBusy(RuntimeError):
+    """The pool (or the client's share of it) is full"""
+
+
+class _Job:
+    __slots__ = ('client', 'fn', 'args', 'future', 'loop', 'enqueued', 'cancelled')
+
+    def __init__(self, client: str, fn: Callable, args: tuple, future: asyncio.Future):
+        self.client = client
+        self.fn = fn
+        self.args = args
+        self.future = future
+        self.loop = future.get_loop()
+        self.enqueued = time.perf_counter()
+        self.cancelled = False
+
+
+class FairBlockingPool:
+    """Per-client round-robin queue in front of a fixed set of native threads"""
+
+    def __init__(self, runner, workers: int = 4, max_queue: int = 64, max_per_client: int = 4,
+                 name: str = 'blocking-pool'):
+        self.runner = runner
+        self.workers = workers
+        self.max_queue = max_queue
+        self.max_per_client = max_per_client
+        self.name = name
+        self._lock = runner.native_lock()
+        # cliente -> cola FIFO; el orden del OrderedDict es el turno del round-robin
+        self._queues: 'OrderedDict[str, Deque[_Job]]' = OrderedDict()
+        self._queued = 0
+        self._per_client: Dict[str, int] = {}
+        self._running: Set[_Job] = set()
+        self._idle: List[Any] = []
+        self._started = False
+        self._closed = False
+        self.latency = HistogramSet()
+        self.stats = {
+            'submitted': 0,
+            'completed': 0,
+            'errors': 0,
+            'rejected_full': 0,
+            'rejected_client': 0,
+            'cancelled_queued': 0,
+            'discarded_running': 0,
+            'max_queue_depth': 0
+        }
+
+    def _start(self):
+        # Con el lock tomado
+        if self._started:
+            return
+        self._started = True
+        for i in range(self.workers):
+            self.runner.start_native_thread(self._work, i)
+
+    async def call(self, client: str, fn: Callable, *args) -> Any:
+        """Run ``fn(*args)`` on a worker thread; await from the background loop"""
+        job = _Job(client, fn, args, asyncio.get_running_loop().create_future())
+        with self._lock:
+            if self._closed:
+                raise RuntimeError(f"{self.name} is closed")
+            if self._queued >= self.max_queue:
+                self.stats['rejected_full'] += 1
+                raise PoolBusy(f"{self.name}: queue full ({self._queued} waiting)")
+            if self._per_client.get(client, 0) >= self.max_per_client:
+                self.stats['rejected_client'] += 1
+                raise PoolBusy(f"{self.name}: client has {self.max_per_client} calls pending")
+            self._start()
+            self._queues.setdefault(client, deque()).append(job)
+            self._queued += 1
+            self._per_client[client] = self._per_client.get(client, 0) + 1
+            self.stats['submitted'] += 1
+            self.stats['max_queue_depth'] = max(self.stats['max_queue_depth'], self._queued)
+            if self._idle:
+                self._idle.pop().release()
+        try:
+            return await job.future
+        except asyncio.CancelledError:
+            self._cancel_job(job)
+            raise
+
+    def cancel_client(self, client: str) -> int:
+        """Drop a client's queued calls and discard its running ones (disconnect); thread-safe"""
+        with self._lock:
+            queued = list(self._queues.pop(client, ()))
+            self._queued -= len(queued)
+            for job in queued:
+                job.cancelled = True
+                self._release_client(client)
+            self.stats['cancelled_queued'] += len(queued)
+            running = [job for job in self._running if job.client == client]
+            for job in running:
+                job.cancelled = True
+        # Quien espera (el handler) recibe CancelledError; el thread termina y descarta el resultado
+        for job in queued + running:
+            job.loop.call_soon_threadsafe(job.future.cancel)
+        return len(queued)
+
+    def _cancel_job(self, job: _Job):
+        with self._lock:
+            job.cancelled = True
+            queue = self._queues.get(job.client)
+            if queue is not None and job in queue:
+                queue.remove(job)
+                if not queue:
+                    del self._queues[job.client]
+                self._queued -= 1
+                self._release_client(job.client)
+                self.stats['cancelled_queued'] += 1
+
+    def _release_client(self, client: str):
+        left = self._per_client.get(client, 0) - 1
+        if left > 0:
+            self._per_client[client] = left
+        else:
+            self._per_client.pop(client, None)
+
+    def _next_job(self):
+        # Con el lock tomado: un trabajo del primer cliente en turno, que pasa al final
+        if not self._queues:
+            return None
+        client, queue = next(iter(self._queues.items()))
+        job = queue.popleft()
+        if queue:
+            self._queues.move_to_end(client)
+        else:
+            del self._queues[client]
+        self._queued -= 1
+        return job
+
+    def _work(self, index: int):
+        # Lock nativo tomado = worker estacionado; call() lo libera para despertarlo
+        park = self.runner.native_lock()
+        park.acquire()
+        while True:
+            with self._lock:
+                job = self._next_job()
+                if job is None:
+                    if self._closed:
+                        return
+                    self._idle.append(park)
+                else:
+                    self._running.add(job)
+            if job is None:
+                park.acquire()
+                continue
+            started = time.perf_counter()
+            result, error = None, None
+            try:
+                result = job.fn(*job.args)
+            except Exception as e:
+                error = e
+            timings = ((started - job.enqueued) * 1000, (time.perf_counter() - started) * 1000)
+            with self._lock:
+                self._running.discard(job)
+                self._release_client(job.client)
+                self.stats['errors' if error is not None else 'completed'] += 1
+                if job.cancelled:
+                    self.stats['discarded_running'] += 1
+            try:
+                job.loop.call_soon_threadsafe(self._resolve, job, result, error, timings)
+            except RuntimeError:
+                # Loop de fondo ya cerrado (shutdown del worker)
+                pass
+
+    def _resolve(self, job: _Job, result: Any, error: BaseException, timings):
+        # En el loop de fondo: los histogramas no se tocan desde los threads nativos
+        self.latency.observe('queue_wait', timings[0])
+        self.latency.observe('execution', timings[1])
+        if job.cancelled or job.future.done():
+            return
+        if error is not None:
+            job.future.set_exception(error)
+        else:
+            job.future.set_result(result)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self.stats, queued=self._queued, busy=len(self._running),
+                         clients_waiting=len(self._queues))
+        stats.update(workers=self.workers, max_queue=self.max_queue, max_per_client=self.max_per_client,
+                     latency_ms=self.latency.snapshot())
+        return stats
+
+    def close(self):
+        """Stop the workers once the queue drains"""
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for park in idle:
+            park.release()
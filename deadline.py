@@ -0,0 +1,114 @@
+"""
+Deadline budgets for backend calls.
+
+A voice user stops waiting long before ``REQUEST_TIMEOUT``, and retries can
+push a call well past it. Each route therefore gets a ``Deadline``: a budget
+counted from when the work started (the end of the user's speech for Realtime
+tool calls, the request arrival for HTTP routes). It is threaded through
+the call:
+
+- every backend attempt uses the remaining budget as its timeout, so the
+  timeout shrinks across retries
+- the remaining budget goes to the backend in ``DEADLINE_HEADER`` (ms, relative
+  to avoid clock skew), so the backend can give up on its own
+- no attempt or retry starts when the budget left is below the minimum useful
+  time. The call fails with ``DeadlineExceeded`` instead of using backend
+  capacity for an answer nobody will hear
+- streamed answers (``within``) are cut and the upstream request cancelled
+  once the budget runs out
+
+Inbound HTTP requests may carry the same header. The smaller of it and the
+route budget wins.
+
+Worker totals (``deadline_totals`` in ``/metrics``), per route: calls,
+attempts, early cancellations (before an attempt or retry), timeouts during an
+attempt, streams cut, and the budget left when calls finish.
+"""
+
+import threading
+import time
+from typing import Any, Dict, Iterator, Optional
+
+from perf_metrics import HistogramSet
+
+DEADLINE_HEADER = 'X-Request-Deadline-Ms'
+
+_totals_lock = threading.Lock()
+_totals: Dict[str, Dict[str, int]] = {}
+_remaining = HistogramSet()
+
+
+class DeadlineExceeded(TimeoutError):
+    """The call's budget ran out (or too little of it is left to try)"""
+
+
+class Deadline:
+    """Budget of one call, on the monotonic clock"""
+
+    __slots__ = ('route', 'budget_s', 'started', 'expires_at')
+
+    def __init__(self, route: str, budget_s: float, started: Optional[float] = None):
+        self.route = route
+        self.budget_s = budget_s
+        self.started = time.monotonic() if started is None else started
+        self.expires_at = self.started + budget_s
+        count_deadline(route, calls=1)
+
+    @classmethod
+    def for_request(cls, route: str, budget_s: float, header_value: Optional[str] = None) -> 'Deadline':
+        """Route budget, shortened by the caller's own deadline header if it sent one"""
+        try:
+            if header_value:
+                budget_s = min(budget_s, max(0.0, float(header_value) / 1000.0))
+        except ValueError:
+            pass
+        return cls(route, budget_s)
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires_at
+
+    def header(self) -> Dict[str, str]:
+        return {DEADLINE_HEADER: str(int(self.remaining() * 1000))}
+
+    def check(self, min_s: float = 0.0, stage: str = 'attempt'):
+        """Raise DeadlineExceeded (counted as an early cancel) if less than ``min_s`` is left"""
+        left = self.remaining()
+        if left <= min_s:
+            count_deadline(self.route, cancelled_early=1)
+            raise DeadlineExceeded(f"{self.route}: {left * 1000:.0f}ms left of {self.budget_s:.1f}s budget, "
+                                   f"not starting {stage}")
+
+    def finish(self):
+        """Record the budget left when the call completed"""
+        _remaining.observe(self.route, self.remaining() * 1000)
+
+
+def within(chunks: Iterator[Any], deadline: Deadline) -> Iterator[Any]:
+    """Items of ``chunks`` until the deadline passes; closing it cancels the upstream request"""
+    try:
+        for chunk in chunks:
+            if deadline.expired():
+                count_deadline(deadline.route, streams_cut=1)
+                raise DeadlineExceeded(f"{deadline.route}: {deadline.budget_s:.1f}s budget exhausted mid-stream")
+            yield chunk
+    finally:
+        close = getattr(chunks, 'close', None)
+        if close is not None:
+            close()
+
+
+def count_deadline(route: str, **deltas):
+    with _totals_lock:
+        totals = _totals.setdefault(route, {'calls': 0, 'attempts': 0, 'cancelled_early': 0,
+                                            'timed_out': 0, 'streams_cut': 0})
+        for key, n in deltas.items():
+            totals[key] += n
+
+
+def deadline_totals() -> Dict[str, Any]:
+    with _totals_lock:
+        totals = {route: dict(counts) for route, counts in _totals.items()}
+    return {'routes': totals, 'remaining_ms': _remaining.snapshot()}
@@ -21,6 +21,7 @@ class HealthChecker:
         self.last_check_time = None
         self.cached_status = None
         self.cache_duration = 30  # Cache health status for 30 seconds
+        self.backend_client = None  # Shared BackendClientPool, set by the app
         
     def get_system_health(self) -> Dict[str, Any]:
         """Get system resource utilization"""
@@ -90,14 +91,17 @@ class HealthChecker:
         base_url = fastapi_url.replace('/ask', '')
         
         try:
-            async with httpx.AsyncClient(timeout=5) as client:
-                response = await client.get(f"{base_url}/health")
-                
-                return {
-                    'status': 'healthy' if response.status_code == 200 else 'unhealthy',
-                    'response_time_ms': round(response.elapsed.total_seconds() * 1000, 2),
-                    'status_code': response.status_code
-                }
+            if self.backend_client is not None:
+                response = await self.backend_client.request('GET', f"{base_url}/health", timeout=5)
+            else:
+                async with httpx.AsyncClient(timeout=5) as client:
+                    response = await client.get(f"{base_url}/health")
+            
+            return {
+                'status': 'healthy' if response.status_code == 200 else 'unhealthy',
+                'response_time_ms': round(response.elapsed.total_seconds() * 1000, 2),
+                'status_code': response.status_code
+            }
         except Exception as e:
             return {
                 'status': 'error',
@@ -0,0 +1,126 @@
+"""
+Lightweight in-process metric primitives shared by the relay and backend proxy.
+
+All primitives are thread-safe and cheap enough for the per-event hot path;
+``snapshot()`` returns plain dicts ready for ``jsonify`` in ``/metrics``.
+"""
+
+import threading
+import time
+from typing import Any, Dict
+
+
+class RateCounter:
+    """Running total plus a per-second rate over a sliding window of 1 s buckets"""
+
+    def __init__(self, window_s: int = 60):
+        self.window_s = window_s
+        self._lock = threading.Lock()
+        self._buckets = [0] * window_s
+        self._bucket_ts = [0] * window_s
+        self.total = 0
+        self.started = time.monotonic()
+
+    def add(self, n: int = 1):
+        now = int(time.monotonic())
+        idx = now % self.window_s
+        with self._lock:
+            if self._bucket_ts[idx] != now:
+                self._bucket_ts[idx] = now
+                self._buckets[idx] = 0
+            self._buckets[idx] += n
+            self.total += n
+
+    def rate(self) -> float:
+        now = int(time.monotonic())
+        with self._lock:
+            recent = sum(v for v, ts in zip(self._buckets, self._bucket_ts) if now - ts < self.window_s)
+        span = min(self.window_s, max(time.monotonic() - self.started, 1.0))
+        return recent / span
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {'total': self.total, 'per_second': round(self.rate(), 2)}
+
+
+# Default latency buckets in milliseconds (upper bounds)
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 200, 300, 500, 750, 1000, 1500, 2000,
+                      3000, 5000, 7500, 10000, 15000, 30000, 60000)
+
+
+class Histogram:
+    """Fixed-bucket histogram with count/sum/min/max and bucket-based percentiles"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS_MS):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._counts = [0] * (len(self.buckets) + 1)  # last bucket is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, value: float):
+        idx = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                idx = i
+                break
+        with self._lock:
+            self._counts[idx] += 1
+            self.count += 1
+            self.sum += value
+            self.min = value if self.min is None else min(self.min, value)
+            self.max = value if self.max is None else max(self.max, value)
+
+    def percentile(self, pct: float) -> float:
+        """Upper bound of the bucket holding the pct-th observation"""
+        with self._lock:
+            if not self.count:
+                return 0.0
+            rank = pct / 100.0 * self.count
+            seen = 0
+            for i, n in enumerate(self._counts):
+                seen += n
+                if seen >= rank and n:
+                    return float(self.buckets[i]) if i < len(self.buckets) else float(self.max)
+            return float(self.max)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            counts = list(self._counts)
+            count, total = self.count, self.sum
+            lo, hi = self.min, self.max
+        buckets = {f"le_{b}": c for b, c in zip(self.buckets, counts)}
+        buckets['le_inf'] = counts[-1]
+        return {
+            'count': count,
+            'mean': round(total / count, 2) if count else 0.0,
+            'min': round(lo, 2) if lo is not None else None,
+            'max': round(hi, 2) if hi is not None else None,
+            'p50': self.percentile(50),
+            'p95': self.percentile(95),
+            'p99': self.percentile(99),
+            'buckets': buckets
+        }
+
+
+class HistogramSet:
+    """Named histograms created on first use (e.g. one per pipeline stage)"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS_MS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._histograms: Dict[str, Histogram] = {}
+
+    def get(self, name: str) -> Histogram:
+        hist = self._histograms.get(name)
+        if hist is None:
+            with self._lock:
+                hist = self._histograms.setdefault(name, Histogram(self.buckets))
+        return hist
+
+    def observe(self, name: str, value: float):
+        self.get(name).observe(value)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {name: hist.snapshot() for name, hist in sorted(self._histograms.items())}
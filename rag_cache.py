@@ -0,0 +1,328 @@
+"""
+TTL + LRU answer cache for neuro_rag (RAG_CACHE_ENABLED).
+
+Field users ask the same questions about wells and equipment over and over;
+each one costs a multi-second agentic RAG call. ``RagAnswerCache`` keeps the
+backend's successful answers keyed on the question as the backend would see
+it: after ``normalize_function_call_payload`` and the text corrections
+(``config/text_corrections.json``), then case-folded with punctuation removed
+and whitespace collapsed, so "¿Cuál es la presión del pozo?" and
+"cuál es la  presión del POZO" share one entry. Accents are kept.
+
+Memory tier: an ``OrderedDict`` in LRU order, bounded by entry count and by
+bytes (key + body per entry); entries expire after ``ttl_s``. Optional disk
+tier (``disk_path``): a SQLite file shared by the workers of the host, read on
+a memory miss (hits are promoted to memory) and written on every store, so hot
+answers survive worker restarts. Disk entries past their TTL are ignored and
+pruned, and the table is trimmed to ``disk_max_entries`` oldest-first.
+
+SQLite calls block (busy timeout, pruning DELETEs), so they never run on the
+caller: one disk thread (``start_thread``, a native thread in the app) owns
+the connection. ``put`` queues the write and returns; coroutines read with
+``aget``, which answers memory hits inline and awaits the disk lookup. The
+synchronous ``get`` reads the disk on the calling thread and is only meant for
+plain threads.
+"""
+
+import logging
+import os
+import re
+import sqlite3
+import asyncio
+import threading
+import time
+import unicodedata
+from collections import OrderedDict, deque, namedtuple
+from typing import Any, Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+CachedAnswer = namedtuple('CachedAnswer', ['body', 'status', 'content_type', 'stored_at', 'source'])
+
+_WORD_RE = re.compile(r'\w+', re.UNICODE)
+_SPACE_RE = re.compile(r'\s+')
+
+
+def _start_daemon_thread(target, *args):
+    threading.Thread(target=target, args=args, name='rag-cache-disk', daemon=True).start()
+
+
+def apply_corrections(text: str, corrections: Dict[str, str]) -> str:
+    """Whole-word replacements from the text corrections list"""
+    if not corrections:
+        return text
+    return _WORD_RE.sub(lambda m: corrections.get(m.group(0), m.group(0)), text)
+
+
+def fold_question(text: str) -> str:
+    """Case-fold, drop punctuation/symbols and collapse whitespace"""
+    text = ''.join(' ' if unicodedata.category(c)[0] in 'PS' else c for c in text.casefold())
+    return _SPACE_RE.sub(' ', text).strip()
+
+
+def correction_map(original: Iterable[str], replacement: Iterable[str]) -> Dict[str, str]:
+    """Text corrections lists -> case-folded lookup used by question_key"""
+    return {o.casefold(): r for o, r in zip(original, replacement)}
+
+
+def question_key(question: str, corrections: Dict[str, str]) -> str:
+    """Question as the cache (and request coalescing) compare it"""
+    return fold_question(apply_corrections((question or '').casefold(), corrections))
+
+
+class RagAnswerCache:
+    """Per-worker LRU of backend answers with TTL, byte accounting and an optional SQLite tier"""
+
+    def __init__(self, ttl_s: float = 3600.0, max_entries: int = 1000, max_bytes: int = 64 * 1024 * 1024,
+                 corrections: Optional[Dict[str, str]] = None, disk_path: str = '',
+                 disk_max_entries: int = 10000, disk_max_pending: int = 1000,
+                 lock_factory=threading.Lock, start_thread=_start_daemon_thread):
+        self.ttl_s = ttl_s
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        # Las correcciones se aplican sobre el texto ya en minúsculas (clave de cache)
+        self.corrections = {k.casefold(): v for k, v in (corrections or {}).items()}
+        self._entries: 'OrderedDict[str, CachedAnswer]' = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self._bytes = 0
+        self._lock = lock_factory()
+        self.disk_path = disk_path
+        self.disk_max_entries = disk_max_entries
+        self._disk = None
+        self._disk_lock = lock_factory()
+        # Cola del thread de disco; _wake tomado = thread estacionado esperando trabajo
+        self.disk_max_pending = disk_max_pending
+        self._start_thread = start_thread
+        self._jobs = deque()
+        self._jobs_lock = lock_factory()
+        self._wake = lock_factory()
+        self._wake.acquire()
+        self._worker_started = False
+        self._worker_waiting = False
+        self._closed = False
+        self.stats = {
+            'hits': 0,
+            'misses': 0,
+            'expired': 0,
+            'bypassed': 0,
+            'stores': 0,
+            'evictions': 0,
+            'too_large': 0,
+            'disk_hits': 0,
+            'disk_writes': 0,
+            'disk_errors': 0,
+            'disk_dropped': 0
+        }
+        if disk_path:
+            self._open_disk()
+
+    @classmethod
+    def from_lists(cls, original: Iterable[str], replacement: Iterable[str], **kwargs) -> 'RagAnswerCache':
+        return cls(corrections=dict(zip(original, replacement)), **kwargs)
+
+    def key_for(self, question: str) -> str:
+        return question_key(question, self.corrections)
+
+    # -- memory tier ---------------------------------------------------------------
+
+    def get(self, key: str) -> Optional[CachedAnswer]:
+        """Lookup from a plain thread (the disk read blocks the caller)"""
+        now = time.time()
+        entry = self._memory_get(key, now)
+        if entry is not None:
+            return entry
+        return self._disk_result(key, self._disk_get(key, now))
+
+    async def aget(self, key: str) -> Optional[CachedAnswer]:
+        """Lookup from a coroutine: memory inline, disk on the disk thread"""
+        now = time.time()
+        entry = self._memory_get(key, now)
+        if entry is not None:
+            return entry
+        if self._disk is None:
+            return self._disk_result(key, None)
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        if not self._submit(('get', key, now, future, loop)):
+            return self._disk_result(key, None)
+        return self._disk_result(key, await future)
+
+    def _memory_get(self, key: str, now: float) -> Optional[CachedAnswer]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if now - entry.stored_at < self.ttl_s:
+                    self._entries.move_to_end(key)
+                    self.stats['hits'] += 1
+                    return entry
+                self._remove(key)
+                self.stats['expired'] += 1
+        return None
+
+    def _disk_result(self, key: str, entry: Optional[CachedAnswer]) -> Optional[CachedAnswer]:
+        with self._lock:
+            if entry is not None:
+                self.stats['hits'] += 1
+                self.stats['disk_hits'] += 1
+                self._insert(key, entry._replace(source='memory'))
+            else:
+                self.stats['misses'] += 1
+        return entry
+
+    def put(self, key: str, body: str, status: int = 200, content_type: str = 'application/json'):
+        if not key:
+            return
+        entry = CachedAnswer(body, status, content_type, time.time(), 'memory')
+        with self._lock:
+            if not self._insert(key, entry):
+                return
+            self.stats['stores'] += 1
+        if self._disk is not None:
+            self._submit(('put', key, entry))
+
+    def count_bypass(self):
+        with self._lock:
+            self.stats['bypassed'] += 1
+
+    def _insert(self, key: str, entry: CachedAnswer) -> bool:
+        size = len(key.encode('utf-8')) + len(entry.body.encode('utf-8'))
+        if size > self.max_bytes:
+            self.stats['too_large'] += 1
+            return False
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = entry
+        self._sizes[key] = size
+        self._bytes += size
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.stats['evictions'] += 1
+        return True
+
+    def _remove(self, key: str):
+        self._entries.pop(key, None)
+        self._bytes -= self._sizes.pop(key, 0)
+
+    # -- disk tier -----------------------------------------------------------------
+
+    def _open_disk(self):
+        try:
+            os.makedirs(os.path.dirname(self.disk_path) or '.', exist_ok=True)
+            db = sqlite3.connect(self.disk_path, timeout=2.0, check_same_thread=False, isolation_level=None)
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('PRAGMA synchronous=NORMAL')
+            db.execute('CREATE TABLE IF NOT EXISTS answers (key TEXT PRIMARY KEY, stored_at REAL, '
+                       'status INTEGER, content_type TEXT, body TEXT)')
+            db.execute('CREATE INDEX IF NOT EXISTS answers_stored_at ON answers (stored_at)')
+            self._disk = db
+            logger.info(f"[RAG-CACHE] Disk tier at {self.disk_path}")
+        except sqlite3.Error as e:
+            logger.error(f"[RAG-CACHE] Disk tier disabled ({self.disk_path}): {e}")
+            self._disk = None
+
+    def _submit(self, job) -> bool:
+        """Queue a job for the disk thread; False if the queue is full or closed"""
+        with self._jobs_lock:
+            if self._closed or len(self._jobs) >= self.disk_max_pending:
+                self.stats['disk_dropped'] += 1
+                return False
+            self._jobs.append(job)
+            if not self._worker_started:
+                self._worker_started = True
+                self._start_thread(self._disk_worker)
+            elif self._worker_waiting:
+                self._worker_waiting = False
+                self._wake.release()
+        return True
+
+    def _disk_worker(self):
+        while True:
+            with self._jobs_lock:
+                job = self._jobs.popleft() if self._jobs else None
+                if job is None:
+                    if self._closed:
+                        break
+                    self._worker_waiting = True
+            if job is None:
+                self._wake.acquire()
+                continue
+            if job[0] == 'put':
+                self._disk_put(job[1], job[2])
+                continue
+            _, key, now, future, loop = job
+            entry = self._disk_get(key, now)
+            try:
+                loop.call_soon_threadsafe(self._resolve, future, entry)
+            except RuntimeError:
+                # Loop ya cerrado (shutdown del worker)
+                pass
+        self._close_disk()
+
+    @staticmethod
+    def _resolve(future: asyncio.Future, entry: Optional[CachedAnswer]):
+        if not future.done():
+            future.set_result(entry)
+
+    def _disk_get(self, key: str, now: float) -> Optional[CachedAnswer]:
+        if self._disk is None:
+            return None
+        try:
+            with self._disk_lock:
+                row = self._disk.execute('SELECT stored_at, status, content_type, body FROM answers WHERE key = ?',
+                                         (key,)).fetchone()
+        except sqlite3.Error as e:
+            self.stats['disk_errors'] += 1
+            logger.warning(f"[RAG-CACHE] Disk read failed: {e}")
+            return None
+        if row is None or now - row[0] >= self.ttl_s:
+            return None
+        return CachedAnswer(row[3], row[1], row[2], row[0], 'disk')
+
+    def _disk_put(self, key: str, entry: CachedAnswer):
+        if self._disk is None:
+            return
+        try:
+            with self._disk_lock:
+                self._disk.execute('INSERT OR REPLACE INTO answers VALUES (?, ?, ?, ?, ?)',
+                                   (key, entry.stored_at, entry.status, entry.content_type, entry.body))
+                self.stats['disk_writes'] += 1
+                # Poda ocasional: vencidos y exceso (más viejos primero)
+                if self.stats['disk_writes'] % 100 == 1:
+                    self._disk.execute('DELETE FROM answers WHERE stored_at < ?', (time.time() - self.ttl_s,))
+                    self._disk.execute('DELETE FROM answers WHERE key IN (SELECT key FROM answers '
+                                       'ORDER BY stored_at DESC LIMIT -1 OFFSET ?)', (self.disk_max_entries,))
+        except sqlite3.Error as e:
+            self.stats['disk_errors'] += 1
+            logger.warning(f"[RAG-CACHE] Disk write failed: {e}")
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self.stats)
+            stats['entries'] = len(self._entries)
+            stats['bytes'] = self._bytes
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_ratio'] = round(stats['hits'] / lookups, 3) if lookups else 0.0
+        stats['ttl_s'] = self.ttl_s
+        stats['max_entries'] = self.max_entries
+        stats['max_bytes'] = self.max_bytes
+        stats['disk'] = self.disk_path if self._disk is not None else None
+        stats['disk_pending'] = len(self._jobs)
+        return stats
+
+    def close(self):
+        """Stop the disk thread once its queue drains (it closes the database)"""
+        with self._jobs_lock:
+            self._closed = True
+            started = self._worker_started
+            if self._worker_waiting:
+                self._worker_waiting = False
+                self._wake.release()
+        if not started:
+            self._close_disk()
+
+    def _close_disk(self):
+        with self._disk_lock:
+            if self._disk is not None:
+                self._disk.close()
+                self._disk = None
@@ -0,0 +1,176 @@
+"""
+Speculative neuro_rag prefetch from the user's transcript (REALTIME_RAG_PREFETCH).
+
+The relay sees ``conversation.item.input_audio_transcription.completed``
+before (or while) the model decides to call ``neuro_rag``. ``RagPrefetcher``
+starts the backend call on the corrected transcript right away, as a task on
+the worker's background loop. When the function call arrives, ``match(query)``
+compares its query with the transcript (``query_similarity``, on the same
+folded form as the answer cache key) and ``result()`` waits for the reused call:
+
+- close enough: the in-flight or finished result is reused (a hit), so the
+  RAG latency overlaps the model's own thinking time
+- too different: the speculation is cancelled and the caller makes the
+  normal call (a miss)
+
+Unclaimed speculations are cancelled when the model answers without calling
+the tool (``response.done``), on the next transcript and on disconnect.
+``PrefetchLimiter`` caps speculative calls in flight per worker (extra ones are
+skipped, never queued) and keeps the totals for ``/metrics``: hit rate over
+server tool calls, cancellations, wasted calls (finished but unused) and the
+backend time hidden by hits.
+"""
+
+import asyncio
+import logging
+import re
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def query_similarity(query_key: str, transcript_key: str) -> float:
+    """Share of the query's words present in the transcript (folded keys)"""
+    query_words = {w for w in _TOKEN_RE.findall(query_key) if len(w) > 2}
+    if not query_words:
+        return 1.0 if query_key == transcript_key else 0.0
+    transcript_words = set(_TOKEN_RE.findall(transcript_key))
+    return len(query_words & transcript_words) / len(query_words)
+
+
+class PrefetchLimiter:
+    """Per-worker cap on speculative calls in flight plus their totals"""
+
+    def __init__(self, max_inflight: int, lock):
+        self.max_inflight = max_inflight
+        self._lock = lock
+        self.inflight = 0
+        self.stats = {
+            'started': 0,
+            'skipped_cap': 0,
+            'hits': 0,
+            'misses': 0,
+            'cancelled': 0,
+            'wasted': 0,
+            'errors': 0,
+            'hidden_ms': 0.0
+        }
+
+    def acquire(self) -> bool:
+        with self._lock:
+            if self.inflight >= self.max_inflight:
+                self.stats['skipped_cap'] += 1
+                return False
+            self.inflight += 1
+            self.stats['started'] += 1
+            return True
+
+    def release(self):
+        with self._lock:
+            self.inflight -= 1
+
+    def count(self, key: str, n=1):
+        with self._lock:
+            self.stats[key] += n
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self.stats, inflight=self.inflight, max_inflight=self.max_inflight)
+        calls = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / calls, 3) if calls else 0.0
+        stats['hidden_ms'] = round(stats['hidden_ms'], 1)
+        return stats
+
+
+class _Speculation:
+    __slots__ = ('question', 'key', 'task', 'started', 'finished')
+
+    def __init__(self, question: str, key: str):
+        self.question = question
+        self.key = key
+        self.task = None
+        self.started = time.monotonic()
+        self.finished = None
+
+
+class RagPrefetcher:
+    """At most one speculative neuro_rag call per connection"""
+
+    def __init__(self, runner, limiter: PrefetchLimiter,
+                 fetch: Callable[[str], Awaitable[Dict[str, Any]]],
+                 key_fn: Callable[[str], str], min_similarity: float = 0.6):
+        self.runner = runner
+        self.limiter = limiter
+        self.fetch = fetch
+        self.key_fn = key_fn
+        self.min_similarity = min_similarity
+        self._current: Optional[_Speculation] = None
+
+    def start(self, question: str) -> bool:
+        """Speculate on a finished user transcript (replaces any unclaimed speculation)"""
+        self.cancel()
+        key = self.key_fn(question)
+        if not key or not self.limiter.acquire():
+            return False
+        spec = _Speculation(question, key)
+        self._current = spec
+
+        def _done(future):
+            # También si se cancela antes de arrancar la coroutine
+            spec.finished = time.monotonic()
+            self.limiter.release()
+
+        spec.task = self.runner.submit(self.fetch(question))
+        spec.task.add_done_callback(_done)
+        return True
+
+    def match(self, query: str) -> Optional[_Speculation]:
+        """Detach the speculation if the tool query matches it (cheap; call on the function call event)"""
+        spec, self._current = self._current, None
+        if spec is None:
+            self.limiter.count('misses')
+            return None
+        similarity = query_similarity(self.key_fn(query), spec.key)
+        if similarity < self.min_similarity:
+            self.limiter.count('misses')
+            self._discard(spec)
+            logger.debug(f"[PREFETCH] Miss ({similarity:.2f}): {query!r} vs {spec.question!r}")
+            return None
+        return spec
+
+    def result(self, spec: _Speculation, query: str, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Result of a matched speculation (waits if still running); None means make the normal call"""
+        claimed_at = time.monotonic()
+        try:
+            result = self.runner.run(self._wait(spec.task), timeout=timeout)
+        except Exception as e:
+            self.limiter.count('errors')
+            logger.warning(f"[PREFETCH] Speculative call failed, falling back: {e}")
+            return None
+        if result.get('status') != 'success':
+            self.limiter.count('errors')
+            return None
+        self.limiter.count('hits')
+        # Tiempo de backend que el usuario no esperó
+        self.limiter.count('hidden_ms', (min(spec.finished or claimed_at, claimed_at) - spec.started) * 1000)
+        return dict(result, query=query, prefetched=True)
+
+    @staticmethod
+    async def _wait(future):
+        return await asyncio.wrap_future(future)
+
+    def cancel(self):
+        """Drop an unclaimed speculation (model answered without the tool, new turn, close)"""
+        spec, self._current = self._current, None
+        if spec is not None:
+            self._discard(spec)
+
+    def _discard(self, spec: _Speculation):
+        if spec.task.done():
+            self.limiter.count('wasted')
+        else:
+            self.limiter.count('cancelled')
+            spec.task.cancel()
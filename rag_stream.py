@@ -0,0 +1,112 @@
+"""
+Framing and metrics for /api/neuro_rag_stream.
+
+The backend streams its answer as raw bytes. ``StreamFramer`` re-frames each
+chunk for the browser as it arrives, one flushable unit per chunk:
+
+- ``sse``: ``event: chunk`` / ``data: {...}`` blocks (``text/event-stream``)
+- ``ndjson``: one JSON object per line (``application/x-ndjson``)
+- ``raw``: the backend bytes unchanged
+
+Framed events are ``{"type": "chunk", "seq": n, "data": text}``, then one
+``{"type": "done", ...}`` or ``{"type": "error", ...}``. Chunk bytes are
+decoded incrementally, so a UTF-8 character split across two backend chunks
+is never mangled.
+
+Worker totals: streams started / completed / failed / cancelled by client
+disconnect, chunks and bytes, time to first byte (request start -> first
+chunk written; upstream -> first backend chunk) and the gap between chunks.
+"""
+
+import codecs
+import json
+import threading
+from typing import Any, Dict, Optional
+
+from perf_metrics import HistogramSet
+
+STREAM_FORMATS = {
+    'sse': 'text/event-stream',
+    'ndjson': 'application/x-ndjson',
+    'raw': 'application/octet-stream'
+}
+
+_totals_lock = threading.Lock()
+_totals = {
+    'streams': 0,
+    'completed': 0,
+    'errors': 0,
+    'client_disconnects': 0,
+    'chunks': 0,
+    'bytes': 0
+}
+_latency = HistogramSet()
+
+
+def choose_format(requested: Optional[str], accept: str) -> str:
+    """?format= wins; otherwise SSE for EventSource-style clients and NDJSON for the rest"""
+    if requested in STREAM_FORMATS:
+        return requested
+    return 'sse' if 'text/event-stream' in (accept or '') else 'ndjson'
+
+
+class StreamFramer:
+    """Per-response framing of backend chunks"""
+
+    def __init__(self, fmt: str, request_id: str):
+        self.fmt = fmt
+        self.request_id = request_id
+        self.content_type = STREAM_FORMATS[fmt]
+        self.seq = 0
+        self._decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+
+    def _frame(self, event: Dict[str, Any]) -> bytes:
+        payload = json.dumps(event, ensure_ascii=False)
+        if self.fmt == 'sse':
+            return f"event: {event['type']}\ndata: {payload}\n\n".encode('utf-8')
+        return (payload + '\n').encode('utf-8')
+
+    def opening(self) -> bytes:
+        # Comentario SSE inicial: algunos proxies no abren el stream hasta el primer byte
+        return f": stream {self.request_id}\n\n".encode('utf-8') if self.fmt == 'sse' else b''
+
+    def chunk(self, data: bytes) -> bytes:
+        if self.fmt == 'raw':
+            return data
+        text = self._decoder.decode(data)
+        if not text:
+            return b''
+        self.seq += 1
+        return self._frame({'type': 'chunk', 'seq': self.seq, 'data': text})
+
+    def done(self, **info) -> bytes:
+        if self.fmt == 'raw':
+            return b''
+        tail = self._decoder.decode(b'', final=True)
+        frames = b''
+        if tail:
+            self.seq += 1
+            frames = self._frame({'type': 'chunk', 'seq': self.seq, 'data': tail})
+        return frames + self._frame(dict({'type': 'done', 'request_id': self.request_id, 'chunks': self.seq}, **info))
+
+    def error(self, message: str, **info) -> bytes:
+        if self.fmt == 'raw':
+            return b''
+        return self._frame(dict({'type': 'error', 'request_id': self.request_id, 'error': message}, **info))
+
+
+def count_stream(**deltas):
+    with _totals_lock:
+        for key, n in deltas.items():
+            _totals[key] += n
+
+
+def observe_stream(stage: str, ms: float):
+    _latency.observe(stage, ms)
+
+
+def stream_totals() -> Dict[str, Any]:
+    with _totals_lock:
+        totals = dict(_totals)
+    totals['latency_ms'] = _latency.snapshot()
+    return totals
@@ -0,0 +1,189 @@
+"""
+Audio helpers for the Realtime relay.
+
+Binary audio path (REALTIME_BINARY_AUDIO): instead of forwarding base64 PCM16
+inside the upstream JSON string, ``response.audio.delta`` payloads are decoded
+server-side and sent to the browser as raw ``bytes`` Socket.IO attachments next
+to a small metadata envelope. The browser can likewise send
+``input_audio_buffer.append`` with the PCM16 in an ``audio`` binary attachment;
+the relay base64-encodes it once for Azure.
+
+Inbound aggregation (REALTIME_INBOUND_AUDIO_FRAME_MS): ``InboundAudioAggregator``
+merges consecutive ``input_audio_buffer.append`` chunks from the browser into
+upstream frames of a fixed duration of PCM16, flushing before any other message
+so ordering with ``input_audio_buffer.commit`` / ``response.create`` is kept.
+The frame timer goes through the relay's shared scheduler (``call_later``) and
+is cancelled when the frame fills up first.
+"""
+
+import base64
+import json
+import logging
+import threading
+from typing import Any, Callable, Dict, Optional
+
+from perf_metrics import RateCounter
+
+logger = logging.getLogger(__name__)
+
+AUDIO_DELTA_TYPE = 'response.audio.delta'
+AUDIO_APPEND_TYPE = 'input_audio_buffer.append'
+
+_totals_lock = threading.Lock()
+_binary_totals = {
+    'downstream_events': 0,
+    'downstream_bytes': 0,
+    'downstream_base64_bytes_avoided': 0,
+    'upstream_events': 0,
+    'upstream_bytes': 0,
+    'upstream_base64_bytes_avoided': 0
+}
+
+
+def _base64_len(n: int) -> int:
+    return 4 * ((n + 2) // 3)
+
+
+def _count_binary(direction: str, size: int):
+    with _totals_lock:
+        _binary_totals[f'{direction}_events'] += 1
+        _binary_totals[f'{direction}_bytes'] += size
+        _binary_totals[f'{direction}_base64_bytes_avoided'] += _base64_len(size) - size
+
+
+def binary_audio_totals() -> Dict[str, Any]:
+    with _totals_lock:
+        return dict(_binary_totals)
+
+
+def decode_audio_delta(msg: dict) -> bytes:
+    """Raw PCM16 carried by a parsed response.audio.delta"""
+    return base64.b64decode(msg.get('delta') or '')
+
+
+def audio_envelope(meta: dict, audio: bytes) -> dict:
+    """Metadata envelope sent next to the binary attachment (no base64 delta)"""
+    _count_binary('downstream', len(audio))
+    return {k: v for k, v in meta.items() if k != 'delta'}
+
+
+def binary_attachment(audio, count: bool = True) -> bytes:
+    """Normalize a binary Socket.IO attachment from the browser to bytes (counted only if ``count``)"""
+    if isinstance(audio, memoryview):
+        audio = audio.tobytes()
+    if count:
+        _count_binary('upstream', len(audio))
+    return audio
+
+
+def attach_audio(message: dict, audio, count: bool = True) -> dict:
+    """Build the upstream input_audio_buffer.append from a binary attachment"""
+    audio = binary_attachment(audio, count)
+    message = dict(message)
+    message['type'] = AUDIO_APPEND_TYPE
+    message['audio'] = base64.b64encode(audio).decode('ascii')
+    return message
+
+
+def append_message(pcm: bytes) -> dict:
+    """input_audio_buffer.append carrying raw PCM16 (base64-encoded for Azure)"""
+    return {'type': AUDIO_APPEND_TYPE, 'audio': base64.b64encode(pcm).decode('ascii')}
+
+
+def append_audio(message: dict, audio=None, count: bool = True) -> bytes:
+    """Raw PCM16 of a client append: the binary attachment if any, else the base64 field"""
+    if audio is not None:
+        return binary_attachment(audio, count)
+    return base64.b64decode(message.get('audio') or '')
+
+
+# Size of {"type": "input_audio_buffer.append", "audio": ""} as produced by json.dumps
+APPEND_FRAME_OVERHEAD = len(json.dumps({'type': AUDIO_APPEND_TYPE, 'audio': ''}))
+
+# Upstream append frames/bytes before and after aggregation, per worker
+inbound_audio_metrics = {
+    'frames_in': RateCounter(),
+    'frames_out': RateCounter(),
+    'bytes_in': RateCounter(),
+    'bytes_out': RateCounter()
+}
+
+
+def inbound_audio_totals() -> Dict[str, Any]:
+    totals = {name: counter.snapshot() for name, counter in inbound_audio_metrics.items()}
+    totals['aggregation_ratio'] = round(
+        inbound_audio_metrics['frames_in'].total / max(inbound_audio_metrics['frames_out'].total, 1), 2
+    )
+    return totals
+
+
+class InboundAudioAggregator:
+    """Per-connection merger of browser mic chunks into fixed-duration upstream frames"""
+
+    def __init__(self, send: Callable[[Any], bool], frame_ms: float = 100.0,
+                 sample_rate: int = 24000,
+                 call_later: Optional[Callable[[float, Callable], Any]] = None):
+        self.send = send
+        self.frame_ms = frame_ms
+        self.frame_bytes = max(2, int(sample_rate * frame_ms / 1000.0) * 2)  # PCM16 mono
+        self.call_later = call_later
+        self._lock = threading.RLock()
+        self._buffer = bytearray()
+        self._generation = 0
+        self._timer = None
+
+    def push(self, message, audio: Optional[bytes] = None) -> bool:
+        """Queue one client message; audio is the binary attachment if any"""
+        with self._lock:
+            if not isinstance(message, dict) or message.get('type') != AUDIO_APPEND_TYPE:
+                # Cualquier otro mensaje vacía el audio pendiente antes de salir
+                self._flush()
+                return self.send(message)
+
+            if audio is None:
+                encoded = message.get('audio') or ''
+                inbound_audio_metrics['bytes_in'].add(len(encoded) + APPEND_FRAME_OVERHEAD)
+                audio = base64.b64decode(encoded)
+            else:
+                inbound_audio_metrics['bytes_in'].add(4 * ((len(audio) + 2) // 3) + APPEND_FRAME_OVERHEAD)
+            inbound_audio_metrics['frames_in'].add()
+
+            was_empty = not self._buffer
+            self._buffer.extend(audio)
+            if len(self._buffer) >= self.frame_bytes:
+                return self._flush()
+            if was_empty and self.call_later is not None:
+                generation = self._generation
+                self._timer = self.call_later(self.frame_ms / 1000.0, lambda: self._on_timer(generation))
+            return True
+
+    def flush(self) -> bool:
+        with self._lock:
+            return self._flush()
+
+    def _on_timer(self, generation: int):
+        with self._lock:
+            if generation == self._generation:
+                self._timer = None
+                self._flush()
+
+    def _flush(self) -> bool:
+        if not self._buffer:
+            return True
+        self._generation += 1
+        if self._timer is not None:
+            # Frame lleno antes de tiempo: el timer pendiente sale del heap del scheduler
+            self._timer.cancel()
+            self._timer = None
+        frame = json.dumps({
+            'type': AUDIO_APPEND_TYPE,
+            'audio': base64.b64encode(bytes(self._buffer)).decode('ascii')
+        })
+        self._buffer.clear()
+        inbound_audio_metrics['frames_out'].add()
+        inbound_audio_metrics['bytes_out'].add(len(frame))
+        try:
+            return self.send(frame)
+        except Exception as e:
+            logger.error(f"[INBOUND-AUDIO] Failed to send aggregated frame: {e}")
+            return False
@@ -0,0 +1,222 @@
+"""
+Delta coalescing for high-frequency Realtime events forwarded to the browser.
+
+``response.audio.delta`` and ``response.audio_transcript.delta`` arrive dozens
+of times per second per user. ``DeltaCoalescer`` merges consecutive deltas of
+the same stream (type + response_id + item_id + output/content index) into a
+single event of the same type, so the browser contract does not change:
+
+- audio deltas are base64-decoded, concatenated and re-encoded once (or handed
+  to ``emit_audio`` as raw bytes when the binary audio path is enabled)
+- text/transcript deltas are concatenated
+
+Window timers go through the relay's ``call_later`` (one scheduler per worker)
+and are cancelled when a batch leaves early. The counters also track
+engine.io packets: every emit is one packet, plus one per binary attachment,
+compared with what forwarding each event on its own would have sent.
+
+A batch is emitted when its window (``window_ms``) expires, when it reaches
+``max_bytes``, or as soon as any non-coalescible event arrives (``response.done``,
+``error``, ``input_audio_buffer.speech_started``, ...). Pending batches are
+always flushed before that event, so per-stream ordering is preserved; audio and
+transcript streams of the same item may be reordered by at most one window.
+"""
+
+import base64
+import json
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_COALESCE_TYPES = (
+    'response.audio.delta',
+    'response.audio_transcript.delta',
+    'response.text.delta',
+)
+
+AUDIO_DELTA_TYPES = ('response.audio.delta',)
+
+# Aggregated counters for every coalescer in this worker (exposed in /metrics)
+_totals_lock = threading.Lock()
+_totals = {
+    'events_in': 0,
+    'deltas_in': 0,
+    'delta_batches_out': 0,
+    'emits_out': 0,
+    'flush_window': 0,
+    'flush_bytes': 0,
+    'flush_event': 0,
+    'engineio_packets_in': 0,
+    'engineio_packets_out': 0
+}
+
+
+def _count(key: str, n: int = 1):
+    with _totals_lock:
+        _totals[key] += n
+
+
+def coalescing_totals() -> Dict[str, Any]:
+    """Worker-wide coalescing counters including the batching ratio"""
+    with _totals_lock:
+        totals = dict(_totals)
+    totals['batching_ratio'] = round(totals['deltas_in'] / max(totals['delta_batches_out'], 1), 2)
+    totals['emit_reduction'] = round(1 - totals['emits_out'] / max(totals['events_in'], 1), 3)
+    totals['packet_reduction'] = round(
+        1 - totals['engineio_packets_out'] / max(totals['engineio_packets_in'], 1), 3)
+    return totals
+
+
+class _Batch:
+    __slots__ = ('seq', 'first', 'raw', 'parts', 'size', 'count', 'started', 'timer')
+
+    def __init__(self, seq: int, first: dict, raw: str, part, size: int):
+        self.seq = seq
+        self.first = first
+        self.raw = raw
+        self.parts = [part]
+        self.size = size
+        self.count = 1
+        self.started = time.monotonic()
+        self.timer = None
+
+
+class DeltaCoalescer:
+    """Per-connection coalescing stage in front of the Socket.IO emission"""
+
+    def __init__(self, emit: Callable[[str], None],
+                 call_later: Optional[Callable[[float, Callable], Any]] = None,
+                 window_ms: float = 40.0, max_bytes: int = 16384,
+                 types=DEFAULT_COALESCE_TYPES,
+                 emit_audio: Optional[Callable[[dict, bytes], None]] = None):
+        self.emit = emit
+        # Binary audio path: merged audio goes out as raw bytes, never re-encoded
+        self.emit_audio = emit_audio
+        self.call_later = call_later
+        self.window = window_ms / 1000.0
+        self.max_bytes = max_bytes
+        self.types = frozenset(types)
+        self._lock = threading.RLock()
+        self._pending: Dict[tuple, _Batch] = {}
+        self._seq = 0
+        self.stats = {
+            'events_in': 0,
+            'deltas_in': 0,
+            'delta_batches_out': 0,
+            'emits_out': 0
+        }
+
+    @staticmethod
+    def _key(msg_type: str, msg: dict) -> tuple:
+        return (msg_type, msg.get('response_id'), msg.get('item_id'),
+                msg.get('output_index'), msg.get('content_index'))
+
+    def push(self, message: str, msg_type: str, msg: Optional[dict]):
+        """Feed one upstream event (raw JSON plus its parsed form if available)"""
+        with self._lock:
+            self.stats['events_in'] += 1
+            _count('events_in')
+
+            if msg_type not in self.types or msg is None or not isinstance(msg.get('delta'), str):
+                _count('engineio_packets_in')
+                self._flush_all('flush_event')
+                self._emit(message)
+                return
+
+            self.stats['deltas_in'] += 1
+            _count('deltas_in')
+            # Sin agrupar, cada delta de audio binario serían 2 paquetes (evento + adjunto)
+            binary = self.emit_audio is not None and msg_type in AUDIO_DELTA_TYPES
+            _count('engineio_packets_in', 2 if binary else 1)
+
+            if msg_type in AUDIO_DELTA_TYPES:
+                part = base64.b64decode(msg['delta'])
+            else:
+                part = msg['delta']
+            size = len(part)
+
+            key = self._key(msg_type, msg)
+            batch = self._pending.get(key)
+            if batch is None:
+                self._seq += 1
+                batch = _Batch(self._seq, msg, message, part, size)
+                self._pending[key] = batch
+                if self.call_later and self.window > 0:
+                    batch.timer = self.call_later(self.window, lambda k=key, s=batch.seq: self._on_timer(k, s))
+            else:
+                batch.parts.append(part)
+                batch.size += size
+                batch.count += 1
+
+            if batch.size >= self.max_bytes:
+                self._flush(key, 'flush_bytes')
+            elif self.call_later is None and time.monotonic() - batch.started >= self.window:
+                self._flush(key, 'flush_window')
+
+    def flush(self):
+        """Emit everything pending (e.g. before closing the connection)"""
+        with self._lock:
+            self._flush_all('flush_event')
+
+    def _on_timer(self, key: tuple, seq: int):
+        with self._lock:
+            batch = self._pending.get(key)
+            if batch is not None and batch.seq == seq:
+                self._flush(key, 'flush_window')
+
+    def _flush_all(self, reason: str):
+        for key in sorted(self._pending, key=lambda k: self._pending[k].seq):
+            self._flush(key, reason)
+
+    def _flush(self, key: tuple, reason: str):
+        batch = self._pending.pop(key, None)
+        if batch is None:
+            return
+        if batch.timer is not None and reason != 'flush_window':
+            batch.timer.cancel()
+        self.stats['delta_batches_out'] += 1
+        _count('delta_batches_out')
+        _count(reason)
+
+        if self.emit_audio is not None and key[0] in AUDIO_DELTA_TYPES:
+            meta = dict(batch.first)
+            if batch.count > 1:
+                meta['coalesced'] = batch.count
+            self.stats['emits_out'] += 1
+            _count('emits_out')
+            _count('engineio_packets_out', 2)
+            try:
+                self.emit_audio(meta, b''.join(batch.parts))
+            except Exception as e:
+                logger.error(f"[COALESCE] Audio emit failed: {e}")
+            return
+
+        if batch.count == 1:
+            self._emit(batch.raw)
+            return
+
+        merged = dict(batch.first)
+        if key[0] in AUDIO_DELTA_TYPES:
+            merged['delta'] = base64.b64encode(b''.join(batch.parts)).decode('ascii')
+        else:
+            merged['delta'] = ''.join(batch.parts)
+        merged['coalesced'] = batch.count
+        self._emit(json.dumps(merged))
+
+    def _emit(self, message: str):
+        self.stats['emits_out'] += 1
+        _count('emits_out')
+        _count('engineio_packets_out')
+        try:
+            self.emit(message)
+        except Exception as e:
+            logger.error(f"[COALESCE] Emit failed: {e}")
+
+    def snapshot(self) -> Dict[str, Any]:
+        stats = dict(self.stats)
+        stats['batching_ratio'] = round(stats['deltas_in'] / max(stats['delta_batches_out'], 1), 2)
+        stats['pending'] = len(self._pending)
+        return stats
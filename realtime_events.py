@@ -0,0 +1,96 @@
+"""
+Lazy, type-sniffing dispatch for upstream Realtime events.
+
+Most upstream frames (audio and transcript deltas) only need to be forwarded
+to the browser. ``UpstreamEvent`` reads the ``type`` field from a short prefix
+of the raw frame and parses the full JSON (with ``orjson`` when available) only
+when someone actually touches ``event.data``. ``EventDispatcher`` routes events
+to the server-side handlers registered for their type (session, errors,
+function calls, usage, ...), so only those event types pay for a full parse.
+"""
+
+import json
+import logging
+import re
+from typing import Callable, Dict, Iterable, List
+
+try:
+    import orjson
+
+    def loads(data):
+        return orjson.loads(data)
+except ImportError:
+    orjson = None
+    loads = json.loads
+
+logger = logging.getLogger(__name__)
+
+# Azure sends "type" as the first key; 200 chars covers it with room to spare
+SNIFF_PREFIX = 200
+_TYPE_RE = re.compile(r'^\s*\{\s*"type"\s*:\s*"([^"]+)"')
+
+
+def sniff_event_type(message) -> str:
+    """Read the top-level event type without parsing the whole frame"""
+    if isinstance(message, dict):
+        return message.get('type', 'unknown')
+    head = message[:SNIFF_PREFIX]
+    if isinstance(head, (bytes, bytearray)):
+        head = bytes(head).decode('utf-8', 'ignore')
+    match = _TYPE_RE.match(head)
+    if match:
+        return match.group(1)
+    # "type" is not the first key (unexpected ordering): fall back to a parse
+    try:
+        return loads(message).get('type', 'unknown')
+    except Exception:
+        return 'unknown'
+
+
+class UpstreamEvent:
+    """One upstream frame: raw text, sniffed type and lazily parsed payload"""
+
+    __slots__ = ('raw', 'type', '_data')
+
+    def __init__(self, raw, msg_type: str = None):
+        self.raw = raw
+        self.type = msg_type or sniff_event_type(raw)
+        self._data = raw if isinstance(raw, dict) else None
+
+    @property
+    def parsed(self) -> bool:
+        return self._data is not None
+
+    @property
+    def data(self) -> dict:
+        if self._data is None:
+            try:
+                self._data = loads(self.raw)
+            except Exception as e:
+                logger.error(f"[DISPATCH] Invalid upstream JSON ({self.type}): {e}")
+                self._data = {}
+        return self._data
+
+
+class EventDispatcher:
+    """Routes upstream events to server-side handlers by type"""
+
+    def __init__(self):
+        self._handlers: Dict[str, List[Callable[[UpstreamEvent], None]]] = {}
+
+    def on(self, types: Iterable[str], handler: Callable[[UpstreamEvent], None]):
+        if isinstance(types, str):
+            types = [types]
+        for t in types:
+            self._handlers.setdefault(t, []).append(handler)
+        return handler
+
+    def handles(self, msg_type: str) -> bool:
+        return msg_type in self._handlers
+
+    def dispatch(self, event: UpstreamEvent):
+        for handler in self._handlers.get(event.type, ()):
+            try:
+                handler(event)
+            except Exception as e:
+                logger.error(f"[DISPATCH] Handler {getattr(handler, '__name__', handler)} failed for {event.type}: {e}", exc_info=True)
@@ -0,0 +1,239 @@
+"""
+Pre-warmed pool of configured Azure Realtime sessions.
+
+Opening an upstream session costs a TLS + websocket handshake and then the
+``session.update`` round trip. ``WarmSessionPool`` keeps a few upstream sockets
+per worker already open and configured with the standard ``session.update``;
+``RealtimeWebSocketProxy.connect`` leases one and is connected immediately.
+
+- Events received while idle (``session.created``/``session.updated``) are
+  buffered and replayed to the proxy that leases the session.
+- A maintenance thread refills the pool in the background, sizes it from the
+  recent lease rate (leases/s over ``sizing_window_s`` x ``horizon_s``,
+  clamped to ``min_size``..``max_size``) and closes sessions idle for longer
+  than ``idle_ttl_s``.
+
+The thread is started lazily on first use so it runs inside each gunicorn
+worker (``preload_app`` would otherwise start it in the master only).
+"""
+
+import json
+import logging
+import math
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, Optional
+
+from perf_metrics import RateCounter
+from realtime_events import sniff_event_type
+
+logger = logging.getLogger(__name__)
+
+# Max events buffered per idle session before it is considered unhealthy
+MAX_BUFFERED_EVENTS = 32
+
+
+class PooledSession:
+    """One idle upstream socket owned by the pool until leased"""
+
+    def __init__(self, pool: 'WarmSessionPool'):
+        self.pool = pool
+        self.ws = None
+        self.target = None
+        self.opened = False
+        self.configured = False
+        self.dead = False
+        self.created_at = time.monotonic()
+        self.opened_at = None
+        self._buffer = []
+        self._lock = threading.Lock()
+
+    # -- transport callbacks (websocket-client signatures) -----------------
+
+    def on_open(self, ws):
+        self.opened_at = time.monotonic()
+        try:
+            ws.send(json.dumps(self.pool.session_config_fn()))
+            self.opened = True
+        except Exception as e:
+            logger.error(f"[POOL] Failed to configure warm session: {e}")
+            self.dead = True
+
+    def on_message(self, ws, message):
+        with self._lock:
+            target = self.target
+            if target is None:
+                if len(self._buffer) >= MAX_BUFFERED_EVENTS:
+                    self.dead = True
+                    return
+                self._buffer.append(message)
+                if sniff_event_type(message) == 'session.updated':
+                    self.configured = True
+                return
+        target.on_message(ws, message)
+
+    def on_error(self, ws, error):
+        with self._lock:
+            target = self.target
+        if target is not None:
+            target.on_error(ws, error)
+        else:
+            logger.warning(f"[POOL] Warm session error: {error}")
+            self.dead = True
+
+    def on_close(self, ws, close_status_code=None, close_msg=None):
+        with self._lock:
+            target = self.target
+            self.dead = True
+        if target is not None:
+            target.on_close(ws, close_status_code, close_msg)
+
+    # -- pool side -----------------------------------------------------------
+
+    def idle_seconds(self) -> float:
+        return time.monotonic() - (self.opened_at or self.created_at)
+
+    def attach(self, proxy):
+        """Hand the socket to a proxy, replaying the events buffered while idle"""
+        with self._lock:
+            # Replay under the lock so new upstream events cannot overtake them
+            for message in self._buffer:
+                proxy.on_message(self.ws, message)
+            self._buffer = []
+            self.target = proxy
+
+    def close(self):
+        self.dead = True
+        if self.ws is not None:
+            try:
+                self.ws.close()
+            except Exception:
+                pass
+
+
+class WarmSessionPool:
+    """Per-worker pool of open, configured upstream Realtime sessions"""
+
+    def __init__(self, open_fn: Callable[..., Any], session_config_fn: Callable[[], dict],
+                 min_size: int = 1, max_size: int = 8, idle_ttl_s: float = 240.0,
+                 sizing_window_s: int = 300, horizon_s: float = 60.0,
+                 open_timeout_s: float = 15.0, maintain_interval_s: float = 1.0):
+        self.open_fn = open_fn
+        self.session_config_fn = session_config_fn
+        self.min_size = min_size
+        self.max_size = max_size
+        self.idle_ttl_s = idle_ttl_s
+        self.sizing_window_s = sizing_window_s
+        self.horizon_s = horizon_s
+        self.open_timeout_s = open_timeout_s
+        self.maintain_interval_s = maintain_interval_s
+        self._lock = threading.Lock()
+        self._idle = deque()
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = False
+        self.lease_rate = RateCounter(window_s=sizing_window_s)
+        self.stats = {
+            'leases': 0,
+            'hits': 0,
+            'misses': 0,
+            'opened': 0,
+            'expired': 0,
+            'discarded': 0
+        }
+
+    def start(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._maintain_loop, name='realtime-warm-pool', daemon=True)
+            self._thread.start()
+            logger.info("[POOL] Warm session pool maintenance started")
+
+    def target_size(self) -> int:
+        wanted = math.ceil(self.lease_rate.rate() * self.horizon_s)
+        return max(self.min_size, min(self.max_size, wanted))
+
+    def lease(self, proxy) -> Optional[PooledSession]:
+        """Take a ready session for proxy, or None if the pool is empty"""
+        self.start()
+        self.lease_rate.add()
+        self.stats['leases'] += 1
+        with self._lock:
+            candidates = [s for s in self._idle if s.opened and not s.dead]
+            # Preferir sesiones que ya recibieron session.updated
+            candidates.sort(key=lambda s: (not s.configured, -s.idle_seconds()))
+            session = candidates[0] if candidates else None
+            if session is not None:
+                self._idle.remove(session)
+        if session is None:
+            self.stats['misses'] += 1
+            return None
+        self.stats['hits'] += 1
+        return session
+
+    def _open_one(self):
+        session = PooledSession(self)
+        session.ws = self.open_fn(
+            on_open=session.on_open,
+            on_message=session.on_message,
+            on_error=session.on_error,
+            on_close=session.on_close
+        )
+        self.stats['opened'] += 1
+        with self._lock:
+            self._idle.append(session)
+
+    def _maintain_once(self):
+        expired = []
+        with self._lock:
+            for session in list(self._idle):
+                stale_open = not session.opened and time.monotonic() - session.created_at > self.open_timeout_s
+                if session.dead or stale_open:
+                    self._idle.remove(session)
+                    self.stats['discarded'] += 1
+                    expired.append(session)
+                elif session.opened and session.idle_seconds() > self.idle_ttl_s:
+                    self._idle.remove(session)
+                    self.stats['expired'] += 1
+                    expired.append(session)
+            missing = self.target_size() - len(self._idle)
+        for session in expired:
+            session.close()
+        for _ in range(max(0, missing)):
+            try:
+                self._open_one()
+            except Exception as e:
+                logger.error(f"[POOL] Failed to open warm session: {e}")
+                break
+
+    def _maintain_loop(self):
+        while not self._stopped:
+            try:
+                self._maintain_once()
+            except Exception as e:
+                logger.error(f"[POOL] Maintenance error: {e}", exc_info=True)
+            time.sleep(self.maintain_interval_s)
+
+    def shutdown(self):
+        self._stopped = True
+        with self._lock:
+            sessions, self._idle = list(self._idle), deque()
+        for session in sessions:
+            session.close()
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            idle = list(self._idle)
+        stats = dict(self.stats)
+        stats.update({
+            'idle': len(idle),
+            'ready': sum(1 for s in idle if s.opened and not s.dead),
+            'configured': sum(1 for s in idle if s.configured),
+            'target_size': self.target_size(),
+            'lease_rate_per_min': round(self.lease_rate.rate() * 60, 2),
+            'hit_rate': round(stats['hits'] / max(stats['leases'], 1), 3)
+        })
+        return stats
@@ -0,0 +1,247 @@
+"""
+Bounded per-connection send queues for both directions of the Realtime relay.
+
+Without a buffering policy a slow browser tab (``socketio.emit``) or a stalled
+Azure socket (``ws.send``) makes the producer block or pile frames up inside the
+async framework with no upper bound. ``SendQueue`` sits between the producer and
+the transport: producers enqueue and return, a single drain task per queue
+delivers in order, and the queue never holds more than ``max_items`` droppable
+entries. The drain task only lives while there is traffic: it exits after
+``idle_exit_s`` with nothing queued and the next ``put`` starts another, so
+idle connections hold no extra thread.
+
+Audio belonging to a response the client has already interrupted (or
+cancelled) is stale: ``mark_interrupted`` purges it from the queue and later
+frames for that response are dropped on arrival. When the queue is full, stale
+audio is shed first. What happens to live audio depends on the overflow policy
+(``REALTIME_QUEUE_OVERFLOW``):
+
+- ``block`` (default): the producer waits for the drain task (backpressure on
+  e.g. the upstream socket reader). Live audio is never dropped; waits longer
+  than ``block_timeout_s`` are counted as ``blocked_long``.
+- ``drop_audio``: never block; drop the oldest queued audio frame, live or not.
+  Only for producers that must not block (the asyncio relay without a green
+  hub runs every connection's callbacks on one loop).
+
+Control events (anything that is not an audio frame) are never dropped; they
+are accepted over the limit and counted as ``control_over_limit``.
+"""
+
+import logging
+import threading
+import time
+import weakref
+from collections import deque
+from typing import Any, Callable, Dict, Optional
+
+from perf_metrics import HistogramSet
+
+logger = logging.getLogger(__name__)
+
+OVERFLOW_POLICIES = ('block', 'drop_audio')
+
+# Interrupted response ids remembered per queue
+MAX_INTERRUPTED_IDS = 8
+
+# Aggregated counters for every queue in this worker (exposed in /metrics)
+_totals_lock = threading.Lock()
+_totals: Dict[str, Dict[str, int]] = {}
+_queues = weakref.WeakSet()
+_time_in_queue = HistogramSet(buckets=(1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000))
+
+
+def _count(direction: str, key: str, n: int = 1):
+    with _totals_lock:
+        counters = _totals.setdefault(direction, {
+            'enqueued': 0,
+            'delivered': 0,
+            'delivery_errors': 0,
+            'dropped_interrupted': 0,
+            'dropped_overflow': 0,
+            'dropped_closed': 0,
+            'control_over_limit': 0,
+            'blocked': 0,
+            'blocked_long': 0,
+            'max_depth': 0
+        })
+        if key == 'max_depth':
+            counters[key] = max(counters[key], n)
+        else:
+            counters[key] += n
+
+
+def send_queue_totals() -> Dict[str, Any]:
+    """Worker-wide queue counters, live depth and time-in-queue per direction"""
+    with _totals_lock:
+        totals = {direction: dict(counters) for direction, counters in _totals.items()}
+        queues = list(_queues)
+    for direction in totals:
+        totals[direction]['depth'] = sum(q.depth for q in queues if q.direction == direction)
+        totals[direction]['queues'] = sum(1 for q in queues if q.direction == direction)
+    histograms = _time_in_queue.snapshot()
+    for direction, hist in histograms.items():
+        totals.setdefault(direction, {})['time_in_queue_ms'] = hist
+    return totals
+
+
+class _Item:
+    __slots__ = ('payload', 'msg_type', 'droppable', 'response_id', 'enqueued')
+
+    def __init__(self, payload, msg_type: str, droppable: bool, response_id: Optional[str]):
+        self.payload = payload
+        self.msg_type = msg_type
+        self.droppable = droppable
+        self.response_id = response_id
+        self.enqueued = time.monotonic()
+
+
+class SendQueue:
+    """FIFO with a drain task, a size bound for audio and a drop policy"""
+
+    def __init__(self, direction: str, deliver: Callable[[Any], Any],
+                 spawn: Callable[[Callable], Any], max_items: int = 256,
+                 overflow: str = 'block', block_timeout_s: float = 0.2, idle_exit_s: float = 5.0):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown queue overflow policy: {overflow}")
+        self.direction = direction
+        self.deliver = deliver
+        self.spawn = spawn
+        self.max_items = max_items
+        self.overflow = overflow
+        self.block_timeout_s = block_timeout_s
+        self.idle_exit_s = idle_exit_s
+        self._cond = threading.Condition()
+        self._items = deque()
+        self._interrupted = deque(maxlen=MAX_INTERRUPTED_IDS)
+        self._started = False
+        self._closing = False
+        self.stats = {
+            'enqueued': 0,
+            'delivered': 0,
+            'dropped_interrupted': 0,
+            'dropped_overflow': 0,
+            'dropped_closed': 0,
+            'control_over_limit': 0,
+            'max_depth': 0
+        }
+        _queues.add(self)
+
+    @property
+    def depth(self) -> int:
+        return len(self._items)
+
+    def _drop(self, key: str, n: int = 1):
+        self.stats[key] += n
+        _count(self.direction, key, n)
+
+    def put(self, payload, msg_type: str, droppable: bool = False, response_id: Optional[str] = None) -> bool:
+        """Enqueue one frame; False if it was dropped or the queue is closed"""
+        with self._cond:
+            if self._closing:
+                self._drop('dropped_closed')
+                return False
+            if droppable and response_id is not None and response_id in self._interrupted:
+                self._drop('dropped_interrupted')
+                return False
+
+            if len(self._items) >= self.max_items and not self._make_room(stale_only=True):
+                if not droppable:
+                    self._drop('control_over_limit')
+                elif self.overflow == 'block':
+                    self._wait_for_room()
+                    if self._closing:
+                        self._drop('dropped_closed')
+                        return False
+                    if response_id is not None and response_id in self._interrupted:
+                        # Interrumpida mientras esperaba lugar
+                        self._drop('dropped_interrupted')
+                        return False
+                elif not self._make_room(stale_only=False):
+                    self._drop('dropped_overflow')
+                    return False
+
+            self._items.append(_Item(payload, msg_type, droppable, response_id))
+            self.stats['enqueued'] += 1
+            _count(self.direction, 'enqueued')
+            depth = len(self._items)
+            if depth > self.stats['max_depth']:
+                self.stats['max_depth'] = depth
+                _count(self.direction, 'max_depth', depth)
+            self._cond.notify_all()
+            if not self._started:
+                self._started = True
+                self.spawn(self._drain)
+        return True
+
+    def _make_room(self, stale_only: bool) -> bool:
+        """Drop the oldest queued audio frame (of an interrupted response if stale_only)"""
+        for item in self._items:
+            if not item.droppable:
+                continue
+            if not stale_only:
+                self._items.remove(item)
+                self._drop('dropped_overflow')
+                return True
+            if item.response_id is not None and item.response_id in self._interrupted:
+                self._items.remove(item)
+                self._drop('dropped_interrupted')
+                return True
+        return False
+
+    def _wait_for_room(self):
+        # Con el lock tomado: audio en vivo, se espera al drain en vez de descartarlo
+        _count(self.direction, 'blocked')
+        if not self._cond.wait_for(lambda: len(self._items) < self.max_items or self._closing,
+                                   timeout=self.block_timeout_s):
+            _count(self.direction, 'blocked_long')
+            self._cond.wait_for(lambda: len(self._items) < self.max_items or self._closing)
+
+    def mark_interrupted(self, response_id: Optional[str]) -> int:
+        """Purge queued audio of an interrupted response and drop any that follows"""
+        if response_id is None:
+            return 0
+        with self._cond:
+            if response_id not in self._interrupted:
+                self._interrupted.append(response_id)
+            stale = [item for item in self._items if item.droppable and item.response_id == response_id]
+            for item in stale:
+                self._items.remove(item)
+            if stale:
+                self._drop('dropped_interrupted', len(stale))
+                self._cond.notify_all()
+        return len(stale)
+
+    def close(self, discard_pending: bool = False):
+        """Stop accepting frames; the drain task exits once the queue is empty"""
+        with self._cond:
+            self._closing = True
+            if discard_pending and self._items:
+                self._drop('dropped_closed', len(self._items))
+                self._items.clear()
+            self._cond.notify_all()
+
+    def _drain(self):
+        while True:
+            with self._cond:
+                if not self._items and not self._closing:
+                    self._cond.wait(timeout=self.idle_exit_s)
+                if not self._items:
+                    # Sin tráfico (o cerrada): el próximo put arranca otro drain
+                    self._started = False
+                    return
+                item = self._items.popleft()
+                self._cond.notify_all()
+            _time_in_queue.observe(self.direction, (time.monotonic() - item.enqueued) * 1000)
+            try:
+                self.deliver(item.payload)
+                self.stats['delivered'] += 1
+                _count(self.direction, 'delivered')
+            except Exception as e:
+                _count(self.direction, 'delivery_errors')
+                logger.error(f"[QUEUE] {self.direction} delivery failed ({item.msg_type}): {e}")
+
+    def snapshot(self) -> Dict[str, Any]:
+        stats = dict(self.stats)
+        stats['depth'] = self.depth
+        stats['overflow'] = self.overflow
+        return stats
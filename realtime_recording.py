@@ -0,0 +1,312 @@
+"""
+Compact binary recording of Realtime sessions (msgpack + zstd).
+
+With ``REALTIME_RECORDING_DIR`` set, every event the relay receives from Azure
+(``downstream``) and every event it sends to Azure (``upstream``) is appended to
+a per-session ``.rtrec`` file. The hot path only timestamps the raw frame and
+puts it on a bounded queue; one writer thread per worker parses the JSON,
+stores audio (``response.audio.delta`` / ``input_audio_buffer.append``) as raw
+PCM bytes instead of base64, packs records with ``ormsgpack`` and writes them
+in independently ``zstandard``-compressed chunks. If the queue is full the
+record is dropped and counted, never blocking the relay.
+
+File layout::
+
+    b'RTREC1' | u32 len | msgpack header {client_id, started, version}
+    u32 len | zstd(msgpack [[t, direction, type, event], ...])   (repeated)
+
+Lengths are big-endian. Chunks are self-contained, so a file can be read while
+it is still being written and a truncated tail only loses its last chunk.
+``RecordingReader`` / ``iter_records`` stream records one chunk at a time.
+
+Usage:
+    python -m realtime_recording recordings/client-20250821T204149.rtrec
+"""
+
+import base64
+import itertools
+import json
+import logging
+import os
+import queue
+import struct
+import sys
+import threading
+import time
+from collections import Counter, namedtuple
+from datetime import datetime
+from typing import Any, Dict, Iterator, Optional
+
+try:
+    import ormsgpack
+    import zstandard
+except ImportError:
+    ormsgpack = None
+    zstandard = None
+
+from realtime_events import loads
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'RTREC1'
+FORMAT_VERSION = 1
+_LEN = struct.Struct('>I')
+
+# Events whose base64 audio is stored as raw bytes, and the field holding it
+AUDIO_FIELDS = {
+    'response.audio.delta': 'delta',
+    'input_audio_buffer.append': 'audio',
+}
+
+Record = namedtuple('Record', ['t', 'direction', 'type', 'event'])
+
+
+def recording_available() -> bool:
+    return ormsgpack is not None and zstandard is not None
+
+
+def _to_event(message) -> dict:
+    """Raw frame (JSON text or dict) -> dict with audio as raw bytes"""
+    if isinstance(message, dict):
+        event = dict(message)
+    else:
+        try:
+            event = loads(message)
+        except Exception:
+            return {'type': 'unparsed', 'raw': message if isinstance(message, (str, bytes)) else str(message)}
+    field = AUDIO_FIELDS.get(event.get('type'))
+    if field and isinstance(event.get(field), str):
+        try:
+            event[field] = base64.b64decode(event[field])
+        except ValueError:
+            pass
+    return event
+
+
+class _SessionFile:
+    __slots__ = ('path', 'handle', 'pending', 'last_flush')
+
+    def __init__(self, path):
+        self.path = path
+        self.handle = None
+        self.pending = []
+        self.last_flush = time.monotonic()
+
+
+class RecordingWriter:
+    """Single background writer shared by every recorder of the worker"""
+
+    def __init__(self, max_queue: int = 10000, batch_records: int = 256,
+                 flush_interval_s: float = 1.0, zstd_level: int = 3):
+        self._queue = queue.Queue(maxsize=max_queue)
+        self.batch_records = batch_records
+        self.flush_interval_s = flush_interval_s
+        self.zstd_level = zstd_level
+        self._files: Dict[int, _SessionFile] = {}
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.stats = {
+            'records': 0,
+            'dropped': 0,
+            'chunks': 0,
+            'bytes_written': 0,
+            'files_opened': 0,
+            'write_errors': 0
+        }
+
+    def start(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='realtime-recorder', daemon=True)
+                self._thread.start()
+
+    def submit(self, item) -> bool:
+        self.start()
+        try:
+            self._queue.put_nowait(item)
+            return True
+        except queue.Full:
+            self.stats['dropped'] += 1
+            return False
+
+    def submit_control(self, item):
+        # Apertura y cierre no pueden perderse: esperan lugar en la cola
+        self.start()
+        self._queue.put(item)
+
+    def _run(self):
+        compressor = zstandard.ZstdCompressor(level=self.zstd_level)
+        while True:
+            try:
+                item = self._queue.get(timeout=self.flush_interval_s)
+            except queue.Empty:
+                item = None
+            try:
+                if item is not None:
+                    self._handle(item, compressor)
+                now = time.monotonic()
+                for session in list(self._files.values()):
+                    if session.pending and now - session.last_flush >= self.flush_interval_s:
+                        self._flush(session, compressor)
+            except Exception as e:
+                self.stats['write_errors'] += 1
+                logger.error(f"[RECORDING] Writer error: {e}", exc_info=True)
+
+    def _handle(self, item, compressor):
+        kind, file_id = item[0], item[1]
+        if kind == 'open':
+            path, header = item[2], item[3]
+            session = _SessionFile(path)
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            session.handle = open(path, 'wb')
+            packed = ormsgpack.packb(header)
+            session.handle.write(MAGIC + _LEN.pack(len(packed)) + packed)
+            self._files[file_id] = session
+            self.stats['files_opened'] += 1
+        elif kind == 'record':
+            session = self._files.get(file_id)
+            if session is None:
+                return
+            _, _, t, direction, message = item
+            event = _to_event(message)
+            session.pending.append([t, direction, event.get('type', 'unknown'), event])
+            self.stats['records'] += 1
+            if len(session.pending) >= self.batch_records:
+                self._flush(session, compressor)
+        elif kind == 'close':
+            session = self._files.pop(file_id, None)
+            if session is not None:
+                self._flush(session, compressor)
+                session.handle.close()
+
+    def _flush(self, session: _SessionFile, compressor):
+        session.last_flush = time.monotonic()
+        if not session.pending:
+            return
+        chunk = compressor.compress(ormsgpack.packb(session.pending))
+        session.pending = []
+        session.handle.write(_LEN.pack(len(chunk)) + chunk)
+        session.handle.flush()
+        self.stats['chunks'] += 1
+        self.stats['bytes_written'] += len(chunk) + _LEN.size
+
+    def snapshot(self) -> Dict[str, Any]:
+        stats = dict(self.stats)
+        stats['queued'] = self._queue.qsize()
+        stats['open_files'] = len(self._files)
+        return stats
+
+
+class SessionRecorder:
+    """Per-connection handle: cheap record() on the hot path, close() at the end"""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, writer: RecordingWriter, directory: str, client_id: str):
+        self.writer = writer
+        self.file_id = next(SessionRecorder._ids)
+        started = datetime.utcnow()
+        safe_id = ''.join(c if c.isalnum() or c in '-_' else '_' for c in client_id)
+        self.path = os.path.join(directory, f"{safe_id}-{started.strftime('%Y%m%dT%H%M%S')}-{self.file_id}.rtrec")
+        self.closed = False
+        writer.submit_control(('open', self.file_id, self.path, {
+            'client_id': client_id,
+            'started': started.isoformat() + 'Z',
+            'version': FORMAT_VERSION
+        }))
+
+    def record(self, direction: str, message):
+        if not self.closed:
+            self.writer.submit(('record', self.file_id, time.time(), direction, message))
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.writer.submit_control(('close', self.file_id))
+
+
+class RecordingReader:
+    """Streams the records of an .rtrec file one chunk at a time"""
+
+    def __init__(self, path: str):
+        if not recording_available():
+            raise RuntimeError("ormsgpack and zstandard are required to read recordings")
+        self.path = path
+        self.header: Dict[str, Any] = {}
+
+    def __iter__(self) -> Iterator[Record]:
+        decompressor = zstandard.ZstdDecompressor()
+        with open(self.path, 'rb') as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{self.path} is not a Realtime recording")
+            header = self._read_block(f)
+            if header is None:
+                return
+            self.header = ormsgpack.unpackb(header)
+            while True:
+                chunk = self._read_block(f)
+                if chunk is None:
+                    return
+                for t, direction, msg_type, event in ormsgpack.unpackb(decompressor.decompress(chunk)):
+                    yield Record(t, direction, msg_type, event)
+
+    @staticmethod
+    def _read_block(f) -> Optional[bytes]:
+        head = f.read(_LEN.size)
+        if len(head) < _LEN.size:
+            return None
+        (size,) = _LEN.unpack(head)
+        data = f.read(size)
+        # Último chunk incompleto (archivo aún en escritura o truncado)
+        return data if len(data) == size else None
+
+    def events(self, types=None, direction: Optional[str] = None) -> Iterator[Record]:
+        """Records filtered by event type(s) and/or direction"""
+        if isinstance(types, str):
+            types = (types,)
+        for record in self:
+            if types is not None and record.type not in types:
+                continue
+            if direction is not None and record.direction != direction:
+                continue
+            yield record
+
+    def audio(self, direction: str = 'downstream') -> Iterator[bytes]:
+        """Raw PCM16 chunks of one direction, in order"""
+        for record in self.events(direction=direction):
+            field = AUDIO_FIELDS.get(record.type)
+            if field and isinstance(record.event.get(field), bytes):
+                yield record.event[field]
+
+
+def iter_records(path: str) -> Iterator[Record]:
+    return iter(RecordingReader(path))
+
+
+def summarize_recording(path: str) -> Dict[str, Any]:
+    reader = RecordingReader(path)
+    types = Counter()
+    audio_bytes = Counter()
+    first = last = None
+    for record in reader:
+        types[(record.direction, record.type)] += 1
+        field = AUDIO_FIELDS.get(record.type)
+        if field and isinstance(record.event.get(field), bytes):
+            audio_bytes[record.direction] += len(record.event[field])
+        first = record.t if first is None else first
+        last = record.t
+    return {
+        'header': reader.header,
+        'file_bytes': os.path.getsize(path),
+        'records': sum(types.values()),
+        'duration_s': round(last - first, 3) if first is not None else 0.0,
+        'audio_bytes': dict(audio_bytes),
+        'types': {f"{d}:{t}": n for (d, t), n in types.most_common()}
+    }
+
+
+if __name__ == '__main__':
+    for recording in sys.argv[1:]:
+        print(json.dumps(summarize_recording(recording), indent=2, default=str))
@@ -0,0 +1,418 @@
+"""
+Upstream transports for the Azure OpenAI Realtime Socket.IO proxy.
+
+Two relay engines are available and selected with REALTIME_RELAY_MODE:
+
+- ``threaded`` (default): one websocket-client ``WebSocketApp`` plus one
+  thread per upstream connection. This is the original behaviour.
+- ``asyncio``: a single event loop per worker that multiplexes every upstream
+  Azure Realtime socket using the ``websockets`` library. The loop is a
+  ``BackgroundLoop`` (native thread and unpatched selector under eventlet/gevent).
+  Under eventlet/gevent the callbacks do not run on that thread: emits and
+  background tasks only work on the hub, so each socket's callbacks are
+  queued in order and run by a greenlet (``BackgroundLoop.hub_spawn``), and
+  ``call_later`` uses a green ``RelayTimers``.
+
+Both engines expose the same surface: ``relay.open(url, on_open=..., on_message=...,
+on_error=..., on_close=...)`` returns a handle with ``send(text)`` and ``close()``,
+and the callbacks keep the websocket-client signatures (``cb(ws, ...)``), so
+``RealtimeWebSocketProxy`` does not need to know which engine is running.
+``relay.call_later(delay, fn)`` schedules a callback from any thread and always
+returns a handle with ``cancel()``.
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, Optional
+
+from background_loop import BackgroundLoop
+
+logger = logging.getLogger(__name__)
+
+RELAY_MODES = ('threaded', 'asyncio')
+
+
+class _Timer:
+    __slots__ = ('when', 'fn', 'cancelled')
+
+    def __init__(self, when: float, fn: Callable):
+        self.when = when
+        self.fn = fn
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class RelayTimers:
+    """One thread (a greenlet under eventlet) running every delayed callback of the relay.
+
+    Coalescing windows and inbound audio frames schedule a callback every few
+    tens of milliseconds per active stream; a ``threading.Timer`` each would
+    start a thread per callback. Here they go into one heap ordered by
+    deadline; cancelled timers are dropped lazily when they reach the top.
+    """
+
+    def __init__(self, name: str = 'realtime-relay-timers'):
+        self.name = name
+        self._cond = threading.Condition(threading.Lock())
+        self._heap = []
+        self._seq = itertools.count()
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = False
+        self.stats = {'scheduled': 0, 'fired': 0, 'cancelled': 0, 'errors': 0}
+
+    def call_later(self, delay: float, fn: Callable) -> _Timer:
+        timer = _Timer(time.monotonic() + delay, fn)
+        with self._cond:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+            heapq.heappush(self._heap, (timer.when, next(self._seq), timer))
+            self.stats['scheduled'] += 1
+            # Solo hace falta despertar al thread si cambió el próximo vencimiento
+            if self._heap[0][2] is timer:
+                self._cond.notify()
+        return timer
+
+    def _next_due(self) -> Optional[_Timer]:
+        with self._cond:
+            while not self._stopped:
+                if not self._heap:
+                    self._cond.wait()
+                    continue
+                when, _, timer = self._heap[0]
+                if timer.cancelled:
+                    heapq.heappop(self._heap)
+                    self.stats['cancelled'] += 1
+                    continue
+                delay = when - time.monotonic()
+                if delay > 0:
+                    self._cond.wait(delay)
+                    continue
+                heapq.heappop(self._heap)
+                self.stats['fired'] += 1
+                return timer
+        return None
+
+    def _run(self):
+        while True:
+            timer = self._next_due()
+            if timer is None:
+                return
+            try:
+                timer.fn()
+            except Exception as e:
+                self.stats['errors'] += 1
+                logger.error(f"[RELAY] Timer callback failed: {e}", exc_info=True)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._cond:
+            return dict(self.stats, pending=len(self._heap))
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+
+
+class ThreadedRelay:
+    """Legacy engine: one WebSocketApp.run_forever thread per connection"""
+
+    mode = 'threaded'
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._active = 0
+        self.opened_total = 0
+        # Un solo scheduler para todos los timers del worker (no un Timer por llamada)
+        self.timers = RelayTimers()
+
+    def open(self, url: str, on_open: Callable, on_message: Callable,
+             on_error: Callable, on_close: Callable, header: Optional[list] = None):
+        import websocket
+
+        def _on_close(ws, close_status_code=None, close_msg=None):
+            with self._lock:
+                self._active -= 1
+            on_close(ws, close_status_code, close_msg)
+
+        ws = websocket.WebSocketApp(
+            url,
+            header=header,
+            on_open=on_open,
+            on_message=on_message,
+            on_error=on_error,
+            on_close=_on_close
+        )
+
+        # Ejecutar en thread separado
+        ws.thread = threading.Thread(target=ws.run_forever, name='realtime-ws')
+        ws.thread.daemon = True
+        with self._lock:
+            self._active += 1
+            self.opened_total += 1
+        ws.thread.start()
+        return ws
+
+    def call_later(self, delay: float, fn: Callable) -> _Timer:
+        """Schedule fn on the relay's timer thread; returns a cancelable handle"""
+        return self.timers.call_later(delay, fn)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'mode': self.mode,
+            'active_connections': self._active,
+            'opened_total': self.opened_total,
+            'threads': threading.active_count(),
+            'timers': self.timers.snapshot()
+        }
+
+    def shutdown(self):
+        self.timers.stop()
+
+
+class AsyncRealtimeSocket:
+    """Handle for one upstream socket living on the shared AsyncioRelay loop.
+
+    ``send`` and ``close`` are thread-safe and may be called from Socket.IO
+    handlers; everything else runs on the relay loop, except the callbacks
+    when the relay hands them to the green hub.
+    """
+
+    def __init__(self, relay: 'AsyncioRelay', url: str, header: Optional[list],
+                 on_open: Callable, on_message: Callable,
+                 on_error: Callable, on_close: Callable):
+        self.relay = relay
+        self.url = url
+        self.header = header
+        self.on_open = on_open
+        self.on_message = on_message
+        self.on_error = on_error
+        self.on_close = on_close
+        self._ws = None
+        self._task: Optional[asyncio.Task] = None
+        self._outbox: asyncio.Queue = asyncio.Queue()
+        self._closing = False
+        # Callbacks pendientes para el hub (eventlet/gevent), en orden de llegada
+        self._inbox = deque()
+        self._inbox_lock = relay.runner.native_lock()
+        self._dispatching = False
+        self.messages_in = 0
+        self.messages_out = 0
+
+    # -- thread-safe API --------------------------------------------------
+
+    def send(self, message):
+        if self._closing:
+            raise ConnectionError("Realtime socket is closing")
+        self.relay.loop.call_soon_threadsafe(self._enqueue, message)
+
+    def close(self):
+        if self._closing:
+            return
+        self._closing = True
+        self.relay.loop.call_soon_threadsafe(self._enqueue, None)
+
+    # -- loop side ----------------------------------------------------------
+
+    def _enqueue(self, message):
+        self._outbox.put_nowait(message)
+
+    def _callback(self, fn, *args):
+        if not self.relay.runner.green:
+            self._invoke(fn, args)
+            return
+        with self._inbox_lock:
+            self._inbox.append((fn, args))
+            start = not self._dispatching
+            self._dispatching = True
+        if start:
+            self.relay.runner.hub_spawn(self._dispatch)
+
+    def _dispatch(self):
+        # En un greenlet del hub: un despachador por socket a la vez, así se respeta el orden
+        while True:
+            with self._inbox_lock:
+                if not self._inbox:
+                    self._dispatching = False
+                    return
+                fn, args = self._inbox.popleft()
+            self._invoke(fn, args)
+
+    def _invoke(self, fn, args):
+        try:
+            fn(self, *args)
+        except Exception as e:
+            logger.error(f"[RELAY] Callback {getattr(fn, '__name__', fn)} failed: {e}", exc_info=True)
+
+    async def _write_loop(self, ws):
+        while True:
+            message = await self._outbox.get()
+            if message is None:
+                await ws.close()
+                return
+            await ws.send(message)
+            self.messages_out += 1
+
+    async def run(self):
+        from websockets.asyncio.client import connect
+        from websockets.exceptions import ConnectionClosed
+
+        code, reason = None, None
+        writer = None
+        try:
+            async with connect(self.url,
+                               additional_headers=self.header,
+                               max_size=None,
+                               open_timeout=self.relay.open_timeout,
+                               ping_interval=self.relay.ping_interval) as ws:
+                self._ws = ws
+                writer = asyncio.create_task(self._write_loop(ws))
+                self._callback(self.on_open)
+                async for message in ws:
+                    self.messages_in += 1
+                    self._callback(self.on_message, message)
+                code, reason = ws.close_code, ws.close_reason
+        except ConnectionClosed as e:
+            code = e.rcvd.code if e.rcvd else None
+            reason = e.rcvd.reason if e.rcvd else str(e)
+            if not self._closing:
+                self._callback(self.on_error, e)
+        except Exception as e:
+            self._callback(self.on_error, e)
+        finally:
+            self._closing = True
+            if writer:
+                writer.cancel()
+            self.relay._discard(self)
+            self._callback(self.on_close, code, reason)
+
+
+class _LoopTimer:
+    """Cancelable handle for AsyncioRelay.call_later, whichever thread scheduled it"""
+
+    __slots__ = ('loop', 'handle', 'cancelled')
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self.handle: Optional[asyncio.TimerHandle] = None
+        self.cancelled = False
+
+    def _schedule(self, delay: float, fn: Callable):
+        # En el loop del relay
+        if not self.cancelled:
+            self.handle = self.loop.call_later(delay, fn)
+
+    def cancel(self):
+        self.cancelled = True
+        handle = self.handle
+        if handle is not None:
+            self.loop.call_soon_threadsafe(handle.cancel)
+
+
+class AsyncioRelay:
+    """Single event loop per worker multiplexing all upstream Realtime sockets"""
+
+    mode = 'asyncio'
+
+    def __init__(self, open_timeout: float = 10.0, ping_interval: Optional[float] = 20.0,
+                 async_mode: str = 'threading'):
+        self.open_timeout = open_timeout
+        self.ping_interval = ping_interval
+        # Thread nativo + selector sin parchear, igual que el loop de las rutas async
+        self.runner = BackgroundLoop(async_mode=async_mode, name='realtime-relay-loop')
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        # Con hub verde los timers también tienen que correr en él (emiten)
+        self.timers = RelayTimers() if self.runner.green else None
+        self._sockets = set()
+        self.opened_total = 0
+        self.started_at = None
+
+    def _ensure_started(self):
+        if self.loop is not None:
+            return
+        self.runner.start()
+        if self.started_at is None:
+            self.started_at = time.time()
+        self.loop = self.runner.loop
+
+    def open(self, url: str, on_open: Callable, on_message: Callable,
+             on_error: Callable, on_close: Callable, header: Optional[list] = None):
+        self._ensure_started()
+        sock = AsyncRealtimeSocket(self, url, header, on_open, on_message, on_error, on_close)
+        self.loop.call_soon_threadsafe(self._spawn, sock)
+        return sock
+
+    def _spawn(self, sock: AsyncRealtimeSocket):
+        self._sockets.add(sock)
+        self.opened_total += 1
+        sock._task = self.loop.create_task(sock.run())
+
+    def _discard(self, sock: AsyncRealtimeSocket):
+        self._sockets.discard(sock)
+
+    def call_later(self, delay: float, fn: Callable) -> _LoopTimer:
+        """Schedule fn on the relay loop (the hub's timer greenlet under eventlet/gevent); returns a cancelable handle"""
+        if self.timers is not None:
+            return self.timers.call_later(delay, fn)
+        self._ensure_started()
+        timer = _LoopTimer(self.loop)
+        if self.runner.on_loop():
+            timer._schedule(delay, fn)
+        else:
+            self.loop.call_soon_threadsafe(timer._schedule, delay, fn)
+        return timer
+
+    def stats(self) -> Dict[str, Any]:
+        sockets = list(self._sockets)
+        return {
+            'mode': self.mode,
+            'active_connections': len(sockets),
+            'opened_total': self.opened_total,
+            'threads': threading.active_count(),
+            'messages_in': sum(s.messages_in for s in sockets),
+            'messages_out': sum(s.messages_out for s in sockets),
+            'loop_running': bool(self.loop and self.loop.is_running()),
+            'timers': self.timers.snapshot() if self.timers is not None else None
+        }
+
+    async def _close_all(self, timeout: float):
+        sockets = list(self._sockets)
+        tasks = [sock._task for sock in sockets if sock._task is not None]
+        for sock in sockets:
+            sock.close()
+        if not tasks:
+            return
+        # Cierre ordenado (close frame + on_close); lo que no termine a tiempo se cancela
+        _, pending = await asyncio.wait(tasks, timeout=timeout)
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    def shutdown(self, timeout: float = 5.0):
+        if not self.loop:
+            return
+        try:
+            self.runner.run(self._close_all(timeout), timeout=timeout + 1.0)
+        except Exception as e:
+            logger.warning(f"[RELAY] Upstream sockets did not close cleanly: {e}")
+        if self.timers is not None:
+            self.timers.stop()
+        self.runner.shutdown()
+
+
+def create_relay(mode: str, async_mode: str = 'threading'):
+    """Build the relay engine for REALTIME_RELAY_MODE (async_mode: Socket.IO's, for the asyncio loop)"""
+    mode = (mode or 'threaded').lower()
+    if mode == 'asyncio':
+        return AsyncioRelay(async_mode=async_mode)
+    if mode != 'threaded':
+        logger.warning(f"Unknown REALTIME_RELAY_MODE '{mode}', falling back to threaded")
+    return ThreadedRelay()
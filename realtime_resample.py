@@ -0,0 +1,160 @@
+"""
+Server-side resampling of mic audio to the session format (REALTIME_SERVER_RESAMPLE).
+
+The browser captures at the AudioContext rate (``WEBRTC_AUDIO_SAMPLE_RATE``,
+usually 48 kHz) while the Realtime session takes PCM16 at 24 kHz. With this
+stage on, the browser sends its raw capture frames (``float32`` or ``int16``,
+any channel count) as ``input_audio_buffer.append`` with ``sample_rate`` /
+``encoding`` / ``channels`` fields, and ``StreamingResampler`` converts them:
+
+- interleaved channels are downmixed to mono (mean)
+- the rate ratio is reduced to ``up/down`` and a polyphase FIR is applied: the
+  Kaiser-windowed low-pass is the same prototype ``scipy.signal.resample_poly``
+  designs, split into ``up`` phases of ``taps`` coefficients
+- every output sample of a chunk is computed at once with NumPy (a
+  sliding-window view of the input times the phase filter it needs), no
+  per-sample Python
+- state between chunks is the last ``taps - 1`` input samples, the absolute
+  output position and any trailing partial frame, so chunk boundaries are
+  seamless and the output equals filtering the whole stream in one go
+"""
+
+import threading
+import time
+from math import gcd
+from typing import Any, Dict
+
+try:
+    import numpy as np
+    from numpy.lib.stride_tricks import sliding_window_view
+    from scipy.signal import firwin
+except ImportError:
+    np = None
+
+INPUT_ENCODINGS = {
+    'float32': ('<f4', 1.0),
+    'int16': ('<i2', 1.0 / 32768.0),
+}
+
+MIN_SAMPLE_RATE = 8000
+MAX_SAMPLE_RATE = 192000
+MAX_CHANNELS = 8
+
+# Worker-wide resampling counters (exposed in /metrics)
+_totals_lock = threading.Lock()
+_totals = {
+    'chunks': 0,
+    'bytes_in': 0,
+    'bytes_out': 0,
+    'audio_ms_in': 0.0,
+    'cpu_ns': 0
+}
+
+
+def resample_totals() -> Dict[str, Any]:
+    with _totals_lock:
+        totals = dict(_totals)
+    cpu_s = totals['cpu_ns'] / 1e9
+    totals['audio_seconds_per_cpu_second'] = round(totals['audio_ms_in'] / 1000.0 / cpu_s, 1) if cpu_s else 0.0
+    totals['audio_ms_in'] = round(totals['audio_ms_in'])
+    return totals
+
+
+def polyphase_filters(up: int, down: int, half_width: int = 10, beta: float = 5.0):
+    """Phase filters (up x taps) of the resample_poly prototype, each reversed for a dot product"""
+    max_rate = max(up, down)
+    half_len = half_width * max_rate
+    h = firwin(2 * half_len + 1, 1.0 / max_rate, window=('kaiser', beta)) * up
+    taps = -(-len(h) // up)
+    h = np.concatenate([h, np.zeros(taps * up - len(h))])
+    # h[p + up*k] -> fase p, coeficiente k; invertido para alinear con la ventana de entrada
+    return np.ascontiguousarray(h.reshape(taps, up).T[:, ::-1]).astype(np.float32)
+
+
+class StreamingResampler:
+    """Per-connection stateful converter: raw capture frames -> PCM16 mono at out_rate"""
+
+    def __init__(self, in_rate: int, out_rate: int = 24000, channels: int = 1,
+                 input_format: str = 'float32', half_width: int = 10):
+        if np is None:
+            raise RuntimeError("numpy and scipy are required for server-side resampling")
+        if input_format not in INPUT_ENCODINGS:
+            raise ValueError(f"Unknown input encoding: {input_format}")
+        if not MIN_SAMPLE_RATE <= in_rate <= MAX_SAMPLE_RATE:
+            raise ValueError(f"Unsupported input sample rate: {in_rate}")
+        if not 1 <= channels <= MAX_CHANNELS:
+            raise ValueError(f"Unsupported channel count: {channels}")
+        self.in_rate = in_rate
+        self.out_rate = out_rate
+        self.channels = channels
+        self.input_format = input_format
+        self._dtype, self._scale = INPUT_ENCODINGS[input_format]
+        self._frame_bytes = np.dtype(self._dtype).itemsize * channels
+        g = gcd(in_rate, out_rate)
+        self.up = out_rate // g
+        self.down = in_rate // g
+        self._passthrough = self.up == self.down
+        if not self._passthrough:
+            self._filters = polyphase_filters(self.up, self.down, half_width)
+            self.taps = self._filters.shape[1]
+            self._history = np.zeros(self.taps - 1, dtype=np.float32)
+        else:
+            self.taps = 1
+        self._partial = b''
+        self._samples_in = 0
+        self._samples_out = 0
+
+    @property
+    def delay_ms(self) -> float:
+        """Group delay of the filter (output lags the input by this much)"""
+        if self._passthrough:
+            return 0.0
+        return (self.taps * self.up - 1) / 2.0 / (self.in_rate * self.up) * 1000.0
+
+    def _decode(self, data: bytes):
+        data = self._partial + data if self._partial else data
+        usable = len(data) - len(data) % self._frame_bytes
+        self._partial = data[usable:]
+        samples = np.frombuffer(data, dtype=self._dtype, count=usable // np.dtype(self._dtype).itemsize)
+        samples = samples.astype(np.float32)
+        if self.channels > 1:
+            samples = samples.reshape(-1, self.channels).mean(axis=1)
+        if self._scale != 1.0:
+            samples *= self._scale
+        return samples
+
+    def _filter(self, x):
+        total_before = self._samples_in
+        total_after = total_before + len(x)
+        # Salidas cuyo último sample de entrada ya llegó: m*down//up <= total_after - 1
+        end = -(-total_after * self.up // self.down)
+        m = np.arange(self._samples_out, end, dtype=np.int64)
+        buffer = np.concatenate([self._history, x])
+        self._history = buffer[len(buffer) - (self.taps - 1):]
+        self._samples_in = total_after
+        self._samples_out = end
+        if not len(m):
+            return np.zeros(0, dtype=np.float32)
+        positions = m * self.down
+        windows = sliding_window_view(buffer, self.taps)[positions // self.up - total_before]
+        return np.einsum('ij,ij->i', windows, self._filters[positions % self.up])
+
+    def process(self, data: bytes) -> bytes:
+        """Resample one chunk; may return fewer (or zero) samples than a fixed ratio would"""
+        started = time.perf_counter_ns()
+        x = self._decode(data)
+        if self._passthrough:
+            self._samples_in += len(x)
+            self._samples_out += len(x)
+            y = x
+        else:
+            y = self._filter(x)
+        out = (np.clip(y, -1.0, 1.0) * 32767.0).astype('<i2').tobytes()
+        elapsed = time.perf_counter_ns() - started
+        with _totals_lock:
+            _totals['chunks'] += 1
+            _totals['bytes_in'] += len(data)
+            _totals['bytes_out'] += len(out)
+            _totals['audio_ms_in'] += len(x) / self.in_rate * 1000.0
+            _totals['cpu_ns'] += elapsed
+        return out
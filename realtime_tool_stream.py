@@ -0,0 +1,301 @@
+"""
+Sentence-chunked streaming of neuro_rag answers into the Realtime conversation.
+
+With ``REALTIME_TOOL_STREAMING`` the relay reads the backend answer through the
+streaming path (``FASTAPI_STREAM_URL``, the same one ``/api/neuro_rag_stream``
+proxies) instead of waiting for the whole body, so the model can start
+speaking on the first sentence:
+
+- ``StreamTextExtractor`` turns backend chunks into answer text (plain text,
+  NDJSON / SSE lines with a text field, or a buffered JSON body)
+- ``SentenceChunker`` cuts that text at sentence ends (or clauses, for long
+  runs without one); the first chunk may be shorter so speech starts early
+- ``ToolAnswerPusher`` feeds the chunks to the conversation: the first one
+  goes out as the ``function_call_output`` followed by ``response.create``,
+  and while the model is speaking the next chunks accumulate; on each
+  ``response.done`` they are sent as one system item plus another
+  ``response.create``. Only one response is ever active, as the Realtime API
+  requires. Barge-in (``cancel``) stops the continuations; if no output went
+  out yet, it sends a ``cancelled`` ``function_call_output`` (without
+  ``response.create``) so the call is never left without an output.
+
+Worker totals (``tool_stream_totals`` in ``/metrics``): streamed tool calls,
+chunks, continuation responses, cancellations, errors and the time from the
+tool call to the first chunk being ready.
+"""
+
+import codecs
+import json
+import re
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from perf_metrics import HistogramSet
+
+# Campos de texto habituales en respuestas JSON / NDJSON / SSE del backend
+TEXT_FIELDS = ('delta', 'token', 'content', 'text', 'answer', 'response', 'result')
+
+CONTINUATION_PROMPT = ("Continuación de la respuesta de neuro_rag. Seguí hablando desde donde quedaste, "
+                       "sin repetir lo ya dicho ni volver a presentarte:\n")
+
+_SENTENCE_END = re.compile(r'[.!?…;:]+["»”)\]]*\s+|\n+')
+_CLAUSE_END = re.compile(r'[,—–]\s+')
+
+_totals_lock = threading.Lock()
+_totals = {
+    'streams': 0,
+    'chunks': 0,
+    'continuations': 0,
+    'cancelled': 0,
+    'errors': 0
+}
+_latency = HistogramSet()
+
+
+def tool_stream_totals() -> Dict[str, Any]:
+    with _totals_lock:
+        totals = dict(_totals)
+    totals['latency_ms'] = _latency.snapshot()
+    return totals
+
+
+def _count(**deltas):
+    with _totals_lock:
+        for key, n in deltas.items():
+            _totals[key] += n
+
+
+def answer_text(value: Any) -> str:
+    """Answer text inside a backend JSON value (first known text field)"""
+    if isinstance(value, str):
+        return value
+    if isinstance(value, dict):
+        for field in TEXT_FIELDS:
+            if isinstance(value.get(field), (str, dict)):
+                return answer_text(value[field])
+        return ''
+    return '' if value is None else str(value)
+
+
+class StreamTextExtractor:
+    """Backend stream chunks -> answer text, by content type"""
+
+    def __init__(self, content_type: str = ''):
+        content_type = (content_type or '').lower()
+        if 'ndjson' in content_type or 'jsonl' in content_type:
+            self.kind = 'lines'
+        elif 'event-stream' in content_type:
+            self.kind = 'sse'
+        elif 'json' in content_type:
+            self.kind = 'json'
+        else:
+            self.kind = 'text'
+        self._decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        self._pending = ''
+
+    def feed(self, data: bytes) -> str:
+        text = self._decoder.decode(data)
+        if self.kind == 'text':
+            return text
+        self._pending += text
+        if self.kind == 'json':
+            # Cuerpo JSON no incremental: se parsea completo en flush()
+            return ''
+        lines = self._pending.split('\n')
+        self._pending = lines.pop()
+        return ''.join(self._line_text(line) for line in lines)
+
+    def flush(self) -> str:
+        rest = self._pending + self._decoder.decode(b'', final=True)
+        self._pending = ''
+        if self.kind == 'text':
+            return rest
+        if self.kind == 'json':
+            try:
+                return answer_text(json.loads(rest))
+            except ValueError:
+                return rest
+        return self._line_text(rest)
+
+    def _line_text(self, line: str) -> str:
+        line = line.strip()
+        if self.kind == 'sse':
+            if not line.startswith('data:'):
+                return ''
+            line = line[5:].strip()
+            if line == '[DONE]':
+                return ''
+        if not line:
+            return ''
+        try:
+            return answer_text(json.loads(line))
+        except ValueError:
+            return line
+
+
+class SentenceChunker:
+    """Accumulates streamed text and releases it in sentence (or clause) chunks"""
+
+    def __init__(self, min_chars: int = 60, first_min_chars: int = 20, max_chars: int = 280):
+        self.min_chars = min_chars
+        self.first_min_chars = first_min_chars
+        self.max_chars = max_chars
+        self._buffer = ''
+        self._emitted = 0
+
+    def _cut(self, end: int) -> str:
+        chunk, self._buffer = self._buffer[:end].strip(), self._buffer[end:]
+        self._emitted += 1
+        return chunk
+
+    def feed(self, text: str) -> List[str]:
+        self._buffer += text
+        chunks = []
+        while True:
+            minimum = self.first_min_chars if self._emitted == 0 else self.min_chars
+            cut = None
+            for match in _SENTENCE_END.finditer(self._buffer):
+                if len(self._buffer[:match.end()].strip()) >= minimum:
+                    cut = match.end()
+                    break
+            if cut is None and len(self._buffer) > self.max_chars:
+                # Sin fin de oración: cortar en la última cláusula (o espacio) antes del máximo
+                head = self._buffer[:self.max_chars]
+                clauses = list(_CLAUSE_END.finditer(head))
+                cut = clauses[-1].end() if clauses else (head.rfind(' ') + 1 or self.max_chars)
+            if cut is None:
+                return chunks
+            chunk = self._cut(cut)
+            if chunk:
+                chunks.append(chunk)
+
+    def flush(self) -> List[str]:
+        chunk = self._cut(len(self._buffer))
+        return [chunk] if chunk else []
+
+
+class ToolAnswerPusher:
+    """Feeds one tool call's answer chunks into the conversation, one active response at a time"""
+
+    def __init__(self, send: Callable[[Dict[str, Any]], None], call_id: str, query: str):
+        self.send = send
+        self.call_id = call_id
+        self.query = query
+        self.started = time.monotonic()
+        self._lock = threading.Lock()
+        self._pending: List[str] = []
+        self._error_output: Optional[Dict[str, Any]] = None
+        # La respuesta que pidió la tool sigue activa hasta su response.done
+        self._busy = True
+        self.output_sent = False
+        self.finished = False
+        self.cancelled = False
+        self.chunks = 0
+        _count(streams=1)
+
+    def push(self, text: str):
+        with self._lock:
+            if self.cancelled:
+                return
+            if self.chunks == 0:
+                _latency.observe('first_chunk', (time.monotonic() - self.started) * 1000)
+            self.chunks += 1
+            self._pending.append(text)
+            if not self._busy:
+                self._flush()
+        _count(chunks=1)
+
+    def response_done(self):
+        """An upstream response finished: send what accumulated meanwhile"""
+        with self._lock:
+            self._busy = False
+            if self.cancelled:
+                return
+            if self._error_output is not None:
+                self._send_output(self._error_output)
+                self._error_output = None
+            elif self._pending:
+                self._flush()
+
+    def finish(self, error: Optional[str] = None):
+        with self._lock:
+            self.finished = True
+            if error is not None:
+                _count(errors=1)
+                if not self.output_sent and not self.cancelled:
+                    # Mismo formato que execute_neuro_rag; sale cuando no haya respuesta activa
+                    self._pending = []
+                    self._error_output = {
+                        "status": "error",
+                        "error": error,
+                        "query": self.query or "unknown",
+                        "timestamp": datetime.utcnow().isoformat()
+                    }
+                    if not self._busy:
+                        self._send_output(self._error_output)
+                        self._error_output = None
+                    return
+            if not self._busy and self._pending and not self.cancelled:
+                self._flush()
+
+    def cancel(self) -> bool:
+        """Barge-in: no more continuations; True if the stream was still running"""
+        with self._lock:
+            if self.cancelled or (self.finished and not self._pending and self._error_output is None):
+                return False
+            self.cancelled = True
+            self._pending = []
+            self._error_output = None
+            if not self.output_sent:
+                # La función siempre recibe una salida; sin response.create: el usuario está hablando
+                self._send_output({
+                    "status": "cancelled",
+                    "query": self.query or "unknown",
+                    "timestamp": datetime.utcnow().isoformat()
+                }, respond=False)
+        _count(cancelled=1)
+        return True
+
+    @property
+    def done(self) -> bool:
+        return self.cancelled or (self.finished and not self._pending and self._error_output is None
+                                  and not self._busy)
+
+    def _flush(self):
+        text = ' '.join(self._pending)
+        self._pending = []
+        if not self.output_sent:
+            self._send_output({
+                "status": "success",
+                "data": {"answer": text, "partial": not self.finished},
+                "query": self.query,
+                "timestamp": datetime.utcnow().isoformat()
+            })
+            return
+        _count(continuations=1)
+        self.send({
+            "type": "conversation.item.create",
+            "item": {
+                "type": "message",
+                "role": "system",
+                "content": [{"type": "input_text", "text": CONTINUATION_PROMPT + text}]
+            }
+        })
+        self.send({"type": "response.create"})
+        self._busy = True
+
+    def _send_output(self, result: Dict[str, Any], respond: bool = True):
+        self.output_sent = True
+        self.send({
+            "type": "conversation.item.create",
+            "item": {
+                "type": "function_call_output",
+                "call_id": self.call_id,
+                "output": json.dumps(result)
+            }
+        })
+        if respond:
+            self.send({"type": "response.create"})
+            self._busy = True
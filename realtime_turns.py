@@ -0,0 +1,131 @@
+"""
+Server-side per-turn latency breakdown for the voice pipeline.
+
+``TurnTimeline`` timestamps the key upstream events of each voice turn as the
+relay sees them and, when the turn ends, derives per-stage durations that are
+aggregated into worker-wide histograms (``turn_latency_snapshot`` in
+``/metrics``) and written to the performance logger. Marks:
+
+- ``speech_stopped``: ``input_audio_buffer.speech_stopped`` (starts a turn)
+- ``committed``: ``input_audio_buffer.committed``
+- ``response_created`` / ``first_audio``: first ``response.created`` and
+  ``response.audio.delta`` of the turn
+- ``function_call_done``: ``response.function_call_arguments.done``
+- ``rag_return``: the function_call_output went upstream (server or browser)
+- ``followup_created`` / ``followup_first_audio``: the response that speaks the
+  RAG answer
+- ``response_done``: the ``response.done`` that closes the turn
+
+Stages missing either mark (no tool call, text-only turn, ...) are skipped, so
+Azure time (commit, time to first audio), RAG backend time and relay time
+(``rag_to_response``) can be told apart.
+"""
+
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+from perf_metrics import HistogramSet
+
+performance_logger = logging.getLogger('azure_speech_proxy.performance')
+
+# (stage, start mark, end mark)
+TURN_STAGES = (
+    ('vad_commit', 'speech_stopped', 'committed'),
+    ('commit_to_response', 'committed', 'response_created'),
+    ('time_to_first_audio', 'response_created', 'first_audio'),
+    ('speech_to_first_audio', 'speech_stopped', 'first_audio'),
+    ('model_to_tool_call', 'response_created', 'function_call_done'),
+    ('rag', 'function_call_done', 'rag_return'),
+    ('rag_to_response', 'rag_return', 'followup_created'),
+    ('followup_first_audio', 'followup_created', 'followup_first_audio'),
+    ('speech_to_rag_audio', 'speech_stopped', 'followup_first_audio'),
+    ('response_total', 'response_created', 'response_done'),
+    ('turn_total', 'speech_stopped', 'response_done'),
+)
+
+# Upstream event types the timeline needs to see (cheap membership test in on_message)
+TURN_EVENT_TYPES = frozenset((
+    'input_audio_buffer.speech_stopped',
+    'input_audio_buffer.committed',
+    'response.created',
+    'response.audio.delta',
+    'response.function_call_arguments.done',
+    'response.done',
+))
+
+# Per-stage histograms for every connection in this worker
+_turn_latency = HistogramSet()
+_turns_lock = threading.Lock()
+_turns = {'completed': 0, 'with_tool_call': 0}
+
+
+def turn_latency_snapshot() -> Dict[str, Any]:
+    with _turns_lock:
+        counts = dict(_turns)
+    return dict(counts, stages_ms=_turn_latency.snapshot())
+
+
+class TurnTimeline:
+    """Marks of the current turn of one connection"""
+
+    def __init__(self, client_id: str, on_turn: Optional[Callable[[Dict[str, float]], None]] = None):
+        self.client_id = client_id
+        self.on_turn = on_turn
+        self._lock = threading.Lock()
+        self._marks: Dict[str, float] = {}
+
+    def _set(self, mark: str, now: float):
+        self._marks.setdefault(mark, now)
+
+    def on_event(self, msg_type: str):
+        """Record an upstream event of TURN_EVENT_TYPES"""
+        now = time.monotonic()
+        finished = None
+        with self._lock:
+            marks = self._marks
+            if msg_type == 'input_audio_buffer.speech_stopped':
+                # Un turno sin response.done (cancelado) se descarta
+                self._marks = {'speech_stopped': now}
+            elif msg_type == 'input_audio_buffer.committed':
+                self._set('committed', now)
+            elif msg_type == 'response.created':
+                self._set('followup_created' if 'rag_return' in marks else 'response_created', now)
+            elif msg_type == 'response.audio.delta':
+                self._set('followup_first_audio' if 'rag_return' in marks else 'first_audio', now)
+            elif msg_type == 'response.function_call_arguments.done':
+                self._set('function_call_done', now)
+            elif msg_type == 'response.done':
+                # El response.done de la respuesta que pide la tool no cierra el turno
+                if marks and ('function_call_done' not in marks or 'rag_return' in marks):
+                    marks['response_done'] = now
+                    finished, self._marks = marks, {}
+        if finished:
+            self._finish(finished)
+
+    def turn_started(self) -> Optional[float]:
+        """Monotonic time the current turn started (end of the user's speech), if seen"""
+        with self._lock:
+            return self._marks.get('speech_stopped')
+
+    def rag_returned(self):
+        """The tool output was sent upstream (RAG backend answered)"""
+        with self._lock:
+            if 'function_call_done' in self._marks:
+                self._set('rag_return', time.monotonic())
+
+    def _finish(self, marks: Dict[str, float]):
+        stages = {}
+        for stage, start, end in TURN_STAGES:
+            if start in marks and end in marks:
+                stages[stage] = round((marks[end] - marks[start]) * 1000, 1)
+                _turn_latency.observe(stage, stages[stage])
+        with _turns_lock:
+            _turns['completed'] += 1
+            if 'function_call_done' in marks:
+                _turns['with_tool_call'] += 1
+        performance_logger.info(f"[TURN] client {self.client_id}: " +
+                                ", ".join(f"{k}={v:.0f}ms" for k, v in stages.items()))
+        if self.on_turn is not None:
+            self.on_turn(stages)
@@ -0,0 +1,153 @@
+"""
+Token usage accounting from upstream ``response.done`` events.
+
+Every ``response.done`` carries ``response.usage`` (input/output tokens with
+their text/audio/cached splits). ``extract_usage`` pulls out only that object:
+it locates the last ``"usage"`` key in the raw frame and decodes from there,
+so the (often large) ``output`` items are never parsed. Frames that do not
+match fall back to the parsed event.
+
+``SessionUsage`` accumulates one connection's usage in flat integer counters
+(plus the generation time of its responses, for tokens per second, and the
+largest input seen, which tracks context growth). Worker-wide totals and
+1-minute token rates are kept at module level (``usage_totals`` in
+``/metrics``).
+"""
+
+import json
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from perf_metrics import RateCounter
+
+# Flat counter name -> path inside response.usage
+USAGE_FIELDS = (
+    ('input_tokens', ('input_tokens',)),
+    ('output_tokens', ('output_tokens',)),
+    ('total_tokens', ('total_tokens',)),
+    ('input_text_tokens', ('input_token_details', 'text_tokens')),
+    ('input_audio_tokens', ('input_token_details', 'audio_tokens')),
+    ('input_cached_tokens', ('input_token_details', 'cached_tokens')),
+    ('output_text_tokens', ('output_token_details', 'text_tokens')),
+    ('output_audio_tokens', ('output_token_details', 'audio_tokens')),
+)
+
+_decoder = json.JSONDecoder()
+_USAGE_KEY = '"usage"'
+
+_totals_lock = threading.Lock()
+_totals = dict({name: 0 for name, _ in USAGE_FIELDS},
+               responses=0, responses_without_usage=0, targeted_parses=0, full_parses=0,
+               generation_ms=0.0)
+usage_rates = {
+    'input_tokens': RateCounter(),
+    'output_tokens': RateCounter()
+}
+
+
+def _targeted_usage(raw) -> Optional[dict]:
+    if isinstance(raw, (bytes, bytearray)):
+        raw = bytes(raw).decode('utf-8', 'ignore')
+    # "usage" va al final de response, después de output: se busca desde atrás
+    idx = raw.rfind(_USAGE_KEY)
+    if idx < 0:
+        return None
+    colon = raw.find(':', idx + len(_USAGE_KEY))
+    if colon < 0:
+        return None
+    start = colon + 1
+    while start < len(raw) and raw[start] in ' \t\r\n':
+        start += 1
+    value, _ = _decoder.raw_decode(raw, start)
+    return value if isinstance(value, dict) else None
+
+
+def extract_usage(event) -> Optional[dict]:
+    """response.usage of an UpstreamEvent, parsing only the usage object when possible"""
+    raw = event.raw
+    if not isinstance(raw, dict):
+        try:
+            usage = _targeted_usage(raw)
+            if usage is not None:
+                with _totals_lock:
+                    _totals['targeted_parses'] += 1
+                return usage
+        except ValueError:
+            pass
+    with _totals_lock:
+        _totals['full_parses'] += 1
+    return (event.data.get('response') or {}).get('usage')
+
+
+def flatten_usage(usage: dict) -> Dict[str, int]:
+    flat = {}
+    for name, path in USAGE_FIELDS:
+        value = usage
+        for key in path:
+            value = value.get(key) if isinstance(value, dict) else None
+        flat[name] = value if isinstance(value, int) else 0
+    return flat
+
+
+def usage_totals() -> Dict[str, Any]:
+    with _totals_lock:
+        totals = dict(_totals)
+    seconds = totals.pop('generation_ms') / 1000.0
+    totals['output_tokens_per_generation_second'] = round(totals['output_tokens'] / seconds, 1) if seconds else 0.0
+    totals['rates_per_second'] = {name: counter.snapshot()['per_second'] for name, counter in usage_rates.items()}
+    return totals
+
+
+class SessionUsage:
+    """Usage counters of one connection"""
+
+    def __init__(self, client_id: str):
+        self.client_id = client_id
+        self.started = time.monotonic()
+        self.counters = {name: 0 for name, _ in USAGE_FIELDS}
+        self.responses = 0
+        self.max_input_tokens = 0
+        self.last_input_tokens = 0
+        self.generation_ms = 0.0
+        self._response_started: Optional[float] = None
+
+    def response_created(self):
+        self._response_started = time.monotonic()
+
+    def response_done(self, usage: Optional[dict]) -> Optional[Dict[str, int]]:
+        generation_ms = 0.0
+        if self._response_started is not None:
+            generation_ms = (time.monotonic() - self._response_started) * 1000
+            self._response_started = None
+        if not usage:
+            with _totals_lock:
+                _totals['responses_without_usage'] += 1
+            return None
+        flat = flatten_usage(usage)
+        self.responses += 1
+        for name, value in flat.items():
+            self.counters[name] += value
+        self.last_input_tokens = flat['input_tokens']
+        self.max_input_tokens = max(self.max_input_tokens, flat['input_tokens'])
+        self.generation_ms += generation_ms
+        with _totals_lock:
+            _totals['responses'] += 1
+            _totals['generation_ms'] += generation_ms
+            for name, value in flat.items():
+                _totals[name] += value
+        usage_rates['input_tokens'].add(flat['input_tokens'])
+        usage_rates['output_tokens'].add(flat['output_tokens'])
+        return flat
+
+    def snapshot(self) -> Dict[str, Any]:
+        seconds = self.generation_ms / 1000.0
+        elapsed = time.monotonic() - self.started
+        return dict(
+            self.counters,
+            responses=self.responses,
+            last_input_tokens=self.last_input_tokens,
+            max_input_tokens=self.max_input_tokens,
+            output_tokens_per_generation_second=round(self.counters['output_tokens'] / seconds, 1) if seconds else 0.0,
+            tokens_per_minute=round(self.counters['total_tokens'] * 60.0 / elapsed, 1) if elapsed >= 1 else 0.0
+        )
@@ -0,0 +1,146 @@
+"""
+Server-side silence gate for uplink mic audio (REALTIME_SILENCE_GATE).
+
+Browsers stream ``input_audio_buffer.append`` continuously, including long
+silences that Azure bills as input audio. ``SilenceGate`` decodes each PCM16
+chunk and measures its energy with NumPy over ``window_ms`` windows (one
+vectorized RMS per window, no per-sample Python). A chunk is speech when any
+window is above ``threshold_dbfs``.
+
+- speech chunks are forwarded, preceded by the pre-roll: the last
+  ``preroll_ms`` of silent audio held back, so the server VAD still sees the
+  onset (same idea as ``prefix_padding_ms``)
+- after speech, ``hangover_ms`` of silence keeps flowing so the server VAD can
+  detect the end of the turn (keep it above ``silence_duration_ms``)
+- other silent chunks are suppressed (``mode='drop'``) or thinned to one in
+  ``thin_every`` (``mode='thin'``) and otherwise kept only in the pre-roll
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+GATE_MODES = ('drop', 'thin')
+
+# Worker-wide gate counters (exposed in /metrics)
+_totals_lock = threading.Lock()
+_totals = {
+    'frames_in': 0,
+    'frames_out': 0,
+    'frames_suppressed': 0,
+    'bytes_in': 0,
+    'bytes_out': 0,
+    'bytes_suppressed': 0,
+    'audio_ms_in': 0.0,
+    'cpu_ns': 0
+}
+
+
+def silence_gate_totals() -> Dict[str, Any]:
+    with _totals_lock:
+        totals = dict(_totals)
+    totals['frames_saved_pct'] = round(100.0 * totals['frames_suppressed'] / max(totals['frames_in'], 1), 1)
+    totals['bytes_saved_pct'] = round(100.0 * totals['bytes_suppressed'] / max(totals['bytes_in'], 1), 1)
+    minutes = totals['audio_ms_in'] / 60000.0
+    totals['cpu_ms_per_audio_minute'] = round(totals['cpu_ns'] / 1e6 / minutes, 3) if minutes else 0.0
+    totals['audio_ms_in'] = round(totals['audio_ms_in'])
+    return totals
+
+
+def pcm16_window_dbfs(pcm: bytes, sample_rate: int = 24000, window_ms: float = 10.0):
+    """dBFS of each window_ms window of a PCM16 mono buffer (NumPy array)"""
+    samples = np.frombuffer(pcm, dtype='<i2', count=len(pcm) // 2).astype(np.float32)
+    window = max(1, int(sample_rate * window_ms / 1000.0))
+    n = len(samples) // window
+    if n == 0:
+        # Chunk más corto que una ventana: se mide completo
+        windows = samples.reshape(1, -1) if len(samples) else np.zeros((1, 1), dtype=np.float32)
+    else:
+        windows = samples[:n * window].reshape(n, window)
+    rms = np.sqrt(np.mean(windows * windows, axis=1))
+    return 20.0 * np.log10(np.maximum(rms, 1.0) / 32768.0)
+
+
+class SilenceGate:
+    """Per-connection energy gate with pre-roll and hangover"""
+
+    def __init__(self, sample_rate: int = 24000, threshold_dbfs: float = -50.0,
+                 preroll_ms: float = 300.0, hangover_ms: float = 700.0,
+                 window_ms: float = 10.0, mode: str = 'drop', thin_every: int = 10):
+        if np is None:
+            raise RuntimeError("numpy is required for the silence gate")
+        if mode not in GATE_MODES:
+            raise ValueError(f"Unknown silence gate mode: {mode}")
+        self.sample_rate = sample_rate
+        self.threshold_dbfs = threshold_dbfs
+        self.preroll_bytes = int(sample_rate * preroll_ms / 1000.0) * 2
+        self.hangover_ms = hangover_ms
+        self.window_ms = window_ms
+        self.mode = mode
+        self.thin_every = max(1, thin_every)
+        self._preroll = deque()
+        self._preroll_size = 0
+        self._hangover_left = 0.0
+        self._silent_count = 0
+        self.stats = {'frames_in': 0, 'frames_out': 0, 'frames_suppressed': 0}
+
+    def is_speech(self, pcm: bytes) -> bool:
+        return bool(np.any(pcm16_window_dbfs(pcm, self.sample_rate, self.window_ms) > self.threshold_dbfs))
+
+    def process(self, pcm: bytes) -> List[bytes]:
+        """Chunks to forward for one incoming chunk (possibly none, possibly pre-roll + chunk)"""
+        started = time.perf_counter_ns()
+        duration_ms = len(pcm) / 2 / self.sample_rate * 1000.0
+        out: List[bytes] = []
+        suppressed_frames = 0
+        suppressed_bytes = 0
+
+        if self.is_speech(pcm):
+            out.extend(self._preroll)
+            self._preroll.clear()
+            self._preroll_size = 0
+            out.append(pcm)
+            self._hangover_left = self.hangover_ms
+            self._silent_count = 0
+        elif self._hangover_left > 0:
+            self._hangover_left -= duration_ms
+            out.append(pcm)
+        else:
+            self._silent_count += 1
+            if self.mode == 'thin' and self._silent_count % self.thin_every == 0:
+                # El pre-roll retenido es más viejo que este chunk: se descarta para no desordenar
+                suppressed_frames += len(self._preroll)
+                suppressed_bytes += self._preroll_size
+                self._preroll.clear()
+                self._preroll_size = 0
+                out.append(pcm)
+            else:
+                # Se retiene como pre-roll; lo que excede la ventana se descarta
+                self._preroll.append(pcm)
+                self._preroll_size += len(pcm)
+                while self._preroll and self._preroll_size - len(self._preroll[0]) >= self.preroll_bytes:
+                    dropped = self._preroll.popleft()
+                    self._preroll_size -= len(dropped)
+                    suppressed_frames += 1
+                    suppressed_bytes += len(dropped)
+
+        self.stats['frames_in'] += 1
+        self.stats['frames_out'] += len(out)
+        self.stats['frames_suppressed'] += suppressed_frames
+        elapsed = time.perf_counter_ns() - started
+        with _totals_lock:
+            _totals['frames_in'] += 1
+            _totals['frames_out'] += len(out)
+            _totals['frames_suppressed'] += suppressed_frames
+            _totals['bytes_in'] += len(pcm)
+            _totals['bytes_out'] += sum(len(c) for c in out)
+            _totals['bytes_suppressed'] += suppressed_bytes
+            _totals['audio_ms_in'] += duration_ms
+            _totals['cpu_ns'] += elapsed
+        return out
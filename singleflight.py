@@ -0,0 +1,97 @@
+"""
+Single-flight coalescing of identical in-flight backend calls.
+
+When several clients ask the same question at once (a meeting room talking to
+the same avatar, or a client retrying), ``SingleFlight.do(key, call)`` lets the
+first caller (the leader) run the upstream call and every concurrent caller
+with the same key await that call's result or exception instead of issuing
+its own. The entry is dropped as soon as the call finishes, so nothing is
+cached: later requests start a new flight.
+
+The shared slot is a ``concurrent.futures.Future``, so followers can await it
+from any event loop (``async_route`` in ``per_request`` mode runs each request
+on its own loop). The upstream call runs as its own task and every caller
+waits through ``asyncio.shield``: a follower giving up (``timeout``) or being
+cancelled does not cancel the call the others are waiting on.
+
+Key policy: ``/api/neuro_rag`` keys flights exactly like ``RagAnswerCache``,
+on the folded question alone (``question_key``). ``session_id`` and the rest
+of the payload are not part of the key: concurrent callers get the answer
+the leader's payload produced, the same answer a cache hit would have served
+them a moment later.
+"""
+
+import asyncio
+import concurrent.futures
+import threading
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from perf_metrics import Histogram
+
+
+class SingleFlightTimeout(Exception):
+    """A caller waited longer than its bound for the shared call"""
+
+
+class SingleFlight:
+    """Deduplicates concurrent calls by key; callers share one result or error"""
+
+    def __init__(self, lock=None):
+        # Lock nativo cuando lo comparten el loop de fondo y threads verdes
+        self._lock = lock if lock is not None else threading.Lock()
+        self._calls: Dict[str, concurrent.futures.Future] = {}
+        self._fanout: Dict[str, int] = {}
+        self.fanout = Histogram(buckets=(1, 2, 3, 5, 10, 25, 50))
+        self.stats = {
+            'calls': 0,
+            'leaders': 0,
+            'saved_calls': 0,
+            'shared_errors': 0,
+            'wait_timeouts': 0,
+            'max_fanout': 0
+        }
+
+    async def do(self, key: str, call: Callable[[], Awaitable[Any]], timeout: Optional[float] = None) -> Any:
+        with self._lock:
+            self.stats['calls'] += 1
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = concurrent.futures.Future()
+                self._calls[key] = future
+                self._fanout[key] = 1
+                self.stats['leaders'] += 1
+            else:
+                self._fanout[key] += 1
+                self.stats['saved_calls'] += 1
+        if leader:
+            task = asyncio.ensure_future(call())
+            task.add_done_callback(lambda t: self._finish(key, future, t))
+        try:
+            return await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), timeout)
+        except asyncio.TimeoutError:
+            with self._lock:
+                self.stats['wait_timeouts'] += 1
+            raise SingleFlightTimeout(f"Shared backend call did not finish within {timeout}s")
+
+    def _finish(self, key: str, future: concurrent.futures.Future, task: asyncio.Task):
+        with self._lock:
+            self._calls.pop(key, None)
+            fanout = self._fanout.pop(key, 1)
+            self.stats['max_fanout'] = max(self.stats['max_fanout'], fanout)
+            if task.cancelled() or task.exception() is not None:
+                self.stats['shared_errors'] += fanout - 1
+        self.fanout.observe(fanout)
+        if task.cancelled():
+            future.set_exception(RuntimeError("Shared backend call was cancelled"))
+        elif task.exception() is not None:
+            future.set_exception(task.exception())
+        else:
+            future.set_result(task.result())
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self.stats, in_flight=len(self._calls))
+        stats['saved_ratio'] = round(stats['saved_calls'] / stats['calls'], 3) if stats['calls'] else 0.0
+        stats['fanout'] = self.fanout.snapshot()
+        return stats
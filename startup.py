@@ -55,6 +55,15 @@ def post_fork(server, worker):
     """Called just after a worker has been forked"""
     server.log.info(f"Worker spawned (pid: {worker.pid})")
 
+def worker_exit(server, worker):
+    """Called just after a worker has been exited: close backend connections and the async loop"""
+    try:
+        import app as app_module
+        app_module.backend_http.close()
+        app_module.background_loop.shutdown()
+    except Exception as e:
+        worker.log.warning(f"Error closing backend HTTP pool: {e}")
+
 def worker_abort(worker):
     """Called when a worker received the SIGABRT signal"""
     worker.log.info("Worker received SIGABRT signal")
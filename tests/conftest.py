@@ -0,0 +1,6 @@
+import os
+import sys
+
+# Los módulos del proyecto viven en la raíz del repo (sin paquete)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('SOCKETIO_ASYNC_MODE', 'threading')
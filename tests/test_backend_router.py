@@ -0,0 +1,70 @@
+import asyncio
+import threading
+
+import httpx
+import pytest
+
+from backend_router import BackendRouter
+
+
+class FlakyPool:
+    """BackendClientPool stand-in: fails the first ``failures`` requests, then answers 200"""
+
+    def __init__(self, failures):
+        self.failures = failures
+        self.urls = []
+
+    async def request(self, method, url, **kwargs):
+        self.urls.append(url)
+        if len(self.urls) <= self.failures:
+            raise httpx.ConnectError('unreachable', request=httpx.Request(method, url))
+        return httpx.Response(200, request=httpx.Request(method, url))
+
+
+def test_choose_reuses_the_only_replica_once_tried():
+    router = BackendRouter(['http://a/ask'], threading.Lock())
+    assert router.choose({'http://a/ask'}).url == 'http://a/ask'
+
+
+def test_choose_falls_back_when_every_circuit_is_open():
+    router = BackendRouter(['http://a/ask', 'http://b/ask'], threading.Lock(), failure_threshold=1)
+    for replica in router.replicas:
+        router._record(replica, 0.0, ok=False)
+    assert router.choose({'http://a/ask', 'http://b/ask'}).url in ('http://a/ask', 'http://b/ask')
+    assert router.stats['all_open'] == 1
+
+
+def test_hedge_never_reuses_a_tried_replica():
+    router = BackendRouter(['http://a/ask'], threading.Lock())
+    assert router.choose({'http://a/ask'}, reason='hedge') is None
+
+
+def test_single_replica_retry_goes_to_the_same_url():
+    router = BackendRouter(['http://a/ask'], threading.Lock())
+    pool = FlakyPool(failures=1)
+    tried = set()
+
+    async def call_with_retry():
+        try:
+            await router.request(pool, 'POST', tried=tried)
+        except httpx.ConnectError:
+            pass
+        return await router.request(pool, 'POST', tried=tried)
+
+    response = asyncio.run(call_with_retry())
+    assert response.status_code == 200
+    assert pool.urls == ['http://a/ask', 'http://a/ask']
+
+
+def test_retry_prefers_an_untried_replica():
+    router = BackendRouter(['http://a/ask', 'http://b/ask'], threading.Lock())
+    pool = FlakyPool(failures=1)
+    tried = set()
+
+    async def call_with_retry():
+        with pytest.raises(httpx.ConnectError):
+            await router.request(pool, 'POST', tried=tried)
+        return await router.request(pool, 'POST', tried=tried)
+
+    asyncio.run(call_with_retry())
+    assert len(set(pool.urls)) == 2
@@ -0,0 +1,52 @@
+import asyncio
+import time
+
+import pytest
+
+from background_loop import BackgroundLoop
+
+
+@pytest.fixture
+def runner():
+    runner = BackgroundLoop(name='test-loop')
+    runner.start()
+    yield runner
+    runner.shutdown()
+
+
+def test_run_returns_the_result(runner):
+    async def answer():
+        return 42
+    assert runner.run(answer()) == 42
+
+
+def test_timeout_before_the_task_starts_cancels_it(runner):
+    ran = []
+
+    async def side_effect():
+        await asyncio.sleep(0)
+        ran.append(True)
+
+    # El loop queda ocupado: el timeout vence antes de que se cree la task
+    runner.loop.call_soon_threadsafe(time.sleep, 0.3)
+    with pytest.raises(TimeoutError):
+        runner.run(side_effect(), timeout=0.05)
+    time.sleep(0.5)
+    assert ran == []
+    assert runner.stats['timeouts'] == 1
+
+
+def test_timeout_cancels_a_running_task(runner):
+    cancelled = []
+
+    async def slow():
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    with pytest.raises(TimeoutError):
+        runner.run(slow(), timeout=0.05)
+    time.sleep(0.1)
+    assert cancelled == [True]
@@ -0,0 +1,93 @@
+import threading
+import time
+
+from realtime_queues import SendQueue
+
+
+def spawn_thread(fn):
+    thread = threading.Thread(target=fn, daemon=True)
+    thread.start()
+    spawn_thread.threads.append(thread)
+    return thread
+
+
+spawn_thread.threads = []
+
+
+class Gate:
+    """deliver() that holds every frame until released"""
+
+    def __init__(self):
+        self.open = threading.Event()
+        self.delivered = []
+
+    def __call__(self, payload):
+        self.open.wait(5)
+        self.delivered.append(payload)
+
+
+def wait_until(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not predicate() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return predicate()
+
+
+def test_block_never_drops_live_audio():
+    gate = Gate()
+    queue = SendQueue('test', gate, spawn_thread, max_items=2, overflow='block', block_timeout_s=0.01)
+    producer = threading.Thread(target=lambda: [queue.put(i, 'audio', droppable=True, response_id='r1')
+                                                for i in range(6)])
+    producer.start()
+    time.sleep(0.1)
+    # Cola llena: el productor espera en vez de descartar
+    assert producer.is_alive()
+    gate.open.set()
+    producer.join(2)
+    assert wait_until(lambda: len(gate.delivered) == 6)
+    assert gate.delivered == list(range(6))
+    assert queue.stats['dropped_overflow'] == 0
+
+
+def test_full_queue_sheds_interrupted_audio_first():
+    gate = Gate()
+    queue = SendQueue('test', gate, spawn_thread, max_items=3, overflow='block')
+    queue.put('held', 'audio', droppable=True, response_id='old')
+    assert wait_until(lambda: queue.depth == 0)
+    queue.put('old-1', 'audio', droppable=True, response_id='old')
+    queue.put('old-2', 'audio', droppable=True, response_id='old')
+    queue.put('live-1', 'audio', droppable=True, response_id='live')
+    # Marca la respuesta vieja sin purgar, como si llegara tarde: put debe descartarla para hacer lugar
+    queue._interrupted.append('old')
+    assert queue.put('live-2', 'audio', droppable=True, response_id='live')
+    gate.open.set()
+    assert wait_until(lambda: len(gate.delivered) == 4)
+    assert gate.delivered == ['held', 'old-2', 'live-1', 'live-2']
+    assert queue.stats['dropped_interrupted'] == 1
+
+
+def test_drop_audio_policy_drops_oldest_audio_but_keeps_control_events():
+    gate = Gate()
+    queue = SendQueue('test', gate, spawn_thread, max_items=2, overflow='drop_audio')
+    queue.put('held', 'audio', droppable=True, response_id='r1')
+    assert wait_until(lambda: queue.depth == 0)
+    queue.put('a1', 'audio', droppable=True, response_id='r1')
+    queue.put('a2', 'audio', droppable=True, response_id='r1')
+    assert queue.put('a3', 'audio', droppable=True, response_id='r1')
+    assert queue.stats['dropped_overflow'] == 1
+    queue.put('done', 'response.done')
+    gate.open.set()
+    assert wait_until(lambda: len(gate.delivered) == 4)
+    assert gate.delivered == ['held', 'a2', 'a3', 'done']
+    assert queue.stats['control_over_limit'] == 1
+
+
+def test_drain_task_exits_when_idle_and_restarts():
+    delivered = []
+    spawn_thread.threads = []
+    queue = SendQueue('test', delivered.append, spawn_thread, idle_exit_s=0.05)
+    queue.put('first', 'response.created')
+    assert wait_until(lambda: not spawn_thread.threads[0].is_alive())
+    queue.put('second', 'response.done')
+    assert wait_until(lambda: delivered == ['first', 'second'])
+    assert len(spawn_thread.threads) == 2
@@ -0,0 +1,68 @@
+import os
+import subprocess
+import sys
+import textwrap
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Corre en un proceso aparte: monkey_patch tiene que ir antes de cualquier import
+EVENTLET_ROUND_TRIP = textwrap.dedent('''
+    import eventlet
+    eventlet.monkey_patch()
+
+    import json
+    import sys
+
+    from flask import Flask
+    from flask_socketio import SocketIO
+    from websockets.asyncio.server import serve
+
+    from realtime_relay import AsyncioRelay
+
+    app = Flask(__name__)
+    socketio = SocketIO(app, async_mode='eventlet')
+    client = socketio.test_client(app)
+    relay = AsyncioRelay(async_mode='eventlet')
+    relay._ensure_started()
+
+    async def echo(ws):
+        async for message in ws:
+            await ws.send(message)
+
+    async def start_server():
+        server = await serve(echo, '127.0.0.1', 0)
+        return server.sockets[0].getsockname()[1]
+
+    port = relay.runner.run(start_server())
+
+    def on_open(ws):
+        # Como SendQueue: el envío lo hace una tarea de fondo de Socket.IO
+        socketio.start_background_task(ws.send, json.dumps({'type': 'ping'}))
+        socketio.emit('realtime_connected', {'ok': True})
+
+    def on_message(ws, message):
+        socketio.emit('realtime_message', json.loads(message))
+
+    relay.open(f'ws://127.0.0.1:{port}', on_open=on_open, on_message=on_message,
+               on_error=lambda ws, e: None, on_close=lambda ws, code, reason: None)
+
+    received = []
+    for _ in range(300):
+        received += [event['name'] for event in client.get_received()]
+        if 'realtime_message' in received:
+            break
+        eventlet.sleep(0.01)
+    relay.shutdown(timeout=1.0)
+    print(json.dumps(received))
+    sys.exit(0 if received == ['realtime_connected', 'realtime_message'] else 1)
+''')
+
+
+def test_asyncio_relay_callbacks_reach_the_eventlet_hub():
+    pytest.importorskip('eventlet')
+    pytest.importorskip('websockets')
+    result = subprocess.run([sys.executable, '-c', EVENTLET_ROUND_TRIP], cwd=ROOT, capture_output=True,
+                            text=True, timeout=30)
+    assert result.returncode == 0, result.stdout + result.stderr
@@ -0,0 +1,48 @@
+import json
+
+from realtime_tool_stream import ToolAnswerPusher
+
+
+def make_pusher():
+    sent = []
+    return ToolAnswerPusher(sent.append, 'call-1', 'presión del pozo'), sent
+
+
+def outputs(sent):
+    return [json.loads(m['item']['output']) for m in sent
+            if m['type'] == 'conversation.item.create' and m['item']['type'] == 'function_call_output']
+
+
+def test_cancel_before_any_output_sends_a_terminal_output():
+    pusher, sent = make_pusher()
+    assert pusher.cancel()
+    assert [o['status'] for o in outputs(sent)] == ['cancelled']
+    assert sent[0]['item']['call_id'] == 'call-1'
+    # El usuario está hablando: no se pide otra respuesta
+    assert {'type': 'response.create'} not in sent
+
+
+def test_cancel_with_chunks_pending_still_answers_the_call():
+    pusher, sent = make_pusher()
+    pusher.push('Primera oración.')
+    pusher.cancel()
+    pusher.response_done()
+    assert [o['status'] for o in outputs(sent)] == ['cancelled']
+
+
+def test_cancel_after_the_output_sends_nothing_more():
+    pusher, sent = make_pusher()
+    pusher.response_done()
+    pusher.push('Primera oración.')
+    count = len(sent)
+    assert pusher.cancel()
+    assert len(sent) == count
+    assert [o['status'] for o in outputs(sent)] == ['success']
+
+
+def test_pending_error_is_replaced_by_the_cancelled_output():
+    pusher, sent = make_pusher()
+    pusher.finish('backend down')
+    pusher.cancel()
+    pusher.response_done()
+    assert [o['status'] for o in outputs(sent)] == ['cancelled']